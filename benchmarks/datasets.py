@@ -0,0 +1,38 @@
+# datasets.py - Synthetic energy_balance histories for the benchmarks
+"""
+Benchmark-sized energy_balance frames from the seeded generator in
+benchmarks/synthetic_data.py. Frames are passed through CSV once so the
+dtypes match what fetch_from_csv returns.
+"""
+import io
+
+import pandas as pd
+
+from benchmarks.synthetic_data import ENERGY_COLUMNS, SyntheticDataGenerator
+
+# name -> (days of history, simulated users)
+SIZES = {
+    '1_month': (30, 1),
+    '1_year': (365, 1),
+    '5_years': (5 * 365, 1),
+    '20_users': (365, 20)
+}
+
+def _as_read_from_csv(df):
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False)
+    buffer.seek(0)
+    return pd.read_csv(buffer)
+
+def make_energy_history(days, seed=0, end_date=None, user=0):
+    """energy_balance rows for days days ending at end_date (default today)"""
+    generator = SyntheticDataGenerator(seed=seed, end_date=end_date)
+    return _as_read_from_csv(generator.energy_history(days, user=user))
+
+def make_size(size_name, seed=0, end_date=None):
+    """List of per-user frames for one of SIZES"""
+    days, users = SIZES[size_name]
+    generator = SyntheticDataGenerator(seed=seed, end_date=end_date)
+    return [_as_read_from_csv(generator.energy_history(days, user=user)) for user in range(users)]
+
+__all__ = ['ENERGY_COLUMNS', 'SIZES', 'make_energy_history', 'make_size']
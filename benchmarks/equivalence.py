@@ -0,0 +1,303 @@
+# equivalence.py - Differential check of the analytics functions against a reference revision
+"""
+Runs the analytics functions of a reference revision (default: HEAD) and of
+the working tree side by side on the same generated data, and reports every
+numeric difference beyond the tolerance, every row-order change and every
+shape, column or type change:
+
+    python -m benchmarks.equivalence                           # working tree vs HEAD
+    python -m benchmarks.equivalence --reference main --sizes 1_month 5_years
+    python -m benchmarks.equivalence --reference-path /path/to/old/checkout
+
+The reference scripts/ package is extracted with git archive (or taken from
+--reference-path) and executed in a subprocess, so both implementations run
+with their own module state. Cases are addressed by module and function name
+(CASES) so the same case list works on both sides. For sizes with several
+users the first user's history is used.
+
+run_benchmarks runs this check before timing and fails the same way on a
+difference; exit status 1 means at least one case differs.
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import math
+import os
+import pickle
+import subprocess
+import sys
+import tarfile
+import tempfile
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RTOL = 1e-9
+ATOL = 1e-6
+MAX_REPORTED_DIFFERENCES = 5
+TRAINING_ACTIVITIES = ['Walk', 'Run', 'Bike', 'Strength']
+
+# ===================== CASES =====================
+# name -> (module, function, builds the argument tuples from the context).
+# A case with several argument tuples calls the function once per tuple and
+# compares the list of results.
+
+def _history(context):
+    return context['energy'].copy()
+
+CASES = {
+    'calc_accumulated_energy': (
+        'scripts.data_storage', 'calc_accumulated_energy',
+        lambda c: [(_history(c).drop(columns=['energy_acc', 'protein_acc']),)]
+    ),
+    'calc_energy_deficite': (
+        'scripts.data_dashboard', 'calc_energy_deficite',
+        lambda c: [(_history(c), c['today'].strftime('%Y-%m-%d'), c['today'])]
+    ),
+    'add_summary_to_dataset': ('scripts.data_dashboard', 'add_summary_to_dataset', lambda c: [(_history(c),)]),
+    'get_deficit_analysis': (
+        'scripts.activity_summary', 'get_deficit_analysis',
+        lambda c: [(_history(c), day) for day in c['days']]
+    ),
+    'get_training_summary': (
+        'scripts.activity_summary', 'get_training_summary', lambda c: [(_history(c), TRAINING_ACTIVITIES)]
+    ),
+    'get_weekly_summary': ('scripts.activity_summary', 'get_weekly_summary', lambda c: [(_history(c),)]),
+    'get_daily_energy_balance': ('scripts.activity_summary', 'get_daily_energy_balance', lambda c: [(_history(c),)]),
+    'get_nutrition_summary': ('scripts.activity_summary', 'get_nutrition_summary', lambda c: [(_history(c),)]),
+    'get_food_summary': ('scripts.activity_summary', 'get_food_summary', lambda c: [(_history(c),)]),
+    'calculate_energy_balance': (
+        'scripts.activity_summary', 'calculate_energy_balance', lambda c: [(_history(c), 'All time')]
+    ),
+    'code_detector': (
+        'scripts.nutritions', 'code_detector',
+        lambda c: [(meal.copy(), nutrition.copy(), portions) for meal, nutrition, portions in c['meals']]
+    )
+}
+
+def build_context(size_name, seed=0, end_date=None, meals=200):
+    """Inputs shared by both sides: one history, a few selected days and recipe meals"""
+    from benchmarks.datasets import make_size
+    from benchmarks.synthetic_data import SyntheticDataGenerator
+
+    end_date = end_date or date.today()
+    energy = make_size(size_name, seed=seed, end_date=end_date)[0]
+    first_day = date.fromisoformat(energy['date'].min())
+    span = (end_date - first_day).days
+    days = sorted({end_date, end_date - timedelta(days=min(6, span)), first_day + timedelta(days=span // 2), first_day})
+
+    generator = SyntheticDataGenerator(seed=seed, end_date=end_date)
+    foods = generator.food_database
+    recipe_meals = []
+    for position, (_, items) in enumerate(generator.recipe_database.groupby('name', sort=True)):
+        if position >= meals:
+            break
+        meal = items.rename(columns={'livsmedel': 'Food', 'amount': 'Amount (g)'})[['Food', 'Amount (g)']]
+        nutrition = foods[foods['livsmedel'].isin(meal['Food'])].reset_index(drop=True)
+        recipe_meals.append((meal.reset_index(drop=True), nutrition, 1 + position % 4))
+    return {'energy': energy, 'today': end_date, 'days': days, 'meals': recipe_meals}
+
+def run_cases(context, case_names=None):
+    """Call every case with the implementation importable as scripts.*; errors are returned, not raised"""
+    outputs = {}
+    for name in case_names or list(CASES):
+        module_name, function_name, build_calls = CASES[name]
+        try:
+            function = getattr(importlib.import_module(module_name), function_name)
+            calls = build_calls(context)
+            results = [function(*args) for args in calls]
+            outputs[name] = results[0] if len(results) == 1 else results
+        except Exception as e:
+            outputs[name] = {'__error__': f"{type(e).__name__}: {e}"}
+    return outputs
+
+# ===================== COMPARISON =====================
+
+def _is_number(value):
+    return isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_))
+
+def _numbers_differ(a, b, rtol, atol):
+    if math.isnan(a) and math.isnan(b):
+        return False
+    return not math.isclose(a, b, rel_tol=rtol, abs_tol=atol)
+
+def _compare_columns(reference, candidate, path, rtol, atol):
+    """Differences between two equally long 1-d value sequences"""
+    ref, cand = pd.Series(np.asarray(reference, dtype=object)), pd.Series(np.asarray(candidate, dtype=object))
+    ref_numeric, cand_numeric = pd.to_numeric(ref, errors='coerce'), pd.to_numeric(cand, errors='coerce')
+    numeric = (ref.isna() | ref_numeric.notna()) & (cand.isna() | cand_numeric.notna())
+    numeric &= ~ref.map(lambda v: isinstance(v, (bool, np.bool_, str))) & ~cand.map(lambda v: isinstance(v, (bool, np.bool_, str)))
+
+    same = (ref == cand) | (ref.isna() & cand.isna())
+    if numeric.any():
+        a, b = ref_numeric[numeric].to_numpy(dtype=float), cand_numeric[numeric].to_numpy(dtype=float)
+        same[numeric] = np.isclose(a, b, rtol=rtol, atol=atol, equal_nan=True)
+    mismatched = np.flatnonzero(~same.to_numpy())
+    if not len(mismatched):
+        return []
+    first = mismatched[0]
+    return [f"{path}: {len(mismatched)} value(s) differ, first at row {first}: {ref[first]!r} vs {cand[first]!r}"]
+
+def _compare_frames(reference, candidate, path, rtol, atol):
+    differences = []
+    if list(reference.columns) != list(candidate.columns):
+        missing = [c for c in reference.columns if c not in candidate.columns]
+        added = [c for c in candidate.columns if c not in reference.columns]
+        differences.append(f"{path}: columns differ (missing {missing}, added {added}, or reordered)")
+    if reference.shape[0] != candidate.shape[0]:
+        return differences + [f"{path}: {reference.shape[0]} rows vs {candidate.shape[0]}"]
+
+    shared = [c for c in reference.columns if c in candidate.columns]
+    if not reference.index.equals(candidate.index):
+        differences.append(f"{path}: index differs")
+    value_differences = []
+    for column in shared:
+        value_differences += _compare_columns(reference[column].to_numpy(), candidate[column].to_numpy(),
+                                              f"{path}[{column!r}]", rtol, atol)
+    if value_differences and shared:
+        # Same rows in another order?
+        key = lambda df: df[shared].astype(str).sort_values(shared).reset_index(drop=True)
+        if key(reference).equals(key(candidate)):
+            return differences + [f"{path}: same rows, different row order"]
+    return differences + value_differences
+
+def compare(reference, candidate, path='result', rtol=RTOL, atol=ATOL):
+    """Human-readable differences between a reference and a candidate output (empty when equivalent)"""
+    if isinstance(reference, dict) and '__error__' in reference:
+        if isinstance(candidate, dict) and candidate.get('__error__') == reference['__error__']:
+            return []
+        return [f"{path}: reference raised {reference['__error__']}"]
+    if isinstance(candidate, dict) and '__error__' in candidate:
+        return [f"{path}: candidate raised {candidate['__error__']}"]
+
+    if isinstance(reference, pd.DataFrame) or isinstance(candidate, pd.DataFrame):
+        if type(reference) is not type(candidate):
+            return [f"{path}: {type(reference).__name__} vs {type(candidate).__name__}"]
+        return _compare_frames(reference, candidate, path, rtol, atol)
+    if isinstance(reference, pd.Series) or isinstance(candidate, pd.Series):
+        if type(reference) is not type(candidate):
+            return [f"{path}: {type(reference).__name__} vs {type(candidate).__name__}"]
+        return _compare_frames(reference.to_frame('value'), candidate.to_frame('value'), path, rtol, atol)
+    if isinstance(reference, np.ndarray) or isinstance(candidate, np.ndarray):
+        reference, candidate = np.asarray(reference), np.asarray(candidate)
+        if reference.shape != candidate.shape:
+            return [f"{path}: shape {reference.shape} vs {candidate.shape}"]
+        return _compare_columns(reference.ravel(), candidate.ravel(), path, rtol, atol)
+    if isinstance(reference, dict):
+        if not isinstance(candidate, dict):
+            return [f"{path}: dict vs {type(candidate).__name__}"]
+        differences = []
+        if set(reference) != set(candidate):
+            differences.append(f"{path}: keys differ {sorted(map(str, set(reference) ^ set(candidate)))}")
+        for key in reference:
+            if key in candidate:
+                differences += compare(reference[key], candidate[key], f"{path}[{key!r}]", rtol, atol)
+        return differences
+    if isinstance(reference, (list, tuple)):
+        if not isinstance(candidate, (list, tuple)):
+            return [f"{path}: {type(reference).__name__} vs {type(candidate).__name__}"]
+        if len(reference) != len(candidate):
+            return [f"{path}: length {len(reference)} vs {len(candidate)}"]
+        differences = []
+        for position, (ref_item, cand_item) in enumerate(zip(reference, candidate)):
+            differences += compare(ref_item, cand_item, f"{path}[{position}]", rtol, atol)
+        return differences
+    if _is_number(reference) and _is_number(candidate):
+        return [f"{path}: {reference!r} vs {candidate!r}"] if _numbers_differ(float(reference), float(candidate), rtol, atol) else []
+    if reference is None and candidate is None:
+        return []
+    try:
+        if pd.isna(reference) and pd.isna(candidate):
+            return []
+    except (TypeError, ValueError):
+        pass
+    return [] if reference == candidate else [f"{path}: {reference!r} vs {candidate!r}"]
+
+# ===================== REFERENCE RUNNER =====================
+
+def extract_reference(revision, destination):
+    """Write scripts/ as of revision into destination (git archive)"""
+    archive = subprocess.run(
+        ['git', 'archive', '--format=tar', revision, 'scripts'], cwd=PROJECT_ROOT, capture_output=True, check=True
+    ).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(destination, filter='data')
+    return destination
+
+def run_reference(reference_root, context, case_names=None):
+    """Outputs of the scripts/ package under reference_root, computed in a subprocess"""
+    with tempfile.TemporaryDirectory(prefix='lumina_equivalence_') as scratch:
+        input_path, output_path = os.path.join(scratch, 'input.pkl'), os.path.join(scratch, 'output.pkl')
+        with open(input_path, 'wb') as f:
+            pickle.dump({'context': context, 'cases': case_names}, f)
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', reference_root, input_path, output_path],
+            cwd=reference_root, check=True, stdout=subprocess.DEVNULL
+        )
+        with open(output_path, 'rb') as f:
+            return pickle.load(f)
+
+def _worker(reference_root, input_path, output_path):
+    # scripts.* must resolve to the reference tree; the benchmarks package stays importable
+    sys.path[:0] = [reference_root, PROJECT_ROOT]
+    with open(input_path, 'rb') as f:
+        job = pickle.load(f)
+    outputs = run_cases(job['context'], job['cases'])
+    with open(output_path, 'wb') as f:
+        pickle.dump(outputs, f)
+
+# ===================== DRIVER =====================
+
+def check(sizes=('1_month', '1_year'), reference='HEAD', reference_path=None, case_names=None,
+          rtol=RTOL, atol=ATOL, seed=0, verbose=True):
+    """Compare reference and working-tree outputs; returns one record per size and case"""
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    records = []
+    with tempfile.TemporaryDirectory(prefix='lumina_reference_') as scratch:
+        reference_root = reference_path or extract_reference(reference, scratch)
+        for size_name in sizes:
+            context = build_context(size_name, seed=seed)
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                candidate = run_cases(context, case_names)
+            baseline = run_reference(reference_root, context, case_names)
+            for name in case_names or list(CASES):
+                differences = compare(baseline[name], candidate[name], name, rtol, atol)
+                records.append({'size': size_name, 'case': name, 'equivalent': not differences,
+                                'differences': differences[:MAX_REPORTED_DIFFERENCES],
+                                'difference_count': len(differences)})
+                if verbose:
+                    status = 'ok' if not differences else f"DIFFERS ({len(differences)})"
+                    print(f"{size_name:>9}  {name:<28} {status}")
+                    for line in differences[:MAX_REPORTED_DIFFERENCES]:
+                        print(f"{'':>11}{line}")
+    return records
+
+def main(argv=None):
+    if argv is None and len(sys.argv) > 1 and sys.argv[1] == '--worker':
+        _worker(*sys.argv[2:5])
+        return 0
+
+    from benchmarks.datasets import SIZES
+
+    parser = argparse.ArgumentParser(description="Compare the analytics functions against a reference revision")
+    parser.add_argument('--reference', default='HEAD', help="git revision holding the reference implementation")
+    parser.add_argument('--reference-path', help="directory containing a reference scripts/ package instead")
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['1_month', '1_year'])
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), help="cases to check (default: all)")
+    parser.add_argument('--rtol', type=float, default=RTOL)
+    parser.add_argument('--atol', type=float, default=ATOL)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    records = check(args.sizes, args.reference, args.reference_path, args.cases, args.rtol, args.atol, args.seed)
+    return 0 if all(record['equivalent'] for record in records) else 1
+
+if __name__ == '__main__':
+    if PROJECT_ROOT not in sys.path and '--worker' not in sys.argv:
+        sys.path.insert(0, PROJECT_ROOT)
+    sys.exit(main())
@@ -0,0 +1,385 @@
+# page_latency.py - Headless page-render latency harness
+"""
+Drives lumina_app.py with streamlit.testing.v1.AppTest against generated
+datasets and records, per interaction, the rerun latency and the storage
+calls it caused (from storage_metrics):
+
+    python -m benchmarks.page_latency                          # 1 year of history, 3 rounds
+    python -m benchmarks.page_latency --days 30 365 1825 --rounds 5
+    python -m benchmarks.page_latency --data-dir /path/with/data --pages Meals
+    python -m benchmarks.page_latency --backend sqlite
+
+One round is one fresh session touring every page (see SCENARIOS). Each
+round runs on a fresh copy of the dataset with the frame and resource caches
+cleared, so the first interaction of a round is a cold load. The app runs
+entirely offline, in CSV mode or (--backend sqlite) in database mode against
+the SQLite-backed Supabase stand-in from scripts/fake_supabase.py.
+
+Results are printed as a table, written as JSON and appended to
+benchmarks/results/page_latency_history.csv so runs can be tracked over time.
+
+AppTest reruns the whole script for every interaction, including the ones a
+browser session would handle as a page-fragment rerun, so the numbers are an
+upper bound for widget changes inside a page.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, time as dt_time, timedelta
+
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.run_benchmarks import RESULTS_DIR, git_commit
+from benchmarks.synthetic_data import SyntheticDataGenerator, write_csv
+from scripts.constants import DATA_PATHS, FAKE_SUPABASE_SETTINGS, TABLE_MAPPINGS
+from scripts.fake_supabase import FakeSupabaseConnection
+from scripts.storage_metrics import storage_metrics
+
+APP_PATH = os.path.join(PROJECT_ROOT, 'lumina_app.py')
+HISTORY_FILE = os.path.join(RESULTS_DIR, 'page_latency_history.csv')
+BACKENDS = ('csv', 'sqlite')
+SQLITE_FILE = 'lumina.sqlite'
+HISTORY_COLUMNS = [
+    'timestamp', 'commit', 'backend', 'days', 'rows', 'page', 'interaction', 'rounds', 'median_ms', 'min_ms', 'max_ms',
+    'storage_calls', 'rows_read', 'rows_written', 'bytes', 'exceptions'
+]
+
+# ===================== INTERACTIONS =====================
+# Each action changes widgets on the AppTest; the harness times the rerun.
+
+def _open_page(page):
+    def action(at):
+        next(box for box in at.sidebar.selectbox if box.label == "Select a page").set_value(page)
+    return action
+
+def _select_yesterday(at):
+    at.date_input(key='head_selector').set_value(date.today() - timedelta(days=1))
+
+def _select_today(at):
+    at.date_input(key='head_selector').set_value(date.today())
+
+def _set_activity_time(at):
+    at.time_input(key='act_time').set_value(dt_time(7, 30))
+
+def _choose_run(at):
+    at.selectbox(key='activity_type_select').set_value('Run')
+
+def _submit_activity(at):
+    next(box for box in at.text_input if box.label == "Duration (hh:mm:ss)").set_value('00:42:10')
+    next(box for box in at.number_input if box.label == "Distance (km)").set_value(8.2)
+    next(box for box in at.number_input if box.label == "Energy burned (kcal)").set_value(610)
+    at.button(key='FormSubmitter:activity_form-Submit Activity').click()
+
+def _set_meal_time(at):
+    at.time_input(key='food_time').set_value(dt_time(12, 15))
+
+def _add_recipe(at):
+    recipes = at.multiselect(key='find_recipie')
+    recipes.set_value(list(recipes.options[:1]))
+
+def _add_food_items(at):
+    foods = at.multiselect(key='create_meal')
+    foods.set_value(list(foods.options[:3]))
+
+def _register_meal(at):
+    # The keyed code input keeps its first (empty) value across AppTest reruns; type one like a user would
+    code_input = at.text_input(key='meal_code_input')
+    if not code_input.value:
+        code_input.set_value('650/40/70/20')
+    at.button(key='FormSubmitter:food_registration_form-Register Meal').click()
+
+def _search_recipe_foods(at):
+    foods = at.multiselect(key='add_meal')
+    foods.set_value(list(foods.options[:2]))
+
+def _select_recipe(at):
+    recipes = at.selectbox(key='recipie_delete_selector')
+    recipes.set_value(recipes.options[-1])
+
+def _select_month(at):
+    at.selectbox(key='summary_period').set_value('Month')
+
+# page -> [(interaction, action)]; pages are toured in this order
+SCENARIOS = {
+    'Dashboard': [
+        ('select date', _select_yesterday),
+        ('select today', _select_today)
+    ],
+    'Activity': [
+        ('open page', _open_page('Activity')),
+        ('set time', _set_activity_time),
+        ('choose activity', _choose_run),
+        ('submit activity', _submit_activity)
+    ],
+    'Meals': [
+        ('open page', _open_page('Meals')),
+        ('set time', _set_meal_time),
+        ('add recipe', _add_recipe),
+        ('add food items', _add_food_items),
+        ('register meal', _register_meal)
+    ],
+    'Database': [
+        ('open page', _open_page('Database')),
+        ('search food items', _search_recipe_foods)
+    ],
+    'Log book': [
+        ('open page', _open_page('Log book')),
+        ('select recipe', _select_recipe)
+    ],
+    'Summary': [
+        ('open page', _open_page('Summary')),
+        ('select month', _select_month)
+    ]
+}
+
+# ===================== DATASETS =====================
+
+def generate_dataset(days, directory, seed=0):
+    """Write a days-long synthetic data/ directory; returns the energy_balance row count"""
+    counts = write_csv(SyntheticDataGenerator(seed=seed), days, directory)
+    return counts['energy_balance']
+
+def csv_to_sqlite(directory, database):
+    """Load every table of directory/data/ into a stand-in SQLite database"""
+    connection = FakeSupabaseConnection(database)
+    for path in DATA_PATHS.values():
+        csv_path = os.path.join(directory, path)
+        if os.path.exists(csv_path):
+            connection.load_table(TABLE_MAPPINGS[path], pd.read_csv(csv_path).to_dict('records'))
+    connection.close()
+
+def _count_energy_rows(directory):
+    with open(os.path.join(directory, 'data', 'updated-database-results.csv')) as f:
+        return max(sum(1 for _ in f) - 1, 0)
+
+@contextmanager
+def _working_directory(path, fake_database=None):
+    """Run in path; with fake_database the app serves its tables from that SQLite file"""
+    previous, env_var = os.getcwd(), FAKE_SUPABASE_SETTINGS['env_var']
+    previous_database = os.environ.get(env_var)
+    os.chdir(path)
+    if fake_database:
+        os.environ[env_var] = fake_database
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+        if fake_database:
+            if previous_database is None:
+                os.environ.pop(env_var, None)
+            else:
+                os.environ[env_var] = previous_database
+
+def _reset_caches():
+    """Start a round as a freshly started server would"""
+    import streamlit as st
+    from scripts.data_storage import invalidate_cached_frame
+
+    invalidate_cached_frame()
+    st.cache_resource.clear()
+    st.cache_data.clear()
+
+# ===================== MEASUREMENT =====================
+
+def _storage_totals():
+    totals = {'calls': 0, 'rows_read': 0, 'rows_written': 0, 'bytes': 0}
+    for values in storage_metrics.snapshot('process').values():
+        for field in totals:
+            totals[field] += values[field]
+    return totals
+
+def _timed_run(at, action=None):
+    """(seconds, storage counter deltas, exception messages) for one rerun"""
+    before = _storage_totals()
+    started = time.perf_counter()
+    failures = []
+    try:
+        if action is not None:
+            action(at)
+        at.run()
+    except Exception as e:
+        # A missing widget or an AppTest timeout; keep touring the other pages
+        failures.append(f"{type(e).__name__}: {e}")
+    elapsed = time.perf_counter() - started
+    after = _storage_totals()
+    failures.extend(str(exception.value) for exception in at.exception)
+    return elapsed, {field: after[field] - before[field] for field in after}, failures
+
+def run_round(pages=None, timeout=60):
+    """Tour the pages in one fresh session; returns one record per interaction"""
+    from streamlit.testing.v1 import AppTest
+
+    # Deprecation notices would be repeated on every rerun (AppTest resets logger levels from its config)
+    logging.getLogger('streamlit.deprecation_util').disabled = True
+    _reset_caches()
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    records = []
+    elapsed, storage, failures = _timed_run(at)
+    records.append(dict(page='Dashboard', interaction='app start', seconds=elapsed, exceptions=failures, **storage))
+    for page, interactions in SCENARIOS.items():
+        if pages and page not in pages:
+            continue
+        for interaction, action in interactions:
+            elapsed, storage, failures = _timed_run(at, action)
+            records.append(dict(page=page, interaction=interaction, seconds=elapsed, exceptions=failures, **storage))
+    return records
+
+def summarize(round_records):
+    """Aggregate the per-round records of each interaction"""
+    grouped = {}
+    for records in round_records:
+        for record in records:
+            grouped.setdefault((record['page'], record['interaction']), []).append(record)
+
+    results = []
+    for (page, interaction), records in grouped.items():
+        timings = [record['seconds'] for record in records]
+        exceptions = sorted({message for record in records for message in record['exceptions']})
+        results.append({
+            'page': page,
+            'interaction': interaction,
+            'rounds': len(records),
+            'median_ms': round(statistics.median(timings) * 1000, 3),
+            'min_ms': round(min(timings) * 1000, 3),
+            'max_ms': round(max(timings) * 1000, 3),
+            # Storage work is the same every round; report the median anyway
+            'storage_calls': statistics.median(record['calls'] for record in records),
+            'rows_read': statistics.median(record['rows_read'] for record in records),
+            'rows_written': statistics.median(record['rows_written'] for record in records),
+            'bytes': statistics.median(record['bytes'] for record in records),
+            'exceptions': exceptions
+        })
+    return results
+
+def run(days_list=(365,), rounds=3, pages=None, data_dir=None, seed=0, timeout=60, backend='csv', verbose=True):
+    """Measure every dataset size; returns the result document"""
+    datasets = []
+    with tempfile.TemporaryDirectory(prefix='lumina_page_latency_') as scratch:
+        sources = []
+        if data_dir:
+            sources.append((None, os.path.abspath(data_dir)))
+        else:
+            for days in days_list:
+                template = os.path.join(scratch, f"template_{days}")
+                generate_dataset(days, template, seed)
+                sources.append((days, template))
+
+        for days, template in sources:
+            if backend == 'sqlite':
+                csv_to_sqlite(template, os.path.join(template, SQLITE_FILE))
+            round_records = []
+            for round_number in range(rounds):
+                # Interactions write (activity, meal), so every round starts from a clean copy
+                workdir = os.path.join(scratch, f"round_{round_number}")
+                shutil.rmtree(workdir, ignore_errors=True)
+                shutil.copytree(os.path.join(template, 'data'), os.path.join(workdir, 'data'))
+                fake_database = None
+                if backend == 'sqlite':
+                    fake_database = os.path.join(workdir, SQLITE_FILE)
+                    shutil.copyfile(os.path.join(template, SQLITE_FILE), fake_database)
+                with _working_directory(workdir, fake_database):
+                    round_records.append(run_round(pages, timeout))
+            results = summarize(round_records)
+            dataset = {'backend': backend, 'days': days, 'rows': _count_energy_rows(template), 'results': results}
+            datasets.append(dataset)
+            if verbose:
+                print(format_table(dataset))
+                print()
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'seed': seed,
+            'rounds': rounds,
+            'data_dir': data_dir
+        },
+        'datasets': datasets
+    }
+
+# ===================== OUTPUT =====================
+
+def format_table(dataset):
+    days = f"{dataset['days']} days" if dataset['days'] else 'data dir'
+    lines = [
+        f"{days}, {dataset['rows']} energy_balance rows, {dataset['backend']} backend",
+        f"{'page':<10} {'interaction':<18} {'median ms':>10} {'min ms':>9} {'max ms':>9} "
+        f"{'calls':>6} {'read':>8} {'written':>8}  exceptions"
+    ]
+    for r in dataset['results']:
+        lines.append(
+            f"{r['page']:<10} {r['interaction']:<18} {r['median_ms']:10.1f} {r['min_ms']:9.1f} {r['max_ms']:9.1f} "
+            f"{r['storage_calls']:6.0f} {r['rows_read']:8.0f} {r['rows_written']:8.0f}  {len(r['exceptions'])}"
+        )
+    return "\n".join(lines)
+
+def write_results(document, path=None):
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        suffix = f"_{document['meta']['commit']}" if document['meta']['commit'] else ''
+        path = os.path.join(RESULTS_DIR, f"page_latency_{time.strftime('%Y%m%d-%H%M%S')}{suffix}.json")
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+    return path
+
+def append_history(document, path=HISTORY_FILE):
+    """One CSV row per dataset and interaction, appended across runs"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    new_file = not os.path.exists(path)
+    with open(path, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=HISTORY_COLUMNS)
+        if new_file:
+            writer.writeheader()
+        for dataset in document['datasets']:
+            for record in dataset['results']:
+                writer.writerow({
+                    'timestamp': document['meta']['timestamp'],
+                    'commit': document['meta']['commit'],
+                    'backend': dataset['backend'],
+                    'days': dataset['days'],
+                    'rows': dataset['rows'],
+                    **{column: record[column] for column in HISTORY_COLUMNS[5:-1]},
+                    'exceptions': len(record['exceptions'])
+                })
+    return path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure per-interaction rerun latency of the app with AppTest")
+    parser.add_argument('--days', type=int, nargs='+', default=[365], help="history lengths to generate")
+    parser.add_argument('--data-dir', help="use this directory's data/ instead of generating (it is copied)")
+    parser.add_argument('--pages', nargs='+', choices=list(SCENARIOS), help="pages to tour (default: all)")
+    parser.add_argument('--backend', choices=BACKENDS, default='csv',
+                        help="csv files, or database mode against the SQLite Supabase stand-in")
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=60, help="seconds allowed per rerun")
+    parser.add_argument('--output', help="result file (default: benchmarks/results/page_latency_<timestamp>_<commit>.json)")
+    parser.add_argument('--history', default=HISTORY_FILE, help="CSV the results are appended to")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    document = run(args.days, args.rounds, args.pages, args.data_dir, args.seed, args.timeout, args.backend)
+    print(f"Results written to {write_results(document, args.output)}")
+    print(f"History appended to {append_history(document, args.history)}")
+    failed = any(record['exceptions'] for dataset in document['datasets'] for record in dataset['results'])
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+# run_benchmarks.py - Timing suite for the analytics functions
+"""
+Times the analytics hot paths on synthetic histories of 1 month, 1 year,
+5 years and 20 users x 1 year (see benchmarks/datasets.py), and stores the
+results as JSON so runs can be diffed:
+
+    python -m benchmarks.run_benchmarks                       # all, -> benchmarks/results/
+    python -m benchmarks.run_benchmarks --sizes 1_month 1_year --filter deficit
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/<baseline>.json
+
+--compare prints the ratio against a previous run and exits with status 1
+when any benchmark got slower than --threshold (default 1.25x).
+
+Before timing, the outputs are checked against the reference implementation
+(--reference, default HEAD) with benchmarks/equivalence.py; any difference
+also gives exit status 1. --skip-equivalence turns the check off.
+
+For the 20-user size one round calls the function once per user's frame.
+Only the call is timed; input copies are made before the clock starts, and
+every benchmark gets one untimed warm-up call.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date
+
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.datasets import SIZES, make_size
+from benchmarks.equivalence import check as check_equivalence
+from scripts.activity_summary import (
+    create_improved_energy_balance_chart, get_deficit_analysis, get_training_summary, get_weekly_summary
+)
+from scripts.data_dashboard import add_summary_to_dataset, calc_energy_deficite, datetime_to_string
+from scripts.data_storage import calc_accumulated_energy
+
+RESULTS_DIR = os.path.join(PROJECT_ROOT, 'benchmarks', 'results')
+TRAINING_ACTIVITIES = ['Walk', 'Run', 'Bike', 'Strength']
+
+def _today_args(df):
+    today = date.today()
+    return (df.copy(), datetime_to_string(today), today)
+
+# name -> (function, builds the call arguments from one user's frame)
+BENCHMARKS = {
+    'calc_accumulated_energy': (
+        calc_accumulated_energy, lambda df: (df.drop(columns=['energy_acc', 'protein_acc']),)
+    ),
+    'calc_energy_deficite': (calc_energy_deficite, _today_args),
+    'get_deficit_analysis': (get_deficit_analysis, lambda df: (df.copy(), date.today())),
+    'get_training_summary': (get_training_summary, lambda df: (df.copy(), TRAINING_ACTIVITIES)),
+    'get_weekly_summary': (get_weekly_summary, lambda df: (df.copy(),)),
+    'create_improved_energy_balance_chart': (create_improved_energy_balance_chart, lambda df: (df.copy(),)),
+    'add_summary_to_dataset': (add_summary_to_dataset, lambda df: (df.copy(),))
+}
+
+def time_benchmark(func, make_args, frames, min_rounds=3, max_rounds=20, min_time=0.5):
+    """Per-round timings in seconds (one round = one call per frame)"""
+    # Untimed warm-up: lazy imports (altair) and first-call caches
+    func(*make_args(frames[0]))
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < min_rounds or (len(timings) < max_rounds and time.perf_counter() - started < min_time):
+        call_args = [make_args(frame) for frame in frames]
+        elapsed = 0.0
+        for args in call_args:
+            call_started = time.perf_counter()
+            func(*args)
+            elapsed += time.perf_counter() - call_started
+        timings.append(elapsed)
+    return timings
+
+def summarize(name, size_name, frames, timings):
+    return {
+        'benchmark': name,
+        'size': size_name,
+        'rows': int(sum(len(frame) for frame in frames)),
+        'rounds': len(timings),
+        'min_s': min(timings),
+        'median_s': statistics.median(timings),
+        'mean_s': statistics.fmean(timings),
+        'stddev_s': statistics.stdev(timings) if len(timings) > 1 else 0.0
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(sizes=None, name_filter=None, min_rounds=3, max_rounds=20, min_time=0.5, seed=0, verbose=True):
+    """Run the selected benchmarks; returns the result document"""
+    results = []
+    for size_name in sizes or list(SIZES):
+        frames = make_size(size_name, seed=seed)
+        for name, (func, make_args) in BENCHMARKS.items():
+            if name_filter and name_filter not in name:
+                continue
+            timings = time_benchmark(func, make_args, frames, min_rounds, max_rounds, min_time)
+            record = summarize(name, size_name, frames, timings)
+            results.append(record)
+            if verbose:
+                print(f"{size_name:>9}  {name:<38} median {record['median_s'] * 1000:10.2f} ms  "
+                      f"({record['rows']} rows, {record['rounds']} rounds)")
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'seed': seed
+        },
+        'results': results
+    }
+
+def write_results(document, path=None):
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        suffix = f"_{document['meta']['commit']}" if document['meta']['commit'] else ''
+        path = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}{suffix}.json")
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+    return path
+
+def compare_results(baseline, current, threshold=1.25):
+    """Rows of (benchmark, size, baseline median, current median, ratio, regressed)"""
+    baseline_index = {(r['benchmark'], r['size']): r for r in baseline['results']}
+    rows = []
+    for record in current['results']:
+        previous = baseline_index.get((record['benchmark'], record['size']))
+        if previous is None:
+            continue
+        ratio = record['median_s'] / previous['median_s'] if previous['median_s'] else float('inf')
+        rows.append((record['benchmark'], record['size'], previous['median_s'], record['median_s'], ratio, ratio > threshold))
+    return rows
+
+def format_comparison(rows):
+    lines = [f"{'size':>9}  {'benchmark':<38} {'baseline ms':>12} {'current ms':>12} {'ratio':>7}"]
+    for name, size_name, before, after, ratio, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        lines.append(f"{size_name:>9}  {name:<38} {before * 1000:12.2f} {after * 1000:12.2f} {ratio:7.2f}{flag}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the analytics functions on synthetic histories")
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), help="history sizes to run (default: all)")
+    parser.add_argument('--filter', dest='name_filter', help="only benchmarks whose name contains this")
+    parser.add_argument('--output', help="result file (default: benchmarks/results/<timestamp>_<commit>.json)")
+    parser.add_argument('--compare', help="previous result file to compare against")
+    parser.add_argument('--threshold', type=float, default=1.25, help="slowdown ratio reported as a regression")
+    parser.add_argument('--min-rounds', type=int, default=3)
+    parser.add_argument('--max-rounds', type=int, default=20)
+    parser.add_argument('--min-time', type=float, default=0.5, help="seconds to keep repeating a benchmark")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--reference', default='HEAD', help="git revision the outputs are checked against")
+    parser.add_argument('--skip-equivalence', action='store_true', help="skip the output equivalence check")
+    args = parser.parse_args(argv)
+
+    equivalence = None
+    if not args.skip_equivalence:
+        equivalence = check_equivalence(args.sizes or list(SIZES), reference=args.reference, seed=args.seed)
+    document = run(args.sizes, args.name_filter, args.min_rounds, args.max_rounds, args.min_time, args.seed)
+    if equivalence is not None:
+        document['equivalence'] = {'reference': args.reference, 'results': equivalence}
+    print(f"Results written to {write_results(document, args.output)}")
+    status = 0
+    if equivalence is not None and not all(record['equivalent'] for record in equivalence):
+        print("Outputs differ from the reference implementation")
+        status = 1
+
+    if args.compare:
+        with open(args.compare) as f:
+            rows = compare_results(json.load(f), document, args.threshold)
+        print(format_comparison(rows))
+        if any(row[-1] for row in rows):
+            return 1
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
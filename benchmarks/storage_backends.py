@@ -0,0 +1,275 @@
+# storage_backends.py - Storage mode benchmark for data_storage
+"""
+Times the energy_balance operations the app performs through
+scripts/data_storage.py, for each storage mode and several history sizes:
+
+    cold_load            fetch_data_from_storage with the frame cache cleared
+    day_read             load_page_data('Activity', day) with the cache cleared
+    registration_write   add_registration for today (cache warm, as after a rerun)
+    day_delete           delete_item_from_dataset for one day (cache warm)
+    full_rewrite         save_data_to_storage of the whole table
+
+Storage modes are 'csv' and 'supabase'. The Supabase mode runs against the
+in-process stand-in from scripts/fake_supabase.py, once per injected
+round-trip latency:
+
+    python -m benchmarks.storage_backends                             # 30/365/1825 days, 0 and 20 ms
+    python -m benchmarks.storage_backends --days 365 --latency-ms 0 5 50 --rounds 5
+
+The table is reset (untimed) before every round of a mutating operation.
+A write that reports storage errors or writes no rows is marked invalid
+(valid: false, no timings) instead of being timed as a fast result.
+Results are printed and written as JSON next to the analytics results.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.datasets import make_energy_history
+from benchmarks.run_benchmarks import RESULTS_DIR, git_commit
+from scripts import data_storage
+from scripts.constants import DATA_PATHS, TABLE_MAPPINGS
+from scripts.data_dashboard import add_summary_to_dataset
+from scripts.fake_supabase import FakeSupabaseConnection
+from scripts.storage_metrics import storage_metrics
+
+ENERGY_PATH = DATA_PATHS['energy_data']
+ENERGY_TABLE = TABLE_MAPPINGS[ENERGY_PATH]
+BMR = 1350
+OPERATIONS = ('cold_load', 'day_read', 'registration_write', 'day_delete', 'full_rewrite')
+MUTATING_OPERATIONS = ('registration_write', 'day_delete')
+# Operations that must write rows; one that wrote none took an error path
+WRITE_OPERATIONS = MUTATING_OPERATIONS + ('full_rewrite',)
+
+# ===================== STORAGE MODES =====================
+
+class CsvMode:
+    """data/ CSV files in a scratch working directory"""
+
+    def __init__(self, workdir):
+        self.name = 'csv'
+        self.workdir = workdir
+
+    def __enter__(self):
+        self._previous_cwd = os.getcwd()
+        os.makedirs(os.path.join(self.workdir, os.path.dirname(ENERGY_PATH)), exist_ok=True)
+        os.chdir(self.workdir)
+        self._previous_mode = data_storage.USE_DATABASE
+        data_storage.USE_DATABASE = False
+        return self
+
+    def __exit__(self, *exc_info):
+        data_storage.USE_DATABASE = self._previous_mode
+        os.chdir(self._previous_cwd)
+
+    def load(self, df):
+        df.to_csv(ENERGY_PATH, index=False)
+        data_storage.invalidate_cached_frame()
+
+    def requests(self):
+        return 0
+
+class SupabaseMode:
+    """The database code path against FakeSupabaseConnection"""
+
+    def __init__(self, latency_ms):
+        self.name = f"supabase@{latency_ms:g}ms"
+        self.connection = FakeSupabaseConnection(latency=latency_ms / 1000.0)
+
+    def __enter__(self):
+        self._previous_mode = data_storage.USE_DATABASE
+        data_storage.USE_DATABASE = True
+        data_storage.set_supabase_connection(self.connection)
+        return self
+
+    def __exit__(self, *exc_info):
+        data_storage.set_supabase_connection(None)
+        data_storage.USE_DATABASE = self._previous_mode
+
+    def load(self, df):
+        self.connection.load_table(ENERGY_TABLE, df.to_dict('records'))
+        data_storage.invalidate_cached_frame()
+
+    def requests(self):
+        return self.connection.requests
+
+# ===================== OPERATIONS =====================
+
+def _registration(day):
+    return {
+        'date': datetime.strptime(day, '%Y-%m-%d').date(), 'time': datetime.strptime('18:30', '%H:%M').time(),
+        'label': 'TRAINING', 'energy': -450, 'pro': 0, 'carb': 0, 'fat': 0, 'activity': 'Run',
+        'distance': 7.5, 'duration': '00:40:00', 'pace': 5.3, 'steps': 0, 'note': 'benchmark'
+    }
+
+def _day_without_first_registration(cached, day):
+    """What the Log book passes to delete_item_from_dataset after one row is ticked"""
+    df_day = add_summary_to_dataset(cached[cached['date'] == day])
+    registrations = df_day.index[df_day['label'] != 'REST']
+    return df_day.drop(registrations[:1])
+
+def _prepare(operation, df):
+    """Untimed: put the cache in the state the operation is measured in"""
+    if operation in ('cold_load', 'day_read'):
+        data_storage.invalidate_cached_frame()
+        return None
+    # A warm cache, as on the rerun where the user saves
+    return data_storage.fetch_data_from_storage(ENERGY_PATH)
+
+def _operation(operation, cached, today, some_day):
+    if operation == 'cold_load':
+        return lambda: data_storage.fetch_data_from_storage(ENERGY_PATH)
+    if operation == 'day_read':
+        return lambda: data_storage.load_page_data('Activity', some_day)
+    if operation == 'registration_write':
+        return lambda: data_storage.add_registration(_registration(today), BMR)
+    if operation == 'day_delete':
+        return lambda: data_storage.delete_item_from_dataset(some_day, _day_without_first_registration(cached, some_day), BMR)
+    return lambda: data_storage.save_data_to_storage(cached, ENERGY_PATH)
+
+def _storage_counters():
+    totals = {'round_trips': 0, 'rows_read': 0, 'rows_written': 0, 'errors': 0}
+    for (_, _, table, _), values in storage_metrics.snapshot('process').items():
+        if table == ENERGY_TABLE:
+            for field in totals:
+                totals[field] += values[field]
+    return totals
+
+def _round_failure(operation, counters):
+    """Why a round did not do the work it was timed for, or None"""
+    # The storage functions report failures with st.error/print instead of raising
+    if counters['errors']:
+        return f"{counters['errors']} storage errors"
+    if operation in WRITE_OPERATIONS and counters['rows_written'] == 0:
+        return "no rows written"
+    return None
+
+def time_operation(mode, operation, df, rounds):
+    """
+    Per-round timings plus the storage counters of the last round; counters
+    ['failed_rounds'] and ['failure'] tell whether the timings are valid
+    """
+    dates = sorted(df['date'].unique())
+    today, some_day = dates[-1], dates[len(dates) // 2]
+    timings = []
+    failed_rounds, failure = 0, None
+    # The storage layer prints progress per call and per chunk
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(rounds):
+            if operation in MUTATING_OPERATIONS:
+                mode.load(df)
+            call = _operation(operation, _prepare(operation, df), today, some_day)
+            before, requests_before = _storage_counters(), mode.requests()
+            started = time.perf_counter()
+            call()
+            timings.append(time.perf_counter() - started)
+            after = _storage_counters()
+            counters = {field: after[field] - before[field] for field in after}
+            counters['requests'] = mode.requests() - requests_before
+            round_failure = _round_failure(operation, counters)
+            if round_failure:
+                failed_rounds += 1
+                failure = round_failure
+    counters.update(failed_rounds=failed_rounds, failure=failure)
+    return timings, counters
+
+def run(days_list=(30, 365, 1825), latencies_ms=(0, 20), rounds=3, operations=None, seed=0, verbose=True):
+    """Time every operation for every mode and size; returns the result document"""
+    results = []
+    with tempfile.TemporaryDirectory(prefix='lumina_storage_bench_') as scratch:
+        for days in days_list:
+            df = make_energy_history(days, seed=seed)
+            modes = [CsvMode(os.path.join(scratch, f"csv_{days}"))] + [SupabaseMode(ms) for ms in latencies_ms]
+            for mode in modes:
+                with mode:
+                    mode.load(df)
+                    for operation in operations or OPERATIONS:
+                        timings, counters = time_operation(mode, operation, df, rounds)
+                        valid = counters['failed_rounds'] == 0
+                        record = {
+                            'mode': mode.name,
+                            'operation': operation,
+                            'days': days,
+                            'rows': len(df),
+                            'rounds': len(timings),
+                            'valid': valid,
+                            # Timings of an error path are not timings of the operation
+                            'min_s': min(timings) if valid else None,
+                            'median_s': statistics.median(timings) if valid else None,
+                            **counters
+                        }
+                        results.append(record)
+                        if verbose and not valid:
+                            print(f"{days:>5}d  {mode.name:<16} {operation:<20} FAILED in {counters['failed_rounds']}"
+                                  f"/{len(timings)} rounds ({counters['failure']})")
+                        elif verbose:
+                            print(f"{days:>5}d  {mode.name:<16} {operation:<20} median {record['median_s'] * 1000:10.2f} ms  "
+                                  f"({record['round_trips']} round trips, {record['rows_written']} rows written)")
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'seed': seed,
+            'latencies_ms': list(latencies_ms)
+        },
+        'results': results
+    }
+
+def format_table(document):
+    """Median milliseconds, one row per size and operation, one column per mode (NaN: failed)"""
+    df = pd.DataFrame(document['results'])
+    df['median_s'] = pd.to_numeric(df['median_s'])
+    table = df.pivot_table(index=['days', 'operation'], columns='mode', values='median_s', sort=False,
+                           dropna=False) * 1000
+    return table.round(1).to_string()
+
+def write_results(document, path=None):
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        suffix = f"_{document['meta']['commit']}" if document['meta']['commit'] else ''
+        path = os.path.join(RESULTS_DIR, f"storage_backends_{time.strftime('%Y%m%d-%H%M%S')}{suffix}.json")
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2, default=int)
+    return path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the storage operations per storage mode and history size")
+    parser.add_argument('--days', type=int, nargs='+', default=[30, 365, 1825], help="history lengths")
+    parser.add_argument('--latency-ms', type=float, nargs='+', default=[0, 20],
+                        help="injected round-trip latency of the Supabase stand-in")
+    parser.add_argument('--operations', nargs='+', choices=OPERATIONS, help="operations to time (default: all)")
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--output', help="result file (default: benchmarks/results/storage_backends_<timestamp>_<commit>.json)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    document = run(args.days, args.latency_ms, args.rounds, args.operations, args.seed)
+    print()
+    print(format_table(document))
+    print(f"Results written to {write_results(document, args.output)}")
+    failed = [record for record in document['results'] if not record['valid']]
+    if failed:
+        print(f"{len(failed)} operations failed: " + ', '.join(
+            f"{record['mode']} {record['operation']} ({record['failure']})" for record in failed
+        ))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
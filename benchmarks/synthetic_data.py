@@ -0,0 +1,364 @@
+# synthetic_data.py - Seeded synthetic datasets for load and scale testing
+"""
+Generates plausible data for every table the app uses:
+
+- livsmedelsdatabas: the shipped food database scaled up with jittered variants
+- recipie_databas: recipes built from those foods, with codes as code_detector computes them
+- meal_templates / meal_databas / meal_stats: meals made of 1-3 recipes and a log of every meal eaten
+  (roughly 1800-3200 kcal a day)
+- energy_balance: hourly BMR rows, the logged meals and walks, runs, bike rides
+  and strength sessions with distance, duration, pace and steps
+
+The same seed always gives the same data. energy_balance is generated in
+chunks of whole days with vectorized numpy, so histories of tens of millions
+of rows are streamed to the backend without being held in memory:
+
+    python -m benchmarks.synthetic_data --days 1825 --output /tmp/lumina-5y
+    python -m benchmarks.synthetic_data --rows 20000000 --users 20 --output /tmp/lumina-20m
+    python -m benchmarks.synthetic_data --days 365 --backend database   # the configured Supabase project
+
+CSV output mirrors the app's data/ directory (one directory per user when
+--users > 1), so the app can be started from the output directory.
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from scripts.constants import DATA_PATHS, TABLE_MAPPINGS
+from scripts.meal_log import MEAL_LOG_COLUMNS, MEAL_STATS_COLUMNS, MEAL_TEMPLATE_COLUMNS, meal_content_hash
+
+ENERGY_COLUMNS = [
+    'date', 'time', 'label', 'activity', 'distance', 'energy', 'energy_acc', 'pro', 'protein_acc',
+    'carb', 'fat', 'note', 'summary', 'duration', 'pace', 'steps'
+]
+
+# Average rows per simulated day (24 BMR + ~3.5 meals + ~1.2 sessions)
+ROWS_PER_DAY = 28.7
+
+NUTRIENTS = ['calorie', 'protein', 'carb', 'fat']
+
+# 'HH:MM' for every minute of the day, indexed by minute
+_CLOCK = np.array([f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(24 * 60)], dtype=object)
+
+# kind -> (probability, minutes range, km/h range or None, kcal per minute, steps per km)
+TRAINING_KINDS = {
+    'Walk': (0.50, (20, 75), (4.0, 6.5), 4.5, 1400),
+    'Run': (0.20, (20, 70), (8.0, 13.0), 10.5, 1100),
+    'Bike': (0.15, (25, 120), (15.0, 28.0), 8.0, 0),
+    'Strength': (0.15, (25, 60), None, 6.0, 0)
+}
+
+# Meal slots (minutes after midnight) for days with 3 and 4 meals
+_MEAL_SLOTS = {3: [7 * 60, 12 * 60, 18 * 60 + 30], 4: [7 * 60, 12 * 60, 15 * 60 + 30, 18 * 60 + 30]}
+
+def _code(calories, protein, carb, fat):
+    return f"{calories}/{protein}/{carb}/{fat}"
+
+def _scale_items(items, nutrients_by_food, target_calories):
+    """Scale gram amounts (to 5 g) so the items add up to about target_calories"""
+    calories = sum(nutrients_by_food[food][0] * grams / 100 for food, grams in items)
+    factor = target_calories / calories if calories > 0 else 1.0
+    return [(food, float(max(5, round(grams * factor / 5) * 5))) for food, grams in items]
+
+def _items_code(items, nutrients_by_food):
+    """Nutrition code of (food, grams) items, truncated per item like code_detector"""
+    totals = [0, 0, 0, 0]
+    for food, grams in items:
+        values = nutrients_by_food[food]
+        for position in range(4):
+            totals[position] = int(totals[position] + float(values[position]) * (grams / 100))
+    return totals
+
+class SyntheticDataGenerator:
+    """Seeded generator for a complete app dataset"""
+
+    def __init__(self, seed=0, food_items=5000, recipes=150, meal_templates=400, bmr=1350, end_date=None,
+                 base_food_path=None):
+        self.seed = seed
+        self.bmr = bmr
+        self.end_date = end_date or date.today()
+        rng = np.random.default_rng([seed, 0])
+
+        # The shipped food database, wherever the generator is run from
+        base_food_path = base_food_path or os.path.join(PROJECT_ROOT, DATA_PATHS['food_database'])
+        self.food_database = self._build_food_database(rng, food_items, base_food_path)
+        nutrients_by_food = dict(zip(
+            self.food_database['livsmedel'], self.food_database[NUTRIENTS].to_numpy(dtype=float)
+        ))
+        self.recipe_database, recipe_items = self._build_recipes(rng, recipes, nutrients_by_food)
+        self.meal_templates, self.meals = self._build_meals(rng, meal_templates, recipe_items, nutrients_by_food)
+
+    # ---------------- reference tables ----------------
+
+    def _build_food_database(self, rng, food_items, base_food_path):
+        if os.path.exists(base_food_path):
+            df_base = pd.read_csv(base_food_path)[['livsmedel'] + NUTRIENTS].dropna()
+        else:
+            df_base = pd.DataFrame({'livsmedel': ['Havregryn', 'Mjölk', 'Ägg', 'Potatis', 'Kyckling'],
+                                    'calorie': [370, 64, 140, 77, 120], 'protein': [13, 3.4, 12.5, 2, 23],
+                                    'carb': [58, 4.8, 0.5, 17, 0], 'fat': [7, 3.6, 9.9, 0.1, 2.5]})
+        df_base = df_base.drop_duplicates('livsmedel').reset_index(drop=True)
+        if food_items <= len(df_base):
+            return df_base.iloc[:food_items].reset_index(drop=True)
+
+        extra = food_items - len(df_base)
+        source = rng.integers(len(df_base), size=extra)
+        jitter = rng.uniform(0.9, 1.1, size=(extra, len(NUTRIENTS)))
+        df_variants = pd.DataFrame(
+            np.round(df_base[NUTRIENTS].to_numpy(dtype=float)[source] * jitter, 1), columns=NUTRIENTS
+        )
+        df_variants.insert(0, 'livsmedel', [f"{df_base['livsmedel'].iloc[s]} (v{i + 2})" for i, s in enumerate(source)])
+        return pd.concat([df_base, df_variants], ignore_index=True)
+
+    def _build_recipes(self, rng, recipes, nutrients_by_food):
+        foods = self.food_database['livsmedel'].to_numpy()
+        rows, recipe_items = [], []
+        for number in range(recipes):
+            chosen = rng.choice(foods, size=int(rng.integers(2, 6)), replace=False)
+            items = [(str(food), float(rng.integers(2, 30) * 5)) for food in chosen]
+            # Recipes are portion sized: about 250-450 kcal
+            items = _scale_items(items, nutrients_by_food, rng.uniform(250, 450))
+            name = f"Recipe {number + 1:04d} {items[0][0].split(' ')[0].split(',')[0]}"
+            code = _code(*_items_code(items, nutrients_by_food))
+            favorite = bool(rng.random() < 0.1)
+            rows.extend({'name': name, 'livsmedel': food, 'amount': grams, 'code': code, 'favorite': favorite}
+                        for food, grams in items)
+            recipe_items.append((name, items))
+        return pd.DataFrame(rows, columns=['name', 'livsmedel', 'amount', 'code', 'favorite']), recipe_items
+
+    def _build_meals(self, rng, meal_templates, recipe_items, nutrients_by_food):
+        template_rows, meals, seen = [], [], set()
+        for _ in range(meal_templates):
+            picked = rng.choice(len(recipe_items), size=int(rng.choice([1, 1, 2, 2, 3])), replace=False)
+            name = '/'.join(recipe_items[i][0] for i in picked)
+            items = [item for i in picked for item in recipe_items[i][1]]
+            df_items = pd.DataFrame(items, columns=['livsmedel', 'amount'])
+            template_id = meal_content_hash(df_items)
+            if template_id in seen:
+                continue
+            seen.add(template_id)
+            template_rows.extend({'template_id': template_id, 'livsmedel': food, 'amount': grams} for food, grams in items)
+            calories, protein, carb, fat = _items_code(items, nutrients_by_food)
+            meals.append({'name': name, 'template_id': template_id, 'code': _code(calories, protein, carb, fat),
+                          'calorie': calories, 'protein': protein, 'carb': carb, 'fat': fat})
+        return pd.DataFrame(template_rows, columns=MEAL_TEMPLATE_COLUMNS), pd.DataFrame(meals)
+
+    # ---------------- energy_balance ----------------
+
+    def energy_chunks(self, days, chunk_days=365, user=0):
+        """
+        Yield (energy_balance, meal log) frames of up to chunk_days whole days,
+        oldest first, for a history of days days ending at end_date
+        """
+        start = np.datetime64(self.end_date - timedelta(days=days - 1))
+        for chunk_index, first_day in enumerate(range(0, days, chunk_days)):
+            chunk_len = min(chunk_days, days - first_day)
+            rng = np.random.default_rng([self.seed, 1, user, chunk_index])
+            dates = np.datetime_as_string(start + np.arange(first_day, first_day + chunk_len), unit='D').astype(object)
+            yield self._energy_chunk(rng, dates)
+
+    def _energy_chunk(self, rng, dates):
+        n_days = len(dates)
+
+        # Hourly BMR
+        hourly_bmr = -round(self.bmr / 24.0, 1)
+        rest = {
+            'date': np.repeat(dates, 24), 'minute': np.tile(np.arange(24) * 60, n_days),
+            'label': 'REST', 'activity': 'Bmr', 'distance': 0.0, 'energy': hourly_bmr,
+            'pro': 0.0, 'carb': 0.0, 'fat': 0.0, 'note': '0', 'duration': '00:00:00', 'pace': 0.0, 'steps': 0.0,
+            'order': 1
+        }
+
+        # Meals: 3 or 4 a day at jittered slot times
+        meal_counts = rng.integers(3, 5, size=n_days)
+        meal_day = np.repeat(np.arange(n_days), meal_counts)
+        slot = np.arange(len(meal_day)) - np.repeat(np.cumsum(meal_counts) - meal_counts, meal_counts)
+        slot_minutes = np.where(
+            np.repeat(meal_counts, meal_counts) == 4,
+            np.array(_MEAL_SLOTS[4])[slot],
+            np.array(_MEAL_SLOTS[3] + [0])[np.minimum(slot, 3)]
+        )
+        meal_minutes = np.clip(slot_minutes + rng.integers(-45, 46, size=len(meal_day)), 0, 24 * 60 - 1)
+        meal_pick = rng.integers(len(self.meals), size=len(meal_day))
+        meals = self.meals.iloc[meal_pick]
+        food = {
+            'date': dates[meal_day], 'minute': meal_minutes, 'label': 'FOOD', 'activity': 'Eat', 'distance': 0.0,
+            'energy': meals['calorie'].to_numpy(dtype=float), 'pro': meals['protein'].to_numpy(dtype=float),
+            'carb': meals['carb'].to_numpy(dtype=float), 'fat': meals['fat'].to_numpy(dtype=float),
+            'note': meals['name'].to_numpy(), 'duration': '00:00:00', 'pace': 0.0, 'steps': 0.0, 'order': 2
+        }
+
+        # Training: 0-2 sessions a day
+        session_counts = rng.choice([0, 1, 1, 2], size=n_days)
+        session_day = np.repeat(np.arange(n_days), session_counts)
+        n_sessions = len(session_day)
+        kinds = np.array(list(TRAINING_KINDS))
+        kind_index = rng.choice(len(kinds), size=n_sessions, p=[spec[0] for spec in TRAINING_KINDS.values()])
+        minutes_low = np.array([spec[1][0] for spec in TRAINING_KINDS.values()])[kind_index]
+        minutes_high = np.array([spec[1][1] for spec in TRAINING_KINDS.values()])[kind_index]
+        duration_min = rng.integers(minutes_low, minutes_high + 1)
+        speed_low = np.array([(spec[2] or (0, 0))[0] for spec in TRAINING_KINDS.values()])[kind_index]
+        speed_high = np.array([(spec[2] or (0, 0))[1] for spec in TRAINING_KINDS.values()])[kind_index]
+        distance = np.round(rng.uniform(speed_low, np.maximum(speed_high, speed_low)) * duration_min / 60.0, 2)
+        pace = np.round(np.divide(duration_min, distance, out=np.zeros(n_sessions), where=distance > 0), 2)
+        steps = np.round(distance * np.array([spec[4] for spec in TRAINING_KINDS.values()])[kind_index])
+        kcal_per_minute = np.array([spec[3] for spec in TRAINING_KINDS.values()])[kind_index]
+        energy = -np.round(duration_min * kcal_per_minute * rng.uniform(0.8, 1.2, size=n_sessions))
+        session_kinds = kinds[kind_index]
+        notes = np.where(session_kinds == 'Walk', np.char.add('Steps ', steps.astype(int).astype(str)), '')
+        notes = np.where(session_kinds == 'Strength', 'Strength session', notes)
+        notes = np.where(session_kinds == 'Bike', 'TRIP', notes)
+        durations = np.char.add(np.char.add(np.char.zfill((duration_min // 60).astype(str), 2), ':'),
+                                np.char.zfill((duration_min % 60).astype(str), 2))
+        training = {
+            'date': dates[session_day], 'minute': rng.integers(5 * 60, 21 * 60, size=n_sessions),
+            'label': 'TRAINING', 'activity': session_kinds.astype(object), 'distance': distance, 'energy': energy,
+            'pro': 0.0, 'carb': 0.0, 'fat': 0.0, 'note': notes.astype(object),
+            'duration': np.char.add(durations, ':00').astype(object), 'pace': pace, 'steps': steps, 'order': 0
+        }
+
+        df = pd.concat([pd.DataFrame(rest), pd.DataFrame(food), pd.DataFrame(training)], ignore_index=True)
+        df = df.sort_values(['date', 'minute', 'order'], kind='stable', ignore_index=True)
+        df['time'] = _CLOCK[df['minute'].to_numpy()]
+        df['energy_acc'] = df.groupby('date', sort=False)['energy'].cumsum().round(1)
+        df['protein_acc'] = df.groupby('date', sort=False)['pro'].cumsum()
+        df['summary'] = np.nan
+        df_energy = df[ENERGY_COLUMNS]
+
+        df_food = df[df['label'] == 'FOOD']
+        meal_lookup = self.meals.set_index('name')
+        df_meal_log = pd.DataFrame({
+            'date': df_food['date'].to_numpy(),
+            'time': df_food['time'].to_numpy(),
+            'name': df_food['note'].to_numpy(),
+            'template_id': meal_lookup.loc[df_food['note'], 'template_id'].to_numpy(),
+            'code': meal_lookup.loc[df_food['note'], 'code'].to_numpy(),
+            'favorite': False
+        }, columns=MEAL_LOG_COLUMNS)
+        return df_energy, df_meal_log
+
+    def energy_history(self, days, user=0):
+        """Whole energy_balance history in memory (for small sizes)"""
+        return pd.concat([energy for energy, _ in self.energy_chunks(days, user=user)], ignore_index=True)
+
+    @staticmethod
+    def meal_stats(df_meal_log):
+        """Quick pick counters (count-based score) for a meal log"""
+        if df_meal_log.empty:
+            return pd.DataFrame(columns=MEAL_STATS_COLUMNS)
+        df_last = df_meal_log.sort_values(['date', 'time']).groupby('name').agg(
+            count=('date', 'size'), last_date=('date', 'last'), last_time=('time', 'last')
+        ).reset_index()
+        df_last['kind'] = 'meal'
+        df_last['score'] = df_last['count'].astype(float)
+        df_last['last_used'] = df_last['last_date'] + 'T' + df_last['last_time'] + ':00'
+        return df_last[MEAL_STATS_COLUMNS]
+
+# ===================== WRITERS =====================
+
+def _csv_path(output_dir, key):
+    return os.path.join(output_dir, DATA_PATHS[key])
+
+def write_csv(generator, days, output_dir, user=0, chunk_days=365):
+    """Write a complete data/ directory under output_dir; returns row counts per table"""
+    os.makedirs(os.path.join(output_dir, os.path.dirname(DATA_PATHS['energy_data'])), exist_ok=True)
+    generator.food_database.to_csv(_csv_path(output_dir, 'food_database'), index=False)
+    generator.recipe_database.to_csv(_csv_path(output_dir, 'recipe_database'), index=False)
+    generator.meal_templates.to_csv(_csv_path(output_dir, 'meal_templates'), index=False)
+
+    counts = {'energy_balance': 0, 'meal_databas': 0}
+    meal_stats_parts = []
+    energy_path, meal_path = _csv_path(output_dir, 'energy_data'), _csv_path(output_dir, 'meal_database')
+    for chunk_number, (df_energy, df_meal_log) in enumerate(generator.energy_chunks(days, chunk_days, user)):
+        first = chunk_number == 0
+        df_energy.to_csv(energy_path, index=False, mode='w' if first else 'a', header=first)
+        df_meal_log.to_csv(meal_path, index=False, mode='w' if first else 'a', header=first)
+        counts['energy_balance'] += len(df_energy)
+        counts['meal_databas'] += len(df_meal_log)
+        meal_stats_parts.append(df_meal_log[['date', 'time', 'name']])
+
+    generator.meal_stats(pd.concat(meal_stats_parts, ignore_index=True)).to_csv(
+        _csv_path(output_dir, 'meal_stats'), index=False
+    )
+    counts.update(livsmedelsdatabas=len(generator.food_database), recipie_databas=len(generator.recipe_database),
+                  meal_templates=len(generator.meal_templates))
+    return counts
+
+def write_database(generator, days, chunk_days=365):
+    """Replace the Supabase tables with the dataset (energy_balance streamed in chunks)"""
+    from scripts.data_storage import (append_to_database, get_supabase_connection, prepare_energy_data,
+                                      save_all_to_database)
+
+    conn = get_supabase_connection()
+    table = {key: TABLE_MAPPINGS[path] for key, path in DATA_PATHS.items()}
+    save_all_to_database(generator.food_database, table['food_database'])
+    save_all_to_database(generator.recipe_database, table['recipe_database'])
+    save_all_to_database(generator.meal_templates, table['meal_templates'])
+
+    counts = {'energy_balance': 0, 'meal_databas': 0}
+    meal_stats_parts = []
+    for chunk_number, (df_energy, df_meal_log) in enumerate(generator.energy_chunks(days, chunk_days)):
+        write = save_all_to_database if chunk_number == 0 else append_to_database
+        # Same cleaning as sync_csv_to_database: user_id, HH:MM:SS times, no NaN, no duration column
+        df_energy_clean = prepare_energy_data(df_energy, conn)
+        if not write(df_energy_clean, table['energy_data']) or not write(df_meal_log, table['meal_database']):
+            raise RuntimeError(f"Writing chunk {chunk_number} to the database failed")
+        counts['energy_balance'] += len(df_energy)
+        counts['meal_databas'] += len(df_meal_log)
+        meal_stats_parts.append(df_meal_log[['date', 'time', 'name']])
+
+    save_all_to_database(generator.meal_stats(pd.concat(meal_stats_parts, ignore_index=True)), table['meal_stats'])
+    return counts
+
+def days_for_rows(rows, users=1):
+    """History length giving roughly rows energy_balance rows over all users"""
+    return max(1, math.ceil(rows / (ROWS_PER_DAY * users)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic dataset")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument('--days', type=int, default=365, help="days of history per user")
+    size.add_argument('--rows', type=int, help="approximate energy_balance rows over all users")
+    parser.add_argument('--users', type=int, default=1, help="independent histories (CSV: one directory each)")
+    parser.add_argument('--backend', choices=['csv', 'database'], default='csv')
+    parser.add_argument('--output', default='synthetic_data', help="output directory for the csv backend")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--food-items', type=int, default=5000)
+    parser.add_argument('--recipes', type=int, default=150)
+    parser.add_argument('--meal-templates', type=int, default=400)
+    parser.add_argument('--chunk-days', type=int, default=365)
+    args = parser.parse_args(argv)
+
+    days = days_for_rows(args.rows, args.users) if args.rows else args.days
+    generator = SyntheticDataGenerator(args.seed, args.food_items, args.recipes, args.meal_templates)
+    started = time.perf_counter()
+
+    if args.backend == 'database':
+        if args.users > 1:
+            parser.error("the database backend holds a single user's history")
+        counts = write_database(generator, days, args.chunk_days)
+        print(f"Database: {counts}")
+    else:
+        for user in range(args.users):
+            output_dir = args.output if args.users == 1 else os.path.join(args.output, f"user_{user:03d}")
+            counts = write_csv(generator, days, output_dir, user, args.chunk_days)
+            print(f"{output_dir}: {counts}")
+    print(f"Generated {days} days x {args.users} user(s) in {time.perf_counter() - started:.1f} s")
+
+if __name__ == '__main__':
+    main()
+
+__all__ = [
+    'ENERGY_COLUMNS', 'ROWS_PER_DAY', 'TRAINING_KINDS', 'SyntheticDataGenerator',
+    'write_csv', 'write_database', 'days_for_rows'
+]
@@ -1,3 +1,5 @@
+from scripts.startup_profile import STARTUP_PROFILE_ENABLED, mark_startup, get_startup_marks, get_loaded_deferred_modules
+import os
 import streamlit as st
 import pandas as pd
 
@@ -9,11 +11,19 @@ from scripts.state_management import (
     init_state, get_user_settings, update_user_settings, 
     show_notifications, clear_all_notifications, state_manager
 )
-from scripts.ui_components import create_data_table
-from scripts.constants import APP_NAME, APP_ICON, get_table_config
+from scripts.ui_components import create_data_table, rerun_fragment
+from scripts.performance import (
+    track_performance, begin_rerun, end_rerun, instrument_page, show_performance_panel, performance_tracker
+)
+from scripts.storage_metrics import export_storage_metrics, get_export_path, show_storage_metrics_panel
+from scripts.metrics import export_metrics, get_metrics_export_path, start_metrics_server
+from scripts.constants import APP_NAME, APP_ICON, DATA_PATHS, PAGE_DATA_DEPENDENCIES, get_table_config
+from scripts.memory_diagnostics import MEMORY_DIAGNOSTICS_ENABLED, start_tracing
+from scripts.fake_supabase import fake_supabase_enabled
 
 try:
-    from scripts.data_storage import fetch_data_from_storage, save_data_to_storage, delete_item_from_dataset, sync_csv_to_database
+    from scripts.data_storage import fetch_data_from_storage, save_data_to_storage, delete_item_from_dataset, sync_csv_to_database, load_page_data
+    from scripts.data_storage import get_cached_row_count
     import scripts.data_storage as ds
 
     from scripts.data_dashboard import calc_bmr, date_time_now, time_now, time_to_string, datetime_to_string
@@ -22,13 +32,15 @@ try:
     from scripts.data_dashboard import energy_differ, energy_balance_at_current_time
 
     from scripts.nutritions import locate_eatables, code_detector 
+    from scripts.reference_data import get_food_reference, get_recipe_reference
 except ImportError as e:
     st.error(f"Failed to import required modules: {e}")
     st.stop()
 
 from scripts.forms import (
     create_new_form_activity, create_new_form_food, create_form_add_recipie_to_database,
-    create_form_add_food_item_to_database, create_copy_previous_meal_section, get_copied_meal_items
+    create_form_add_food_item_to_database, create_copy_previous_meal_section, create_quick_picks_section,
+    get_copied_meal_items
 )
 
 from scripts.activity_summary import (
@@ -37,8 +49,13 @@ from scripts.activity_summary import (
     get_available_activities, format_time_period
 )
 
+mark_startup('app_imports')
+begin_rerun()
+
 # ===================== DATA STORAGE CONFIGURATION =====================
 USE_DATABASE = False  # Set this to True to use Supabase database, False to use CSV files
+# The offline Supabase stand-in (LUMINA_FAKE_SUPABASE=<sqlite file>) runs the database code paths
+USE_DATABASE = USE_DATABASE or fake_supabase_enabled()
 ds.USE_DATABASE = USE_DATABASE
 
 # ===================== APP CONFIGURATION =====================
@@ -79,15 +96,18 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# ===================== DATA LOADING WITH ERROR HANDLING =====================
-@handle_errors("data loading", show_user_error=True, fallback_value=pd.DataFrame())
-def load_energy_data():
-    """Load energy data with error handling"""
-    with loading_indicator("Loading energy data..."):
-        return fetch_data_from_storage('data/updated-database-results.csv')
+def page_data_rows(page_name):
+    """Rows of the tables page_name depends on (names profile files)"""
+    return sum(get_cached_row_count(DATA_PATHS[source]) for source in PAGE_DATA_DEPENDENCIES.get(page_name, {}))
 
-# Load main data
-df_energy = load_energy_data()
+# ===================== DATA LOADING WITH ERROR HANDLING =====================
+# Each page loads only what it declares in PAGE_DATA_DEPENDENCIES, so e.g. the
+# Database page never touches the energy history
+@handle_errors("data loading", show_user_error=True, fallback_value={})
+def load_data_for_page(page_name):
+    """Load the tables a page depends on with error handling"""
+    with loading_indicator("Loading data..."):
+        return load_page_data(page_name, selected_date)
 
 # ===================== MAIN HEADER =====================
 st.subheader('Emelie Chandni Jutvik')
@@ -97,7 +117,8 @@ show_notifications()
 
 # ===================== IMPROVED SIDEBAR WITH VALIDATION AND DATABASE SYNC =====================
 with st.sidebar:
-    st.image("lumina_1.png")
+    # Relative to the app, so it also shows when started from a generated data directory
+    st.image(os.path.join(os.path.dirname(os.path.abspath(__file__)), "lumina_1.png"))
 
     # Storage method indicator
     storage_method = "🗄️ Database (Supabase)" if USE_DATABASE else "📄 CSV Files"
@@ -162,11 +183,18 @@ with st.sidebar:
     st.markdown("#### Navigation")
 
 # ===================== ALL ORIGINAL PAGE FUNCTIONS WITH ENHANCEMENTS =====================
+# Every page runs as a fragment: widget interactions inside a page rerun only
+# that page (not the data loading and sidebar above). Saves call st.rerun()
+# which reruns the full app so the sidebar and loaded data are refreshed.
 
+@st.fragment
 @handle_errors("dashboard creation")
+@instrument_page("Dashboard", lambda: page_data_rows("Dashboard"))
+@track_performance("dashboard", category="render")
 def create_dashobard():  # Keeping original function name
     """ORIGINAL dashboard function with error handling enhancements"""
     state_manager.set_page('Dashboard')
+    df_energy = load_data_for_page('Dashboard').get('energy_data', pd.DataFrame())
     
     col = st.columns((5.5, 5.5), gap='medium') 
     with col[0]: 
@@ -282,17 +310,17 @@ def create_dashobard():  # Keeping original function name
                 st.caption("_:blue[Nutrition intake]_ for registered meals at selected day")
                 st.bar_chart(df_nutritions_labeled, x="time", y="nutrient", color="label")
 
+@st.fragment
 @handle_errors("activity registration page")
+@instrument_page("Activity", lambda: page_data_rows("Activity"))
+@track_performance("activity page", category="render")
 def create_page_activity_registration():
     """ORIGINAL activity registration with improvements"""
     state_manager.set_page('Activity')
+    # Already narrowed to the selected date by the page data dependencies
+    df_energy_date = load_data_for_page('Activity').get('energy_data', pd.DataFrame())
     
     col = st.columns((5.5, 5.5), gap='medium') 
-    df_energy_date = safe_dataframe_operation(
-        df_energy, 
-        lambda df: df[df['date'] == selected_date],
-        fallback_df=pd.DataFrame()
-    )
     
     if len(df_energy_date) != 0:            
         df_activity_irl = add_summary_to_dataset(df_energy_date)
@@ -320,10 +348,14 @@ def create_page_activity_registration():
         # USING IMPROVED FORM WITH VALIDATION
         create_new_form_activity(bmr)
 
-@handle_errors("meal registration page")  
+@st.fragment
+@handle_errors("meal registration page")
+@instrument_page("Meals", lambda: page_data_rows("Meals"))
+@track_performance("meal page", category="render")
 def create_page_meal_registration():
     """Modified compact version of your existing meal registration"""
     state_manager.set_page('Meals')
+    df_energy = load_data_for_page('Meals').get('energy_data', pd.DataFrame())
     
     # Handle meal widget clearing after successful food submission (unchanged)
     if st.session_state.get('clear_meal_widgets', False):
@@ -406,7 +438,11 @@ def create_page_meal_registration():
                     del st.session_state.selected_previous_meal
                 if 'copied_meal_items' in st.session_state:
                     st.session_state.copied_meal_items = []
-                st.rerun()
+                rerun_fragment()
+        
+        # Quick Picks - most used meals and recipes
+        with st.expander("Quick Picks", expanded=False):
+            create_quick_picks_section()
         
         # 1. Copy Previous Meal Section
         with st.expander("Copy Previous Meal", expanded=False):
@@ -415,8 +451,8 @@ def create_page_meal_registration():
         # 2. Add Recipe Section
         with st.expander("Add Recipe", expanded=False):
             st.caption("Type in a recipie name that you want to add to your meal")  
-            df_recipie_db = fetch_data_from_storage('data/recipie_databas.csv').sort_values(['name'])
-            recipie_list = df_recipie_db['name'].unique()
+            recipe_reference = get_recipe_reference()
+            recipie_list = recipe_reference.names
 
             st.multiselect(
                 "Select recipies to add to your meal",
@@ -448,8 +484,7 @@ def create_page_meal_registration():
         # 3. Add Food Items Section
         with st.expander("Add Food Items", expanded=False):
             st.caption("Type in food items that you want to add to your meal")  
-            df_food_db = fetch_data_from_storage('data/livsmedelsdatabas.csv')
-            food_list = df_food_db['livsmedel'].values
+            food_list = get_food_reference().names
 
             st.multiselect(
                 "Select food items to add to your meal",
@@ -483,20 +518,15 @@ def create_page_meal_registration():
             temp_store_recipies = []
             if len(options_recipie) > 0:
                 for i in range(0, len(options_recipie)):
-                    df_this_recpie = df_recipie_db[df_recipie_db['name'] == options_recipie[i]]
+                    if options_recipie[i] not in recipe_reference:
+                        continue
                     portion_size = recipe_portions.get(options_recipie[i], 1.0)
-                    
-                    for k in range(0, len(df_this_recpie)):
-                        scaled_amount = df_this_recpie['amount'].iloc[k] * portion_size
-                        temp_store_recipies.append({
-                            "Food": df_this_recpie['livsmedel'].iloc[k], 
-                            "Amount (g)": round(scaled_amount, 1)
-                        })
+                    temp_store_recipies.extend(recipe_reference.expand(options_recipie[i], portion_size))
                     
                     if portion_size != 1.0:
-                        options_string = options_string + f"{df_this_recpie['name'].iloc[0]} ({portion_size:.2f})/"
+                        options_string = options_string + f"{options_recipie[i]} ({portion_size:.2f})/"
                     else:
-                        options_string = options_string + df_this_recpie['name'].iloc[0] + '/'
+                        options_string = options_string + options_recipie[i] + '/'
                         
                 df_recipies = pd.DataFrame(temp_store_recipies)
                 
@@ -585,7 +615,10 @@ def create_page_meal_registration():
         df_meal_items = st.session_state.current_meal_items
         create_new_form_food(code, options_string, bmr, df_meal_items)
 
+@st.fragment
 @handle_errors("database page")
+@instrument_page("Database", lambda: page_data_rows("Database"))
+@track_performance("database page", category="render")
 def create_page_database():
     """Database page with improved 2-column layout and recipe clearing"""
     state_manager.set_page('Database')
@@ -614,8 +647,7 @@ def create_page_database():
         # Search for food items section
         st.markdown("#### Search for food items")
         st.caption("_:blue[Type in food items]_ that you want to add to your recipie")  
-        df_food_db = fetch_data_from_storage('data/livsmedelsdatabas.csv')
-        food_list = df_food_db['livsmedel'].values
+        food_list = get_food_reference().names
         
         st.multiselect(
             "Select food items to your recipie",
@@ -653,16 +685,21 @@ def create_page_database():
         st.caption("_:blue[Save your recipie]_ to the database")  
         create_form_add_recipie_to_database(meal_df, code)
         
+@st.fragment
 @handle_errors("log book page")
+@instrument_page("Log book", lambda: page_data_rows("Log book"))
+@track_performance("log book page", category="render")
 def create_page_logg_book():
     """ORIGINAL log book page with improvements"""
     state_manager.set_page('Log book')
+    page_data = load_data_for_page('Log book')
+    df_energy = page_data.get('energy_data', pd.DataFrame())
     
     col = st.columns((5.0, 8.0), gap='medium') 
     with col[0]: 
         st.markdown("#### Recipies in database")
         st.caption("These are the stored _:blue[ recipies in your database]_")  
-        df_meal_db = fetch_data_from_storage('data/recipie_databas.csv')
+        df_meal_db = page_data.get('recipe_database', pd.DataFrame(columns=['name', 'code', 'favorite']))
         summary = df_meal_db.groupby(['name', 'code']).count().sort_values(['favorite', 'name'])
         for i in range(0, len(summary)):
             this_meal = df_meal_db[df_meal_db['name'] == summary.index[i][0]]
@@ -781,10 +818,14 @@ def create_page_logg_book():
         else:
             st.caption("There are _:blue[no recipies]_ saved in your database")
 
+@st.fragment
 @handle_errors("summary page")
+@instrument_page("Summary", lambda: page_data_rows("Summary"))
+@track_performance("summary page", category="render")
 def create_page_summary():
     """Training-focused summary page with improved layout and progress tracking"""
     state_manager.set_page('Summary')
+    df_energy = load_data_for_page('Summary').get('energy_data', pd.DataFrame())
     
     # Single column layout - stacked sections
     st.markdown('### Training Summary & Progress')
@@ -1214,13 +1255,21 @@ try:
     if current_page != demo_name:
         clear_all_notifications()
     
+    # Render timing, profiling and memory snapshots are applied per page by
+    # @instrument_page, so fragment reruns are covered as well
+    start_tracing()
     page_names_to_funcs[demo_name]()
 
+    if MEMORY_DIAGNOSTICS_ENABLED and st.sidebar.checkbox("Show Error Diagnostics", key="show_diagnostics"):
+        from scripts.error_handling import show_error_diagnostics
+        show_error_diagnostics()
+
 except Exception as e:
     error_handler.show_user_error(e, "main app execution")
     st.error("A critical error occurred. Please refresh the page.")
     
-    if st.sidebar.checkbox("Show Error Diagnostics", key="show_diagnostics"):
+    # The checkbox above may already have rendered before the error
+    if st.sidebar.checkbox("Show Error Diagnostics", key="show_diagnostics_after_error"):
         from scripts.error_handling import show_error_diagnostics
         show_error_diagnostics()
 
@@ -1289,4 +1338,36 @@ with st.sidebar:
         st.info("Already using database mode")
         st.caption("CSV sync not needed when using database storage")
     
-    st.markdown("---")
\ No newline at end of file
+    st.markdown("---")
+
+# ===================== PERFORMANCE PANEL (LUMINA_PERF_TIMING=1) =====================
+end_rerun()
+show_performance_panel()
+if performance_tracker.enabled:
+    show_storage_metrics_panel()
+
+# Storage I/O counters for scraping (LUMINA_STORAGE_METRICS_FILE, .prom = Prometheus text)
+storage_metrics_path = get_export_path()
+if storage_metrics_path:
+    try:
+        export_storage_metrics(storage_metrics_path)
+    except OSError as e:
+        error_handler.log_error(e, "storage metrics export")
+
+# Render/storage/validation metrics (LUMINA_METRICS_FILE, LUMINA_METRICS_PORT)
+start_metrics_server()
+metrics_path = get_metrics_export_path()
+if metrics_path:
+    try:
+        export_metrics(metrics_path)
+    except OSError as e:
+        error_handler.log_error(e, "metrics export")
+
+# ===================== STARTUP PROFILE (LUMINA_STARTUP_PROFILE=1) =====================
+mark_startup('first_render')
+if STARTUP_PROFILE_ENABLED:
+    with st.sidebar.expander("Startup timing", expanded=False):
+        for mark_name, seconds in get_startup_marks().items():
+            st.caption(f"{mark_name}: {seconds * 1000:.0f} ms after the app was first imported")
+        loaded_deferred = get_loaded_deferred_modules()
+        st.caption(f"Heavy libraries loaded: {', '.join(loaded_deferred) if loaded_deferred else 'none'}")
@@ -1,8 +1,14 @@
 import pandas as pd
-import altair as alt
 from datetime import timedelta
 import re
 
+from scripts.performance import track_performance
+
+def _get_altair():
+    """Import altair on first use, so the charting stack is not paid for at startup"""
+    import altair
+    return altair
+
 def standardize_activity_name(activity):
     """Standardize activity names to consistent format"""
     if pd.isna(activity):
@@ -39,6 +45,7 @@ def get_activity_colors():
         'Bmr': '#808080'        # Gray for BMR
     }
 
+@track_performance(category="analytics")
 def filter_data_by_period(df, period_type, selected_date):
     """Filter data based on period type (day, week, month)"""
     df['date'] = pd.to_datetime(df['date'])
@@ -135,6 +142,7 @@ def extract_numeric_pace(pace_str):
     except ValueError:
         return 0.0
 
+@track_performance(category="analytics")
 def get_training_summary(df, selected_activities):
     """
     Generate training summary for selected activities with proper distance handling.
@@ -201,6 +209,7 @@ def get_training_summary(df, selected_activities):
     
     return summary.reset_index()
 
+@track_performance(category="analytics")
 def get_weekly_summary(df):
     """
     Generate weekly summary of all activities.
@@ -339,6 +348,7 @@ def get_food_summary(df):
 
 def create_training_chart(df, selected_activities, chart_type="energy"):
     """Create training visualization chart"""
+    alt = _get_altair()
     # Standardize activity names
     df_copy = df.copy()
     df_copy['activity'] = df_copy['activity'].apply(standardize_activity_name)
@@ -402,6 +412,7 @@ def create_training_chart(df, selected_activities, chart_type="energy"):
 
 def create_weekly_summary_chart(df, selected_activities):
     """Create weekly summary chart showing activity distribution"""
+    alt = _get_altair()
     # Standardize activity names
     df_copy = df.copy()
     df_copy['activity'] = df_copy['activity'].apply(standardize_activity_name)
@@ -446,6 +457,7 @@ def create_weekly_summary_chart(df, selected_activities):
 
 def create_energy_balance_chart(df):
     """Create energy balance chart showing input vs output"""
+    alt = _get_altair()
     if df.empty:
         return alt.Chart(pd.DataFrame()).mark_text(text="No data available", fontSize=16, color='gray')
     
@@ -522,8 +534,10 @@ def create_energy_balance_chart(df):
     
     return chart
 
+@track_performance(category="analytics")
 def create_improved_energy_balance_chart(df):
     """Create clear energy balance chart with proper legend and labeling"""
+    alt = _get_altair()
     if df.empty:
         return alt.Chart(pd.DataFrame()).mark_text(text="No data available", fontSize=16, color='gray')
     
@@ -665,6 +679,7 @@ def calculate_energy_balance(df, period_name):
         'days_with_data': days_with_data
     }
 
+@track_performance(category="analytics")
 def get_deficit_analysis(df_energy, selected_date_input):
     """
     Get comprehensive deficit analysis for day, week, month, and long-term periods
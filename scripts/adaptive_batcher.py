@@ -0,0 +1,187 @@
+# adaptive_batcher.py - Self-tuning batch size and retries for bulk database writes
+"""
+Sends a list of records in batches whose size follows the connection:
+
+- a batch that finishes in under half of BATCH_SETTINGS['target_seconds']
+  grows the next one by growth_factor; a slower one shrinks it
+- a payload error (413, request too large) shrinks the batch and resends it
+  at once; a Postgres statement timeout (57014, the transaction was rolled
+  back) halves it and resends after a backoff
+- failures known not to have reached the database (connection refused,
+  connect/pool timeouts, 429, 503) are retried at the same size after a
+  jittered exponential backoff (RETRY_SETTINGS)
+- ambiguous failures, where the server may already have committed the batch
+  (read timeouts, dropped connections, 502/504), are only retried when the
+  write is idempotent (idempotent=True, e.g. an upsert on a unique key);
+  for a plain insert a resend could duplicate rows, so they are raised
+- anything else (bad column, permissions, ...) is raised immediately
+
+A payload error also caps later batches between the largest size that went
+through and the size that failed, so the limit is found by bisection.
+The size a table settled on, and that cap, are remembered for the process, so
+the next bulk write to it starts there instead of at initial_rows.
+
+    batcher = AdaptiveBatcher(lambda batch: conn.table(name).insert(batch).execute(), table_name=name)
+    report = batcher.run(records)   # rows, batches, retries, seconds, rows_per_second, ...
+"""
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from scripts.constants import BATCH_SETTINGS, RETRY_SETTINGS
+
+# HTTP statuses returned before the request was processed
+NOT_APPLIED_STATUS_CODES = {'425', '429', '503'}
+# HTTP statuses after which the write may or may not have been committed
+AMBIGUOUS_STATUS_CODES = {'408', '500', '502', '504'}
+# Postgres query_canceled (statement_timeout): the statement was rolled back
+STATEMENT_TIMEOUT_CODE = '57014'
+# httpx/httpcore errors raised before any byte of the request was sent
+NOT_SENT_ERROR_NAMES = {'ConnectError', 'ConnectTimeout', 'PoolTimeout', 'UnsupportedProtocol'}
+
+def _error_code(error) -> str:
+    return str(getattr(error, 'code', None) or getattr(getattr(error, 'response', None), 'status_code', '') or '')
+
+def classify_error(error) -> str:
+    """
+    'payload', 'timeout' or 'transient' (not applied, safe to resend),
+    'ambiguous' (may have been applied) or 'fatal'
+    """
+    code = _error_code(error)
+    message = str(error).lower()
+    name = type(error).__name__
+    if code == '413' or 'payload too large' in message or 'request entity too large' in message:
+        return 'payload'
+    if code == STATEMENT_TIMEOUT_CODE or 'canceling statement due to statement timeout' in message:
+        return 'timeout'
+    if code in NOT_APPLIED_STATUS_CODES or isinstance(error, ConnectionRefusedError) or name in NOT_SENT_ERROR_NAMES:
+        return 'transient'
+    if code in AMBIGUOUS_STATUS_CODES or isinstance(error, (TimeoutError, ConnectionError)):
+        return 'ambiguous'
+    # Other httpx transport errors (read timeout, connection reset mid-response) without importing httpx
+    if type(error).__module__.startswith(('httpx', 'httpcore')):
+        return 'ambiguous'
+    return 'fatal'
+
+def backoff_delay(attempt: int, rng=random) -> float:
+    """Seconds to wait before retry number attempt (1-based)"""
+    delay = min(RETRY_SETTINGS['max_delay'],
+                RETRY_SETTINGS['retry_delay'] * RETRY_SETTINGS['backoff_factor'] ** (attempt - 1))
+    return rng.uniform(0, delay) if RETRY_SETTINGS['jitter'] else delay
+
+# table -> (last batch size, largest size the server accepts)
+_learned_sizes: Dict[str, Tuple[int, int]] = {}
+_learned_sizes_lock = threading.Lock()
+
+def learned_batch_size(table_name: str) -> Tuple[int, int]:
+    with _learned_sizes_lock:
+        return _learned_sizes.get(table_name, (BATCH_SETTINGS['initial_rows'], BATCH_SETTINGS['max_rows']))
+
+class AdaptiveBatcher:
+    """Writes records through send(batch), adapting the batch size as it goes"""
+
+    def __init__(self, send: Callable[[List[dict]], object], table_name: str = None, initial_rows: int = None,
+                 min_rows: int = None, max_rows: int = None, target_seconds: float = None,
+                 max_retries: int = None, idempotent: bool = False, sleep: Callable[[float], None] = time.sleep,
+                 rng=None):
+        self.send = send
+        # Whether resending a batch that may already be committed is harmless
+        self.idempotent = idempotent
+        self.table_name = table_name
+        self.min_rows = min_rows or BATCH_SETTINGS['min_rows']
+        learned_rows, learned_max = learned_batch_size(table_name) if table_name else (None, None)
+        self.max_rows = max_rows or learned_max or BATCH_SETTINGS['max_rows']
+        self.target_seconds = target_seconds or BATCH_SETTINGS['target_seconds']
+        self.max_retries = RETRY_SETTINGS['max_retries'] if max_retries is None else max_retries
+        self.batch_rows = self._clamp(initial_rows or learned_rows or BATCH_SETTINGS['initial_rows'])
+        self._sleep = sleep
+        self._rng = rng or random.Random()
+        # Called as on_batch(rows, seconds, batch_rows) after every committed batch
+        self.on_batch = None
+        # Report of the current or last run(), also when it raised
+        self.report = None
+        self._largest_ok = 0
+
+    def _clamp(self, rows) -> int:
+        return max(self.min_rows, min(self.max_rows, int(rows)))
+
+    def _adapt(self, seconds):
+        if seconds < self.target_seconds / 2:
+            self.batch_rows = self._clamp(self.batch_rows * BATCH_SETTINGS['growth_factor'])
+        elif seconds > self.target_seconds:
+            self.batch_rows = self._clamp(self.batch_rows * BATCH_SETTINGS['shrink_factor'])
+
+    def run(self, records: List[dict]) -> Dict:
+        """Send every record; returns the throughput report, raises when a batch cannot be written"""
+        report = {
+            'rows': 0, 'batches': 0, 'retries': 0, 'payload_errors': 0, 'timeouts': 0,
+            'seconds': 0.0, 'send_seconds': 0.0, 'rows_per_second': 0.0,
+            'initial_batch_rows': self.batch_rows, 'final_batch_rows': self.batch_rows, 'max_batch_rows': 0
+        }
+        self.report = report
+        started = time.perf_counter()
+        position, attempts = 0, 0
+        try:
+            while position < len(records):
+                batch = records[position:position + self.batch_rows]
+                sent = time.perf_counter()
+                try:
+                    self.send(batch)
+                except Exception as e:
+                    kind = classify_error(e)
+                    if kind == 'fatal':
+                        raise
+                    if kind == 'ambiguous' and not self.idempotent:
+                        print(f"Batch of {len(batch)} rows failed ({e}) and may have been written; not resending")
+                        raise
+                    report['retries'] += 1
+                    if kind == 'payload':
+                        # Not the server's fault; shrink and resend without waiting or using up an attempt
+                        report['payload_errors'] += 1
+                        if len(batch) <= self.min_rows:
+                            raise
+                        self.max_rows = max(self.min_rows, min(len(batch) - 1, (self._largest_ok + len(batch)) // 2))
+                        self.batch_rows = self.max_rows
+                        continue
+                    attempts += 1
+                    if attempts > self.max_retries:
+                        raise
+                    if kind == 'timeout':
+                        report['timeouts'] += 1
+                        self.batch_rows = self._clamp(len(batch) * BATCH_SETTINGS['shrink_factor'])
+                    delay = backoff_delay(attempts, self._rng)
+                    print(f"Batch of {len(batch)} rows failed ({kind}: {e}); retry {attempts} in {delay:.2f}s "
+                          f"with {self.batch_rows} rows")
+                    self._sleep(delay)
+                    continue
+
+                seconds = time.perf_counter() - sent
+                position += len(batch)
+                attempts = 0
+                self._largest_ok = max(self._largest_ok, len(batch))
+                report['rows'] += len(batch)
+                report['batches'] += 1
+                report['send_seconds'] += seconds
+                report['max_batch_rows'] = max(report['max_batch_rows'], len(batch))
+                self._adapt(seconds)
+                if self.on_batch is not None:
+                    self.on_batch(len(batch), seconds, self.batch_rows)
+        finally:
+            report['seconds'] = time.perf_counter() - started
+            report['rows_per_second'] = report['rows'] / report['seconds'] if report['seconds'] > 0 else 0.0
+            report['final_batch_rows'] = self.batch_rows
+            if self.table_name:
+                with _learned_sizes_lock:
+                    _learned_sizes[self.table_name] = (self.batch_rows, self.max_rows)
+        return report
+
+def format_report(report: Dict) -> str:
+    return (f"{report['rows']} rows in {report['batches']} batches, {report['seconds']:.2f}s "
+            f"({report['rows_per_second']:.0f} rows/s), batch size {report['initial_batch_rows']}"
+            f" -> {report['final_batch_rows']}, {report['retries']} retries")
+
+__all__ = [
+    'NOT_APPLIED_STATUS_CODES', 'AMBIGUOUS_STATUS_CODES', 'classify_error', 'backoff_delay', 'learned_batch_size',
+    'AdaptiveBatcher', 'format_report'
+]
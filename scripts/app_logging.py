@@ -0,0 +1,157 @@
+# app_logging.py - Non-blocking, rotating log setup for meRegAnno App
+"""
+Log records are put on an in-memory queue by a QueueHandler on the root
+logger. A QueueListener thread writes them to the log file and the console,
+so a burst of errors (e.g. a Supabase outage) costs the request thread only
+a queue put.
+
+The file receives one JSON object per line. It is rotated by size or time
+(LOG_SETTINGS['rotation']), and rotated files are gzip-compressed.
+"""
+import atexit
+import copy
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+from datetime import datetime, timezone
+
+from scripts.constants import LOG_SETTINGS
+
+# Attributes every LogRecord has; anything else was passed via extra={...}
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'taskName'}
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record, including extra fields and the traceback"""
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'function': record.funcName,
+            'line': record.lineno,
+            'thread': record.threadName
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+def _gzip_namer(name):
+    return f"{name}.gz"
+
+def _gzip_rotator(source, dest):
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+class _PreformattingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that keeps the traceback as text instead of folding it into
+    the message, so the JSON formatter can still emit it as its own field.
+    When the queue is full records are dropped (and counted) rather than
+    blocking the request thread.
+    """
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+def create_file_handler(log_file=None) -> logging.Handler:
+    """Rotating file handler configured from LOG_SETTINGS"""
+    log_file = log_file or LOG_SETTINGS['log_file']
+    directory = os.path.dirname(log_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if LOG_SETTINGS['rotation'] == 'time':
+        handler = logging.handlers.TimedRotatingFileHandler(
+            log_file, when=LOG_SETTINGS['rotate_when'], backupCount=LOG_SETTINGS['backup_count'],
+            encoding='utf-8', delay=True
+        )
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=LOG_SETTINGS['max_log_size'], backupCount=LOG_SETTINGS['backup_count'],
+            encoding='utf-8', delay=True
+        )
+    if LOG_SETTINGS['compress_rotated']:
+        handler.namer = _gzip_namer
+        handler.rotator = _gzip_rotator
+    if LOG_SETTINGS['json_lines']:
+        handler.setFormatter(JsonLinesFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(LOG_SETTINGS['format']))
+    return handler
+
+_QUEUE_HANDLER_NAME = 'lumina_log_queue'
+
+def _installed_queue_handler():
+    for handler in logging.getLogger().handlers:
+        if handler.get_name() == _QUEUE_HANDLER_NAME:
+            return handler
+    return None
+
+def configure_logging(log_file=None) -> logging.handlers.QueueListener:
+    """
+    Route the root logger through a queue to a background writer thread
+
+    Safe to call repeatedly (Streamlit re-imports modules on code changes):
+    the installed handler is found on the root logger, so the listener is
+    started once per process. Returns the listener.
+    """
+    installed = _installed_queue_handler()
+    if installed is not None:
+        return installed.listener
+
+    level = getattr(logging, LOG_SETTINGS['log_level'])
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(LOG_SETTINGS['format']))
+
+    log_queue = queue.Queue(LOG_SETTINGS['queue_size'])
+    listener = logging.handlers.QueueListener(
+        log_queue, create_file_handler(log_file), console_handler, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(shutdown_logging)
+
+    queue_handler = _PreformattingQueueHandler(log_queue)
+    queue_handler.set_name(_QUEUE_HANDLER_NAME)
+    queue_handler.listener = listener
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    return listener
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    queue_handler = _installed_queue_handler()
+    if queue_handler is None:
+        return
+    logging.getLogger().removeHandler(queue_handler)
+    queue_handler.listener.stop()
+    for handler in queue_handler.listener.handlers:
+        handler.close()
+
+__all__ = ['JsonLinesFormatter', 'create_file_handler', 'configure_logging', 'shutdown_logging']
@@ -10,7 +10,9 @@ DATA_PATHS = {
     'energy_data': 'data/updated-database-results.csv',
     'food_database': 'data/livsmedelsdatabas.csv',
     'recipe_database': 'data/recipie_databas.csv',
-    'meal_database': 'data/meal_databas.csv'
+    'meal_database': 'data/meal_databas.csv',
+    'meal_templates': 'data/meal_templates.csv',
+    'meal_stats': 'data/meal_stats.csv'
 }
 
 # Database table mappings
@@ -18,7 +20,9 @@ TABLE_MAPPINGS = {
     'data/updated-database-results.csv': 'energy_balance',
     'data/livsmedelsdatabas.csv': 'livsmedelsdatabas', 
     'data/recipie_databas.csv': 'recipie_databas',
-    'data/meal_databas.csv': 'recipie_databas'  # Legacy mapping
+    'data/meal_databas.csv': 'meal_databas',
+    'data/meal_templates.csv': 'meal_templates',
+    'data/meal_stats.csv': 'meal_stats'
 }
 
 # ===================== ACTIVITY CONSTANTS =====================
@@ -121,6 +125,18 @@ PAGE_NAMES = {
     'Summary': 'Activity Summary'
 }
 
+# Data each page reads, keyed by DATA_PATHS name, with the date range needed:
+# 'day' = only the selected date, 'all' = the full table. Food and recipe
+# lookups go through the shared structures in reference_data instead.
+PAGE_DATA_DEPENDENCIES = {
+    'Dashboard': {'energy_data': 'all'},  # deficit list spans past days
+    'Activity': {'energy_data': 'day'},
+    'Meals': {'energy_data': 'all'},
+    'Database': {},
+    'Log book': {'energy_data': 'day', 'recipe_database': 'all'},
+    'Summary': {'energy_data': 'all'}
+}
+
 # Column configurations for data tables
 TABLE_COLUMN_CONFIGS = {
     'activity_summary': {
@@ -141,6 +157,18 @@ TABLE_COLUMN_CONFIGS = {
     }
 }
 
+# Previous meal browser - only one page of meals is rendered per rerun
+MEAL_BROWSER_SETTINGS = {
+    'page_size': 10,
+    'copy_page_size': 25
+}
+
+# Quick picks - favorite meals ranked by decayed frequency/recency
+QUICK_PICK_SETTINGS = {
+    'half_life_days': 14,  # a use counts half as much after this many days
+    'top_k': 5
+}
+
 # ===================== CHART AND VISUALIZATION CONSTANTS =====================
 CHART_TYPES = [
     "Energy Burned",
@@ -202,7 +230,9 @@ ERROR_CODES = {
 RETRY_SETTINGS = {
     'max_retries': 3,
     'retry_delay': 1.0,  # seconds
-    'backoff_factor': 2.0
+    'backoff_factor': 2.0,
+    'max_delay': 30.0,  # cap on one backoff sleep
+    'jitter': True  # sleep a random fraction of the backoff ("full jitter")
 }
 
 # ===================== DATA PROCESSING CONSTANTS =====================
@@ -220,7 +250,13 @@ CSV_COLUMNS = {
         'name', 'livsmedel', 'amount', 'code', 'favorite'
     ],
     'meal_database': [
-        'date', 'time', 'name', 'livsmedel', 'amount', 'code', 'favorite'
+        'date', 'time', 'name', 'template_id', 'code', 'favorite'
+    ],
+    'meal_templates': [
+        'template_id', 'livsmedel', 'amount'
+    ],
+    'meal_stats': [
+        'kind', 'name', 'score', 'count', 'last_used', 'last_date', 'last_time'
     ]
 }
 
@@ -237,6 +273,12 @@ DATA_TYPES = {
     }
 }
 
+# Shared in-memory cache of whole tables (see data_storage)
+DATA_CACHE_SETTINGS = {
+    'enabled': True,
+    'database_ttl_seconds': 300  # CSV entries are validated against file mtime instead
+}
+
 # ===================== NUTRITION CALCULATION CONSTANTS =====================
 # Macronutrient calories per gram
 MACRO_CALORIES = {
@@ -272,12 +314,119 @@ BACKUP_SETTINGS = {
     'auto_backup_interval': 300  # seconds
 }
 
+# Caps for the per-session buffers in scripts/state_management.py; entries
+# larger than max_entry_bytes are not kept, and when the buffers together
+# exceed session_budget_bytes the oldest entries are evicted first
+SESSION_STATE_LIMITS = {
+    'max_notifications_per_type': 50,
+    'max_recovery_points_per_context': BACKUP_SETTINGS['max_backups_per_context'],
+    'max_entry_bytes': 2 * 1024 * 1024,
+    'session_budget_bytes': 16 * 1024 * 1024
+}
+
 # ===================== LOGGING CONFIGURATION =====================
+# Written from a background thread by scripts/app_logging.py
 LOG_SETTINGS = {
     'log_file': 'app_errors.log',
     'log_level': 'ERROR',
+    'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    'json_lines': True,
+    'rotation': 'size',  # 'size' (max_log_size) or 'time' (rotate_when)
+    'rotate_when': 'midnight',
     'max_log_size': 10 * 1024 * 1024,  # 10MB
-    'backup_count': 5
+    'backup_count': 5,
+    'compress_rotated': True,
+    'queue_size': 10000  # records waiting for the writer thread; 0 is unbounded
+}
+
+# ===================== PERFORMANCE TIMING =====================
+# Per-rerun timing panel (scripts/performance.py); also enabled by the env var
+PERFORMANCE_SETTINGS = {
+    'enabled': False,
+    'env_var': 'LUMINA_PERF_TIMING',
+    'history_size': 200  # calls kept per function for rolling p50/p95
+}
+
+# Opt-in cProfile capture of one page rerun (scripts/profiling.py)
+PROFILE_SETTINGS = {
+    'env_var': 'LUMINA_PROFILE',
+    'query_param': 'profile',
+    'output_dir': 'profiles',
+    'min_sample_seconds': 0.0001,  # speedscope export drops smaller stacks
+    'max_stack_depth': 128
+}
+
+# tracemalloc snapshots around page renders (scripts/memory_diagnostics.py)
+MEMORY_SETTINGS = {
+    'enabled': False,
+    'env_var': 'LUMINA_MEMORY_DIAGNOSTICS',
+    'traceback_frames': 1,
+    'top_allocations': 10
+}
+
+# Process-wide error/latency metrics (scripts/metrics.py)
+METRICS_SETTINGS = {
+    'latency_buckets_seconds': (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    'export_path': None,
+    'export_env_var': 'LUMINA_METRICS_FILE',
+    'port_env_var': 'LUMINA_METRICS_PORT',
+    'http_host': '127.0.0.1'
+}
+
+# Storage I/O counters (scripts/storage_metrics.py)
+STORAGE_METRICS_SETTINGS = {
+    # JSON-size database payloads; off by default, it serializes every request a second time
+    'measure_payload_bytes': False,
+    'payload_bytes_env_var': 'LUMINA_MEASURE_PAYLOAD_BYTES',  # '1' turns it on without editing this file
+    'export_path': None,  # e.g. 'metrics/storage.prom', written after every rerun
+    'env_var': 'LUMINA_STORAGE_METRICS_FILE'
+}
+
+# Offline stand-in for the Supabase connection (scripts/fake_supabase.py)
+FAKE_SUPABASE_SETTINGS = {
+    'env_var': 'LUMINA_FAKE_SUPABASE',  # SQLite file (or :memory:) served instead of Supabase
+    'latency_env_var': 'LUMINA_FAKE_SUPABASE_LATENCY_MS',
+    'max_rows': 1000,  # PostgREST db-max-rows: rows returned per request at most
+    'user_id': '00000000-0000-0000-0000-000000000001'
+}
+
+# Process-wide pooled Supabase client (scripts/supabase_pool.py)
+SUPABASE_POOL_SETTINGS = {
+    'enabled': True,  # False: use st.connection('supabase') instead
+    'http2': True,  # used when the h2 package is installed
+    'max_connections': 20,
+    'max_keepalive_connections': 10,
+    'keepalive_expiry_seconds': 60.0,
+    'timeout_seconds': 120.0  # the supabase client's default postgrest timeout
+}
+
+# Direct Postgres access for bulk syncs (scripts/postgres_sync.py)
+DIRECT_DATABASE_SETTINGS = {
+    'url_env_var': 'LUMINA_DATABASE_URL',
+    'secrets_key': 'DATABASE_URL',  # under [connections.supabase] in .streamlit/secrets.toml
+    'schema': 'public',
+    'sync_method': 'auto',  # 'auto' (COPY when a database URL is configured), 'copy' or 'rest'
+    'copy_chunk_rows': 10000,  # rows rendered to CSV per read while streaming COPY
+    'statement_timeout_ms': 120000
+}
+
+# Adaptive batch sizing for bulk database writes (scripts/adaptive_batcher.py)
+BATCH_SETTINGS = {
+    'initial_rows': 500,  # first batch of a table; later writes start at the last size that worked
+    'min_rows': 25,
+    'max_rows': 5000,
+    'target_seconds': 1.0,  # grow while a batch takes less than half of this, shrink above it
+    'growth_factor': 1.5,
+    'shrink_factor': 0.5
+}
+
+# Resumable chunked REST syncs (scripts/sync_job.py)
+SYNC_JOB_SETTINGS = {
+    'chunk_rows': 500,
+    'max_workers': 4,  # chunks upserted concurrently
+    'checkpoint_dir': 'data/.sync',  # one <table>.json per table
+    'key_column': 'row_key',  # unique text column, the upsert conflict target
+    'run_column': 'sync_run'  # rows not stamped by the current run are removed at the end
 }
 
 # ===================== HELPER FUNCTIONS =====================
@@ -328,8 +477,13 @@ API_ENDPOINTS = {
 # Export key constants for easy importing
 __all__ = [
     'APP_NAME', 'ACTIVITY_TYPES', 'ACTIVITY_EMOJIS', 'ACTIVITY_COLORS',
-    'VALIDATION_MESSAGES', 'SUCCESS_MESSAGES', 'PAGE_NAMES', 'CHART_TYPES', 'TIME_PERIODS',
-    'DEFAULT_VALUES', 'ERROR_CODES', 'CSV_COLUMNS', 'FEATURE_FLAGS',
+    'VALIDATION_MESSAGES', 'SUCCESS_MESSAGES', 'PAGE_NAMES', 'PAGE_DATA_DEPENDENCIES',
+    'MEAL_BROWSER_SETTINGS',
+    'QUICK_PICK_SETTINGS', 'CHART_TYPES', 'TIME_PERIODS',
+    'DEFAULT_VALUES', 'ERROR_CODES', 'CSV_COLUMNS', 'DATA_CACHE_SETTINGS', 'PERFORMANCE_SETTINGS',
+    'STORAGE_METRICS_SETTINGS', 'PROFILE_SETTINGS', 'MEMORY_SETTINGS', 'SESSION_STATE_LIMITS',
+    'LOG_SETTINGS', 'METRICS_SETTINGS', 'FAKE_SUPABASE_SETTINGS', 'SUPABASE_POOL_SETTINGS',
+    'DIRECT_DATABASE_SETTINGS', 'BATCH_SETTINGS', 'RETRY_SETTINGS', 'SYNC_JOB_SETTINGS', 'FEATURE_FLAGS',
     'get_activity_emoji', 'get_activity_color', 'get_validation_limit', 
     'get_table_config', 'get_default_value'
 ]
\ No newline at end of file
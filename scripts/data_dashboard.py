@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date
-import altair as alt
+
+from scripts.performance import track_performance
 
 def standardize_activity_name(activity):
     """Standardize activity names to consistent format"""
@@ -127,6 +128,7 @@ def calc_daily_energy_output(df_energy_date, bmr):
         sum_output = sum_output + (-1 * list_output_energy[i])  
     return sum_output
 
+@track_performance(category="analytics")
 def calc_energy_deficite(df_energy, selected_date, selected_date_input):
     intervall_length = 8
     date_now_str = datetime_to_string(date.today())
@@ -156,6 +158,7 @@ def calc_energy_deficite(df_energy, selected_date, selected_date_input):
             df_this_intervall = []
     return df_this_intervall
 
+@track_performance(category="analytics")
 def nutrition_content(df_energy_date):
     now = datetime.now() # current date and time
     current_date = now.strftime("%Y-%m-%d")
@@ -222,6 +225,7 @@ def nutrition_differ(df_energy_date):
     df_nutritions_labeled = pd.concat([df_p, df_c, df_f])
     return df_nutritions_labeled
 
+@track_performance(category="analytics")
 def add_summary_to_dataset(df_energy_date):
     """Enhanced version with more detailed emoji mapping"""
     df_activity = df_energy_date.drop(['summary'], axis=1)
@@ -288,6 +292,7 @@ def add_summary_to_dataset(df_energy_date):
     df.insert(12, 'summary', note_storage)
     return df
 
+@track_performance(category="analytics")
 def energy_differ(df_energy_date):
     data_e = {
         'energy': df_energy_date['energy'].values,
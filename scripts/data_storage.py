@@ -1,24 +1,105 @@
 # Updated data_storage.py
 import streamlit as st
-from st_supabase_connection import SupabaseConnection
 import pandas as pd
 import io
+import os
+import threading
+import time
 
 from scripts.data_dashboard import datetime_to_string
 from scripts.data_dashboard import time_to_string
 from scripts.data_dashboard import basal_energy
+from scripts.constants import (
+    DATA_CACHE_SETTINGS, DATA_PATHS, DIRECT_DATABASE_SETTINGS, PAGE_DATA_DEPENDENCIES, SUPABASE_POOL_SETTINGS,
+    TABLE_MAPPINGS
+)
+from scripts.performance import track_performance
+from scripts.storage_metrics import storage_call, payload_bytes, file_bytes
+from scripts.adaptive_batcher import AdaptiveBatcher, format_report
+from scripts.meal_log import (
+    MEAL_LOG_COLUMNS, MEAL_TEMPLATE_COLUMNS, MEAL_STATS_COLUMNS, MEAL_TABLE_COLUMNS, MEAL_TABLE_SQL,
+    is_legacy_meal_log, migrate_meal_log, add_meal_template, update_meal_stats, seed_meal_stats
+)
 
 # Configuration: This will be set from the main app
 USE_DATABASE = False  # Default value, will be overridden from main app
 
+_supabase_connection_override = None
+
+def set_supabase_connection(conn):
+    """
+    Route every database call to conn instead of st.connection("supabase"),
+    e.g. a scripts.fake_supabase.FakeSupabaseConnection; None restores it
+    """
+    global _supabase_connection_override
+    _supabase_connection_override = conn
+
 def get_supabase_connection():
     """Get or create Supabase connection"""
+    if _supabase_connection_override is not None:
+        return _supabase_connection_override
+    from scripts.fake_supabase import fake_supabase_enabled, get_fake_connection
+    if fake_supabase_enabled():
+        return get_fake_connection()
+    if SUPABASE_POOL_SETTINGS['enabled']:
+        # One client and connection pool for the whole process (scripts/supabase_pool.py)
+        from scripts.supabase_pool import get_pooled_connection
+        return get_pooled_connection()
+    # Imported here so CSV mode never loads the Supabase client stack
+    from st_supabase_connection import SupabaseConnection
     return st.connection("supabase", type=SupabaseConnection)
 
 # ===================== DATABASE FUNCTIONS =====================
 
-def fetch_all_from_database(table_name):
-    """Fetch ALL data from a Supabase table (not just 1000 rows)"""
+# ===================== MISSING TABLES =====================
+# PostgREST/Postgres error codes for a table or column the project lacks
+MISSING_TABLE_CODES = ('42P01', 'PGRST205')
+MISSING_COLUMN_CODES = ('42703', 'PGRST204')
+
+# table -> (reason, time.monotonic() it was found missing)
+_missing_tables = {}
+
+class TableSchemaError(RuntimeError):
+    """A table the app writes to is missing, or lacks columns, in the database"""
+
+    def __init__(self, table_name, reason):
+        self.table_name = table_name
+        self.reason = reason
+        self.migration = MEAL_TABLE_SQL.get(table_name)
+        message = f"Table {table_name} is not set up in the database ({reason})"
+        super().__init__(f"{message}. Run: {self.migration}" if self.migration else message)
+
+def missing_schema_reason(error):
+    """The error message if error means a missing table/column, else None"""
+    if str(getattr(error, 'code', '') or '') in MISSING_TABLE_CODES + MISSING_COLUMN_CODES:
+        return getattr(error, 'message', None) or str(error)
+    return None
+
+def _report_missing_table(table_name, reason):
+    """Remember a missing table and warn about it once per session instead of every rerun"""
+    _missing_tables[table_name] = (reason, time.monotonic())
+    print(f"Table {table_name} is missing in the database: {reason}")
+    try:
+        warned = st.session_state.setdefault('warned_missing_tables', set())
+    except Exception:
+        # No session (bare mode, background thread)
+        return
+    if table_name not in warned:
+        warned.add(table_name)
+        st.warning(f"Table {table_name} does not exist in your database; using an empty table.")
+        if table_name in MEAL_TABLE_SQL:
+            st.code(MEAL_TABLE_SQL[table_name], language='sql')
+
+def fetch_all_from_database(table_name, date=None):
+    """Fetch ALL data from a Supabase table (not just 1000 rows), or only the rows of one date"""
+    missing = _missing_tables.get(table_name)
+    if missing is not None and time.monotonic() - missing[1] < DATA_CACHE_SETTINGS['database_ttl_seconds']:
+        # Known to be missing: don't ask again until the cache TTL has passed
+        return get_empty_dataframe(table_name)
+    with storage_call('fetch' if date is None else 'fetch_day', table_name, 'database') as call:
+        return _fetch_all_from_database(table_name, call, date)
+
+def _fetch_all_from_database(table_name, call, date=None):
     conn = get_supabase_connection()
     try:
         # Fetch data in chunks to get all records
@@ -27,7 +108,12 @@ def fetch_all_from_database(table_name):
         chunk_size = 1000
         
         while True:
-            response = conn.table(table_name).select("*").range(offset, offset + chunk_size - 1).execute()
+            query = conn.table(table_name).select("*")
+            if date is not None:
+                # Filtered by the server, only the day's rows are transferred
+                query = query.eq('date', date)
+            response = query.range(offset, offset + chunk_size - 1).execute()
+            call.add(round_trips=1, rows_read=len(response.data or []), bytes=payload_bytes(response.data or []))
             
             if not response.data:
                 break
@@ -41,18 +127,7 @@ def fetch_all_from_database(table_name):
             offset += chunk_size
         
         if all_data:
-            df = pd.DataFrame(all_data)
-            
-            # Handle date and time formatting for energy_balance table
-            if table_name == "energy_balance" and not df.empty:
-                if 'date' in df.columns:
-                    df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
-                if 'time' in df.columns:
-                    try:
-                        df['time'] = pd.to_datetime(df['time'], format='%H:%M:%S').dt.strftime('%H:%M')
-                    except:
-                        df['time'] = df['time'].astype(str).str[:5]
-                df = df.sort_values(['date', 'time'])
+            df = _format_fetched_frame(pd.DataFrame(all_data), table_name)
             
             print(f'Data was fetched from database table: {table_name} ({len(df)} rows)')
             return df
@@ -61,11 +136,34 @@ def fetch_all_from_database(table_name):
             return get_empty_dataframe(table_name)
             
     except Exception as e:
+        reason = missing_schema_reason(e)
+        if reason is not None:
+            _report_missing_table(table_name, reason)
+            return get_empty_dataframe(table_name)
+        call.add(errors=1)
         st.error(f"Error loading data from {table_name}: {str(e)}")
         return get_empty_dataframe(table_name)
 
+def _format_fetched_frame(df, table_name):
+    """The app's view of rows read from table_name"""
+    # Handle date and time formatting for energy_balance table
+    if table_name == "energy_balance" and not df.empty:
+        if 'date' in df.columns:
+            df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+        if 'time' in df.columns:
+            try:
+                df['time'] = pd.to_datetime(df['time'], format='%H:%M:%S').dt.strftime('%H:%M')
+            except:
+                df['time'] = df['time'].astype(str).str[:5]
+        df = df.sort_values(['date', 'time'])
+    return df
+
 def save_all_to_database(df, table_name):
     """Replace all data in a Supabase table with new dataframe - FAST method"""
+    with storage_call('save', table_name, 'database') as call:
+        return _save_all_to_database(df, table_name, call)
+
+def _save_all_to_database(df, table_name, call):
     conn = get_supabase_connection()
     try:
         # FAST Method: Bulk delete all records at once
@@ -77,6 +175,7 @@ def save_all_to_database(df, table_name):
         # Method 1: Delete all with a simple condition that matches all rows
         try:
             # This deletes all rows where id is not null (which should be all rows)
+            call.add(round_trips=1)
             delete_response = conn.table(table_name).delete().not_.is_('id', 'null').execute()
             delete_successful = True
             print(f"Bulk delete successful using not null condition")
@@ -85,6 +184,7 @@ def save_all_to_database(df, table_name):
             
             # Method 2: Try with a condition that should match all rows
             try:
+                call.add(round_trips=1, retries=1)
                 delete_response = conn.table(table_name).delete().gte('id', 0).execute()
                 delete_successful = True
                 print(f"Bulk delete successful using gte 0 condition")
@@ -93,6 +193,7 @@ def save_all_to_database(df, table_name):
                 
                 # Method 3: Use RPC call for truncate (requires custom function in Supabase)
                 try:
+                    call.add(round_trips=1, retries=1)
                     truncate_response = conn.rpc('truncate_table', {'table_name': table_name}).execute()
                     delete_successful = True
                     print(f"Truncate successful using RPC")
@@ -104,43 +205,13 @@ def save_all_to_database(df, table_name):
             raise Exception("All delete methods failed. Check your database permissions.")
         
         # Insert new data in bulk
-        if not df.empty:
-            # Remove any 'id' column if it exists (let Supabase auto-generate)
-            df_to_insert = df.copy()
-            if 'id' in df_to_insert.columns:
-                df_to_insert = df_to_insert.drop('id', axis=1)
-            
-            # Convert dataframe to list of dictionaries
-            data_to_insert = df_to_insert.to_dict('records')
-            
-            print(f"Inserting {len(data_to_insert)} records in chunks...")
-            
-            # Insert data in reasonably sized chunks
-            chunk_size = 500  # Larger chunks for faster insertion
-            chunks_total = (len(data_to_insert) + chunk_size - 1) // chunk_size
-            
-            for i in range(0, len(data_to_insert), chunk_size):
-                chunk = data_to_insert[i:i + chunk_size]
-                chunk_num = i // chunk_size + 1
-                
-                try:
-                    insert_response = conn.table(table_name).insert(chunk).execute()
-                    print(f"Inserted chunk {chunk_num}/{chunks_total}: {len(chunk)} records")
-                except Exception as chunk_error:
-                    print(f"Error inserting chunk {chunk_num}: {chunk_error}")
-                    # Try smaller chunks if this fails
-                    if len(chunk) > 100:
-                        print(f"Retrying chunk {chunk_num} with smaller sub-chunks...")
-                        for j in range(0, len(chunk), 100):
-                            sub_chunk = chunk[j:j + 100]
-                            conn.table(table_name).insert(sub_chunk).execute()
-                            print(f"  Inserted sub-chunk: {len(sub_chunk)} records")
-                    else:
-                        raise chunk_error
+        _insert_into_database(conn, df, table_name, call)
         
         print(f'Data was saved to database table: {table_name} ({len(df)} rows) - FAST METHOD')
+        return True
         
     except Exception as e:
+        call.add(errors=1)
         st.error(f"Error saving data to {table_name}: {str(e)}")
         print(f"Detailed error: {e}")
         
@@ -151,6 +222,57 @@ def save_all_to_database(df, table_name):
             st.error(f"Table {table_name} does not exist in your database.")
         else:
             st.error("Database operation failed. Check console for details.")
+        return False
+
+def to_json_records(df):
+    """
+    df as a list of dicts the Supabase client can send: NaN/NaT become None
+    (JSON null), since the client refuses to serialize NaN
+    """
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+def _insert_into_database(conn, df, table_name, call):
+    """Insert df into table_name in adaptively sized batches (see scripts/adaptive_batcher.py)"""
+    if df.empty:
+        return None
+    # Remove any 'id' column if it exists (let Supabase auto-generate)
+    df_to_insert = df.copy()
+    if 'id' in df_to_insert.columns:
+        df_to_insert = df_to_insert.drop('id', axis=1)
+    
+    # Convert dataframe to list of dictionaries
+    data_to_insert = to_json_records(df_to_insert)
+    
+    print(f"Inserting {len(data_to_insert)} records in adaptive batches...")
+    
+    def send(batch):
+        call.add(round_trips=1, bytes=payload_bytes(batch))
+        conn.table(table_name).insert(batch).execute()
+        call.add(rows_written=len(batch))
+    
+    # Plain inserts are not idempotent: failures that may have been committed are raised, not resent
+    batcher = AdaptiveBatcher(send, table_name=table_name, idempotent=False)
+    batcher.on_batch = lambda rows, seconds, next_rows: print(
+        f"Inserted batch: {rows} records in {seconds:.2f}s (next batch {next_rows})"
+    )
+    try:
+        report = batcher.run(data_to_insert)
+    finally:
+        # Retries are counted even when the write finally fails
+        call.add(retries=batcher.report['retries'])
+    print(f"Insert into {table_name}: {format_report(report)}")
+    return report
+
+def append_to_database(df, table_name):
+    """Append rows to a Supabase table without clearing it (bulk loads in chunks)"""
+    with storage_call('append', table_name, 'database') as call:
+        try:
+            _insert_into_database(get_supabase_connection(), df, table_name, call)
+            return True
+        except Exception as e:
+            call.add(errors=1)
+            print(f"Error appending to {table_name}: {e}")
+            return False
 
 def get_empty_dataframe(table_name):
     """Return empty dataframe with correct columns for each table"""
@@ -162,6 +284,12 @@ def get_empty_dataframe(table_name):
         return pd.DataFrame(columns=['livsmedel', 'calorie', 'protein', 'carb', 'fat'])
     elif table_name == "recipie_databas":
         return pd.DataFrame(columns=['name', 'livsmedel', 'amount', 'code', 'favorite'])
+    elif table_name == "meal_databas":
+        return pd.DataFrame(columns=MEAL_LOG_COLUMNS)
+    elif table_name == "meal_templates":
+        return pd.DataFrame(columns=MEAL_TEMPLATE_COLUMNS)
+    elif table_name == "meal_stats":
+        return pd.DataFrame(columns=MEAL_STATS_COLUMNS)
     else:
         return pd.DataFrame()
 
@@ -170,7 +298,9 @@ def get_empty_dataframe(table_name):
 def fetch_from_csv(path_to_df_to_fetch):
     """Fetch data from CSV file"""
     try:
-        df_fetched = pd.read_csv(path_to_df_to_fetch)
+        with storage_call('fetch', TABLE_MAPPINGS.get(path_to_df_to_fetch, path_to_df_to_fetch), 'csv') as call:
+            df_fetched = pd.read_csv(path_to_df_to_fetch)
+            call.add(rows_read=len(df_fetched), bytes=file_bytes(path_to_df_to_fetch))
         return df_fetched
     except FileNotFoundError:
         st.error(f"CSV file not found: {path_to_df_to_fetch}")
@@ -179,39 +309,217 @@ def fetch_from_csv(path_to_df_to_fetch):
             return get_empty_dataframe("energy_balance")
         elif "livsmedelsdatabas" in path_to_df_to_fetch:
             return get_empty_dataframe("livsmedelsdatabas")
+        elif "meal_stats" in path_to_df_to_fetch:
+            return get_empty_dataframe("meal_stats")
+        elif "meal_templates" in path_to_df_to_fetch:
+            return get_empty_dataframe("meal_templates")
+        elif "meal_databas" in path_to_df_to_fetch:
+            return get_empty_dataframe("meal_databas")
         elif "recipie" in path_to_df_to_fetch or "meal" in path_to_df_to_fetch:
             return get_empty_dataframe("recipie_databas")
         else:
             return pd.DataFrame()
 
 def save_to_csv(df_to_store, path):
-    """Save dataframe to CSV file"""
-    df_to_store.to_csv(path, index=False)
+    """Save dataframe to CSV file; returns the CSV text that was written"""
+    with storage_call('save', TABLE_MAPPINGS.get(path, path), 'csv') as call:
+        csv_text = df_to_store.to_csv(index=False)
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(csv_text)
+        call.add(rows_written=len(df_to_store), bytes=file_bytes(path))
     print(f'Data was saved to CSV: {path}')
+    return csv_text
+
+# ===================== SHARED FRAME CACHE =====================
+# Process-wide cache of whole tables, shared by all sessions. Saves write the
+# new frame straight into the cache, so the rerun that follows a save reads
+# it back without touching storage again. CSV entries are validated against
+# the file's mtime, database entries expire after a TTL.
+
+_frame_cache = {}
+_frame_cache_lock = threading.Lock()
+# Bumped on every save/invalidation so derived structures know to rebuild
+_table_versions = {}
+_cache_generation = 0
+
+def _frame_cache_key(path_or_table):
+    return ('database' if USE_DATABASE else 'csv', path_or_table)
+
+def _csv_mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+def _fresh_cache_entry(path_or_table):
+    """The cache entry of path_or_table, or None if missing or stale"""
+    if not DATA_CACHE_SETTINGS['enabled']:
+        return None
+    key = _frame_cache_key(path_or_table)
+    with _frame_cache_lock:
+        entry = _frame_cache.get(key)
+    if entry is None:
+        return None
+    
+    if USE_DATABASE:
+        is_fresh = time.monotonic() - entry['stored_at'] < DATA_CACHE_SETTINGS['database_ttl_seconds']
+    else:
+        is_fresh = entry['mtime'] is not None and entry['mtime'] == _csv_mtime(path_or_table)
+    if not is_fresh:
+        invalidate_cached_frame(path_or_table)
+        return None
+    return entry
+
+def get_cached_frame(path_or_table):
+    """Return a copy of the cached frame, or None if missing or stale"""
+    entry = _fresh_cache_entry(path_or_table)
+    if entry is None:
+        return None
+    # Callers are free to mutate what they get back
+    return entry['frame'].copy()
+
+def _cached_day_rows(path_or_table, selected_date):
+    """
+    Copy of the cached rows dated selected_date, or None if the table is not
+    cached. The date -> row positions index is built on first use and lives
+    as long as the cache entry, so a save (which replaces the entry) resets it
+    """
+    entry = _fresh_cache_entry(path_or_table)
+    if entry is None or 'date' not in entry['frame'].columns:
+        return None
+    day_index = entry.get('day_index')
+    if day_index is None:
+        # Built outside the lock; two sessions racing build the same index
+        day_index = entry['day_index'] = entry['frame'].groupby('date', sort=False).indices
+    positions = day_index.get(selected_date)
+    if positions is None:
+        return entry['frame'].iloc[0:0].copy()
+    return entry['frame'].iloc[positions].copy()
+
+def put_cached_frame(path_or_table, df):
+    """Store a copy of df as the current content of path_or_table"""
+    if not DATA_CACHE_SETTINGS['enabled']:
+        return
+    entry = {
+        'frame': df.copy(),
+        'stored_at': time.monotonic(),
+        'mtime': None if USE_DATABASE else _csv_mtime(path_or_table)
+    }
+    with _frame_cache_lock:
+        _frame_cache[_frame_cache_key(path_or_table)] = entry
+
+def get_cached_row_count(path_or_table):
+    """Rows of the cached frame for path_or_table (0 if not cached), without copying"""
+    with _frame_cache_lock:
+        entry = _frame_cache.get(_frame_cache_key(path_or_table))
+    return len(entry['frame']) if entry is not None else 0
+
+def get_frame_cache_stats():
+    """Rows and deep memory usage of every cached frame (shared by all sessions)"""
+    with _frame_cache_lock:
+        entries = list(_frame_cache.items())
+    return [
+        {
+            'backend': backend,
+            'table': path_or_table,
+            'rows': len(entry['frame']),
+            'bytes': int(entry['frame'].memory_usage(deep=True).sum())
+        }
+        for (backend, path_or_table), entry in entries
+    ]
+
+def invalidate_cached_frame(path_or_table=None):
+    """Drop one cached table (for the active backend), or everything"""
+    global _cache_generation
+    with _frame_cache_lock:
+        if path_or_table is None:
+            _frame_cache.clear()
+            _cache_generation += 1
+        else:
+            key = _frame_cache_key(path_or_table)
+            _frame_cache.pop(key, None)
+            _table_versions[key] = _table_versions.get(key, 0) + 1
+
+def _as_fetched(df, path_or_table, csv_text=None):
+    """
+    What fetching path_or_table right after saving df returns, so a cached
+    save is indistinguishable from a re-read: for CSV the written text parsed
+    again (fresh RangeIndex, read_csv dtypes, NaN for empty fields), for the
+    database the rows as sent, formatted like fetch_all_from_database
+    """
+    if csv_text is not None:
+        return pd.read_csv(io.StringIO(csv_text))
+    table_name = TABLE_MAPPINGS.get(path_or_table, path_or_table)
+    return _format_fetched_frame(df.drop(columns=['id'], errors='ignore').reset_index(drop=True), table_name)
+
+def get_table_version(path_or_table):
+    """
+    Hashable token that changes whenever path_or_table is saved through this
+    process, invalidated, or (CSV) modified on disk, or (database) when the
+    cache TTL window rolls over
+    """
+    key = _frame_cache_key(path_or_table)
+    with _frame_cache_lock:
+        version = (_cache_generation, _table_versions.get(key, 0))
+    if USE_DATABASE:
+        freshness = int(time.monotonic() // DATA_CACHE_SETTINGS['database_ttl_seconds'])
+    else:
+        freshness = _csv_mtime(path_or_table)
+    return key + version + (freshness,)
+
+# Day slices fetched from the database while the whole table is not cached:
+# (backend, path_or_table, date) -> (table version, frame)
+_day_frames = {}
 
 # ===================== UNIFIED INTERFACE FUNCTIONS =====================
 
+@track_performance(category="storage")
 def fetch_data_from_storage(path_or_table):
     """Unified function to fetch data from either CSV or database"""
     # Access the global USE_DATABASE variable
     global USE_DATABASE
     
+    df_cached = get_cached_frame(path_or_table)
+    if df_cached is not None:
+        backend = 'database' if USE_DATABASE else 'csv'
+        with storage_call('fetch', TABLE_MAPPINGS.get(path_or_table, path_or_table), backend) as call:
+            call.add(cache_hits=1)
+        return df_cached
+    
     if USE_DATABASE:
         # Map file paths to table names
         table_mapping = {
             'data/updated-database-results.csv': 'energy_balance',
             'data/livsmedelsdatabas.csv': 'livsmedelsdatabas', 
             'data/recipie_databas.csv': 'recipie_databas',
-            'data/meal_databas.csv': 'recipie_databas'  # Legacy name mapping
+            'data/meal_databas.csv': 'meal_databas',
+            'data/meal_templates.csv': 'meal_templates',
+            'data/meal_stats.csv': 'meal_stats'
         }
         
         table_name = table_mapping.get(path_or_table, path_or_table)
-        return fetch_all_from_database(table_name)
+        df_fetched = fetch_all_from_database(table_name)
+        if df_fetched.empty:
+            # Fetch errors also come back empty, don't pin them in the cache
+            return df_fetched
     else:
-        return fetch_from_csv(path_or_table)
+        df_fetched = fetch_from_csv(path_or_table)
+        if _csv_mtime(path_or_table) is None:
+            # Missing file: don't cache the empty fallback
+            return df_fetched
+    
+    put_cached_frame(path_or_table, df_fetched)
+    return df_fetched
 
+@track_performance(category="storage")
 def save_data_to_storage(df_to_store, path_or_table):
-    """Unified function to save data to either CSV or database"""
+    """
+    Unified function to save data to either CSV or database
+    
+    The saved frame, normalised to what a re-read would return, becomes the
+    cached content of the table and is returned, so callers can keep working
+    with it instead of fetching it again.
+    """
     # Access the global USE_DATABASE variable
     global USE_DATABASE
     
@@ -221,13 +529,87 @@ def save_data_to_storage(df_to_store, path_or_table):
             'data/updated-database-results.csv': 'energy_balance',
             'data/livsmedelsdatabas.csv': 'livsmedelsdatabas',
             'data/recipie_databas.csv': 'recipie_databas',
-            'data/meal_databas.csv': 'recipie_databas'  # Legacy name mapping
+            'data/meal_databas.csv': 'meal_databas',
+            'data/meal_templates.csv': 'meal_templates',
+            'data/meal_stats.csv': 'meal_stats'
         }
         
         table_name = table_mapping.get(path_or_table, path_or_table)
-        save_all_to_database(df_to_store, table_name)
+        if not save_all_to_database(df_to_store, table_name):
+            # Table state is unknown after a failed save, refetch next time
+            invalidate_cached_frame(path_or_table)
+            return df_to_store
+        df_stored = _as_fetched(df_to_store, path_or_table)
     else:
-        save_to_csv(df_to_store, path_or_table)
+        df_stored = _as_fetched(df_to_store, path_or_table, save_to_csv(df_to_store, path_or_table))
+    
+    put_cached_frame(path_or_table, df_stored)
+    with _frame_cache_lock:
+        key = _frame_cache_key(path_or_table)
+        _table_versions[key] = _table_versions.get(key, 0) + 1
+    return df_stored
+
+@track_performance(category="storage")
+def fetch_day_from_storage(path_or_table, selected_date):
+    """
+    Rows of path_or_table dated selected_date (YYYY-MM-DD)
+    
+    A cached table is sliced through its per-date index instead of being
+    copied and filtered. Otherwise the database is queried for that date
+    only (kept until the table version changes); a CSV file has to be read
+    whole anyway, so it is loaded into the shared cache and indexed.
+    """
+    backend = 'database' if USE_DATABASE else 'csv'
+    table_name = TABLE_MAPPINGS.get(path_or_table, path_or_table)
+    df_day = _cached_day_rows(path_or_table, selected_date)
+    if df_day is not None:
+        with storage_call('fetch_day', table_name, backend) as call:
+            call.add(cache_hits=1)
+        return df_day
+    
+    if USE_DATABASE:
+        key = _frame_cache_key(path_or_table) + (selected_date,)
+        version = get_table_version(path_or_table)
+        with _frame_cache_lock:
+            cached = _day_frames.get(key)
+        if DATA_CACHE_SETTINGS['enabled'] and cached is not None and cached[0] == version:
+            with storage_call('fetch_day', table_name, backend) as call:
+                call.add(cache_hits=1)
+            return cached[1].copy()
+        df_day = fetch_all_from_database(table_name, date=selected_date)
+        # Fetch errors also come back empty, don't pin them
+        if DATA_CACHE_SETTINGS['enabled'] and not df_day.empty:
+            with _frame_cache_lock:
+                # Slices of older versions of the table are stale
+                for stale in [k for k, (v, _) in _day_frames.items() if k[:2] == key[:2] and v != version]:
+                    del _day_frames[stale]
+                _day_frames[key] = (version, df_day.copy())
+        return df_day
+    
+    df = fetch_data_from_storage(path_or_table)
+    df_day = _cached_day_rows(path_or_table, selected_date)
+    if df_day is None:
+        # Cache disabled or file missing
+        df_day = df[df['date'] == selected_date] if 'date' in df.columns else df
+    return df_day
+
+@track_performance(category="storage")
+def load_page_data(page_name, selected_date=None):
+    """
+    Load only the data a page declares in PAGE_DATA_DEPENDENCIES
+    
+    Tables are read through the shared frame cache; 'day' scoped tables
+    only load the rows of selected_date (YYYY-MM-DD, see
+    fetch_day_from_storage). Returns a dict keyed by the DATA_PATHS name of
+    each table.
+    """
+    page_data = {}
+    for source, date_range in PAGE_DATA_DEPENDENCIES.get(page_name, {}).items():
+        if date_range == 'day' and selected_date is not None:
+            page_data[source] = fetch_day_from_storage(DATA_PATHS[source], selected_date)
+        else:
+            page_data[source] = fetch_data_from_storage(DATA_PATHS[source])
+    return page_data
 
 # ===================== LEGACY FUNCTIONS (keeping for compatibility) =====================
 
@@ -245,6 +627,7 @@ def load_recipie_database():
 
 # ===================== EXISTING FUNCTIONS (unchanged) =====================
 
+@track_performance(category="analytics")
 def calc_accumulated_energy(df_data):
     ls_dates = df_data.groupby(['date']).count().index.to_list()
     storage = []
@@ -332,7 +715,7 @@ def delete_item_from_dataset(selected_date, df_new, bmr):
     df_concat = df_concat[['date', 'time', 'label', 'activity', 'distance', 'energy', 'pro', 'carb', 'fat', 'note', 'summary', 'duration', 'pace', 'steps']]  
     df_concat_acc = calc_accumulated_energy(df_concat)
     df_energy_new = pd.concat([df_db, df_concat_acc]).sort_values(['date', 'time'])
-    save_data_to_storage(df_energy_new, 'data/updated-database-results.csv')
+    return save_data_to_storage(df_energy_new, 'data/updated-database-results.csv')
 
 def add_registration(data: dict, bmr):
     """Add new registration without CSV file dependency"""
@@ -372,6 +755,8 @@ def add_registration(data: dict, bmr):
         df_db_csv['steps'] = 0
     
     df_energy_new = add_new_data_to_dataset_csv(df_db_csv, df_new_post, date_new_post, bmr)  
+    # The saved frame is kept in the shared cache, so the rerun below
+    # picks it up without reading the table back from storage
     save_data_to_storage(df_energy_new, 'data/updated-database-results.csv')  
     
     # Access the global USE_DATABASE variable
@@ -380,9 +765,64 @@ def add_registration(data: dict, bmr):
     print(f'Registration added successfully to {storage_type}...')
     st.rerun()
     
-def save_meal_to_database(date_str, time_str, meal_name, df_meal_items, code, favorite=False):
+def load_meal_log():
+    """
+    Load the meal log together with its meal templates
+    
+    A legacy log (one row per food item) is converted in memory; it is
+    written back in the template format on the next save.
+    
+    Returns:
+    - tuple: (meal log with one row per meal, meal templates)
+    """
+    df_meal_log, df_templates, _ = _load_meal_log_and_templates()
+    return df_meal_log, df_templates
+
+def _load_meal_log_and_templates():
+    """Load meal log and templates, also reporting whether the log was legacy"""
+    df_meal_log = fetch_data_from_storage('data/meal_databas.csv')
+    df_templates = fetch_data_from_storage('data/meal_templates.csv')
+    
+    was_legacy = is_legacy_meal_log(df_meal_log)
+    if was_legacy:
+        df_meal_log, df_legacy_templates = migrate_meal_log(df_meal_log)
+        df_legacy_templates = df_legacy_templates[~df_legacy_templates['template_id'].isin(df_templates['template_id'])]
+        df_templates = pd.concat([df_templates, df_legacy_templates], ignore_index=True)
+    
+    return df_meal_log, df_templates, was_legacy
+
+_checked_meal_tables = set()
+
+def check_meal_tables(table_names=None, conn=None):
+    """
+    Raise TableSchemaError unless the meal log tables (table_names, default
+    all of MEAL_TABLE_COLUMNS) exist with the columns the app writes. Run
+    before anything is deleted, so a missing table cannot leave the meal log
+    emptied; a table that passed is not checked again in this process
+    """
+    conn = conn or get_supabase_connection()
+    for table_name in table_names or MEAL_TABLE_COLUMNS:
+        if table_name in _checked_meal_tables:
+            continue
+        with storage_call('schema_check', table_name, 'database') as call:
+            call.add(round_trips=1)
+            try:
+                conn.table(table_name).select(','.join(MEAL_TABLE_COLUMNS[table_name])).limit(1).execute()
+            except Exception as e:
+                reason = missing_schema_reason(e)
+                if reason is None:
+                    raise
+                raise TableSchemaError(table_name, reason) from e
+        _missing_tables.pop(table_name, None)
+        _checked_meal_tables.add(table_name)
+
+def save_meal_to_database(date_str, time_str, meal_name, df_meal_items, code, favorite=False, recipes=None):
     """
-    Save a meal with all its components to the meal_databas.csv file
+    Save a meal to the meal log (meal_databas.csv)
+    
+    The food items are stored once per distinct content in meal_templates.csv,
+    keyed by a hash of the (food, grams) pairs; the log only keeps a reference
+    to the template together with date, time, name and code.
     
     Parameters:
     - date_str: Date in YYYY-MM-DD format
@@ -391,118 +831,155 @@ def save_meal_to_database(date_str, time_str, meal_name, df_meal_items, code, fa
     - df_meal_items: DataFrame with columns 'Food' and 'Amount (g)'
     - code: The calculated nutrition code (kcal/pro/carb/fat)
     - favorite: Boolean indicating if meal is marked as favorite
+    - recipes: Names of the recipes the meal was built from (for quick picks)
+    
+    Raises when the meal could not be logged (TableSchemaError, with the SQL
+    to run, when the database lacks the meal tables), so the form can warn; a failed
+    quick pick counter update is only printed, the meal is logged by then.
     """
     try:
-        # Load existing meal database
+        if USE_DATABASE:
+            check_meal_tables(('meal_databas', 'meal_templates'))
+        
+        # Load existing meal log and templates
         try:
-            df_meal_db = fetch_data_from_storage('data/meal_databas.csv')
+            df_meal_log, df_templates, was_legacy = _load_meal_log_and_templates()
         except:
-            # Create empty dataframe if file doesn't exist
-            df_meal_db = pd.DataFrame(columns=['date', 'time', 'name', 'livsmedel', 'amount', 'code', 'favorite'])
-        
-        # Prepare meal entries for each food item
-        meal_entries = []
-        for i in range(len(df_meal_items)):
-            meal_entry = {
-                'date': date_str,
-                'time': time_str,
-                'name': meal_name,
-                'livsmedel': df_meal_items['Food'].iloc[i],
-                'amount': df_meal_items['Amount (g)'].iloc[i],
-                'code': code,
-                'favorite': favorite
-            }
-            meal_entries.append(meal_entry)
-
-        print(meal_entries)
+            # Create empty dataframes if files don't exist
+            was_legacy = False
+            df_meal_log = pd.DataFrame(columns=MEAL_LOG_COLUMNS)
+            df_templates = pd.DataFrame(columns=MEAL_TEMPLATE_COLUMNS)
         
-        # Convert to DataFrame and append to existing database
-        df_new_meal = pd.DataFrame(meal_entries)
-        df_updated_meal_db = pd.concat([df_meal_db, df_new_meal], ignore_index=True)
+        # Reuse an identical template or add a new one
+        df_templates, template_id, is_new_template = add_meal_template(df_templates, df_meal_items)
+        if is_new_template or was_legacy:
+            save_data_to_storage(df_templates, 'data/meal_templates.csv')
         
-        # Save updated database
-        save_data_to_storage(df_updated_meal_db, 'data/meal_databas.csv')
-        
-        print(f'Meal "{meal_name}" automatically saved to meal log with {len(meal_entries)} food items')
+        # Append a single reference row to the meal log
+        df_new_meal = pd.DataFrame([{
+            'date': date_str,
+            'time': time_str,
+            'name': meal_name,
+            'template_id': template_id,
+            'code': code,
+            'favorite': favorite
+        }])
+        df_updated_meal_log = pd.concat([df_meal_log, df_new_meal], ignore_index=True)
+        save_data_to_storage(df_updated_meal_log, 'data/meal_databas.csv')
         
     except Exception as e:
         print(f'Error saving meal to database: {e}')
-        # Don't show error to user since this is automatic logging
-        # st.error(f'Failed to save meal to database: {e}')
-
-def sync_csv_to_database():
-    """Simple function to sync CSV data to database"""
+        raise
+    
+    template_text = "new template" if is_new_template else "existing template"
+    print(f'Meal "{meal_name}" automatically saved to meal log ({template_text} {template_id})')
     
     try:
-        from scripts.data_storage import get_supabase_connection
-        conn = get_supabase_connection()
-        st.info("Connected to database")
+        # Bump the quick pick counters for this meal and its recipes
+        update_quick_pick_counters(meal_name, date_str, time_str, recipes, df_meal_log)
     except Exception as e:
-        st.error(f"Connection failed: {str(e)}")
-        return False
+        print(f'Error updating quick pick counters: {e}')
 
+def update_quick_pick_counters(meal_name, date_str, time_str, recipes=None, df_meal_db=None):
+    """
+    Incrementally update the quick pick counters (meal_stats.csv)
+    
+    The counters table is seeded from the meal log only once, when it does
+    not exist yet; afterwards each logged meal touches just its own rows.
+    Raises TableSchemaError when the database lacks the meal_stats table.
+    """
+    if USE_DATABASE:
+        check_meal_tables(('meal_stats',))
+    df_stats = fetch_data_from_storage('data/meal_stats.csv')
+    if df_stats.empty and df_meal_db is not None and not df_meal_db.empty:
+        df_stats = seed_meal_stats(df_meal_db, fetch_data_from_storage('data/recipie_databas.csv'))
+    
+    df_stats = update_meal_stats(df_stats, meal_name, date_str, time_str, recipes)
+    save_data_to_storage(df_stats, 'data/meal_stats.csv')
+    return df_stats
 
-    def prepare_energy_data(df):
-        """Clean and prepare energy_balance data"""
-        df_clean = df.copy()
-        
-        # Get the current authenticated user ID from Supabase
-        try:
-            conn = get_supabase_connection()
-            # Try to get the current user - this might not work with service key
-            user_response = conn.auth.get_user()
-            if user_response and user_response.user:
-                user_id = user_response.user.id
-            else:
-                # If no authenticated user, you might need to use a specific user ID
-                # that exists in your auth.users table, or create one
-                user_id = '00000000-0000-0000-0000-000000000000'
-        except:
-            # Fallback to dummy user ID
+def prepare_energy_data(df, conn=None):
+    """Clean and prepare energy_balance data for the energy_balance table"""
+    df_clean = df.copy()
+    
+    # Get the current authenticated user ID from Supabase
+    try:
+        conn = conn or get_supabase_connection()
+        # Try to get the current user - this might not work with service key
+        user_response = conn.auth.get_user()
+        if user_response and user_response.user:
+            user_id = user_response.user.id
+        else:
+            # If no authenticated user, you might need to use a specific user ID
+            # that exists in your auth.users table, or create one
             user_id = '00000000-0000-0000-0000-000000000000'
-        
-        df_clean['user_id'] = user_id
-        
-        # Rest of your existing code...
-        df_clean['date'] = pd.to_datetime(df_clean['date']).dt.strftime('%Y-%m-%d')
-        
-        def fix_time(time_val):
-            if pd.isna(time_val) or str(time_val).lower() in ['nan', '']:
-                return '00:00:00'
-            
-            time_str = str(time_val).strip()
-            if ':' in time_str:
-                parts = time_str.split(':')
-                if len(parts) >= 2:
-                    hour = int(parts[0])
-                    minute = int(parts[1]) 
-                    second = int(parts[2]) if len(parts) > 2 else 0
-                    return f"{hour:02d}:{minute:02d}:{second:02d}"
+    except:
+        # Fallback to dummy user ID
+        user_id = '00000000-0000-0000-0000-000000000000'
+    
+    df_clean['user_id'] = user_id
+    
+    # Rest of your existing code...
+    df_clean['date'] = pd.to_datetime(df_clean['date']).dt.strftime('%Y-%m-%d')
+    
+    def fix_time(time_val):
+        if pd.isna(time_val) or str(time_val).lower() in ['nan', '']:
             return '00:00:00'
         
-        df_clean['time'] = df_clean['time'].apply(fix_time)
-        
-        # Convert numeric columns and replace NaN with 0
-        numeric_cols = ['distance', 'energy', 'energy_acc', 'pro', 'protein_acc', 'carb', 'fat', 'pace', 'steps']
-        for col in numeric_cols:
-            if col in df_clean.columns:
-                df_clean[col] = pd.to_numeric(df_clean[col], errors='coerce').fillna(0)
-        
-        # Convert text columns and replace NaN with empty string
-        text_cols = ['label', 'activity', 'note', 'summary']
-        for col in text_cols:
-            if col in df_clean.columns:
-                df_clean[col] = df_clean[col].astype(str).fillna('').replace('nan', '')
-        
-        # Remove duration column (not in your schema)
-        if 'duration' in df_clean.columns:
-            df_clean = df_clean.drop('duration', axis=1)
+        time_str = str(time_val).strip()
+        if ':' in time_str:
+            parts = time_str.split(':')
+            if len(parts) >= 2:
+                hour = int(parts[0])
+                minute = int(parts[1]) 
+                second = int(parts[2]) if len(parts) > 2 else 0
+                return f"{hour:02d}:{minute:02d}:{second:02d}"
+        return '00:00:00'
+    
+    df_clean['time'] = df_clean['time'].apply(fix_time)
+    
+    # Convert numeric columns and replace NaN with 0
+    numeric_cols = ['distance', 'energy', 'energy_acc', 'pro', 'protein_acc', 'carb', 'fat', 'pace', 'steps']
+    for col in numeric_cols:
+        if col in df_clean.columns:
+            df_clean[col] = pd.to_numeric(df_clean[col], errors='coerce').fillna(0)
+    
+    # Convert text columns and replace NaN with empty string
+    text_cols = ['label', 'activity', 'note', 'summary']
+    for col in text_cols:
+        if col in df_clean.columns:
+            df_clean[col] = df_clean[col].astype(str).fillna('').replace('nan', '')
+    
+    # Remove duration column (not in your schema)
+    if 'duration' in df_clean.columns:
+        df_clean = df_clean.drop('duration', axis=1)
+    
+    # Remove id column (auto-generated)
+    if 'id' in df_clean.columns:
+        df_clean = df_clean.drop('id', axis=1)
         
-        # Remove id column (auto-generated)
-        if 'id' in df_clean.columns:
-            df_clean = df_clean.drop('id', axis=1)
-            
-        return df_clean
+    return df_clean
+
+def sync_csv_to_database(method=None):
+    """
+    Simple function to sync CSV data to database
+
+    method is 'copy' (Postgres COPY into a staging table, swapped in with one
+    transaction, see scripts/postgres_sync.py), 'rest' (resumable PostgREST
+    upserts, see scripts/sync_job.py) or 'auto' (COPY when a database URL
+    and driver are available, else REST). Defaults to
+    DIRECT_DATABASE_SETTINGS['sync_method']. A table without the sync job's
+    row_key/sync_run columns is replaced with save_all_to_database instead.
+    """
+    method = method or DIRECT_DATABASE_SETTINGS['sync_method']
+    
+    try:
+        from scripts.data_storage import get_supabase_connection
+        conn = get_supabase_connection()
+        st.info("Connected to database")
+    except Exception as e:
+        st.error(f"Connection failed: {str(e)}")
+        return False
 
     # Load and process energy data
     try:
@@ -511,29 +988,57 @@ def sync_csv_to_database():
         st.info(f"Loaded {len(df_energy)} energy records")
         
         # Clean the data
-        df_clean = prepare_energy_data(df_energy)
+        df_clean = prepare_energy_data(df_energy, conn)
         st.info(f"Cleaned data: {len(df_clean)} valid records")
         
-        # Clear existing data
-        conn.table('energy_balance').delete().neq('id', -1).execute()
-        st.info("Cleared existing energy_balance data")
+        if method != 'rest':
+            from scripts.postgres_sync import copy_replace_table, direct_sync_available
+            if direct_sync_available():
+                try:
+                    with storage_call('sync_copy', 'energy_balance', 'database') as call:
+                        call.add(round_trips=1)
+                        inserted = copy_replace_table(df_clean, 'energy_balance')
+                        call.add(rows_written=inserted)
+                    # A half-finished REST sync must not resume on top of the new rows
+                    from scripts.sync_job import clear_checkpoint
+                    clear_checkpoint('energy_balance')
+                    st.success(f"Total inserted: {inserted} records (COPY)")
+                    invalidate_cached_frame()
+                    return inserted > 0
+                except Exception as e:
+                    # The COPY transaction was rolled back, the table is untouched
+                    if method == 'copy':
+                        raise
+                    st.warning(f"COPY sync failed, falling back to REST inserts: {str(e)}")
+            elif method == 'copy':
+                raise RuntimeError("COPY sync needs a database URL and sqlalchemy/psycopg2")
         
-        # Insert new data in chunks
-        records = df_clean.to_dict('records')
-        chunk_size = 100
-        total_inserted = 0
+        # Upsert in checkpointed chunks; a failed or interrupted sync resumes on the next call
+        from scripts.sync_job import SyncJob, SyncSchemaError
+        def report_chunk(index, rows, total_chunks):
+            st.success(f"Upserted chunk {index + 1}/{total_chunks}: {rows} records")
+        try:
+            result = SyncJob(df_clean, 'energy_balance', conn=conn, on_chunk=report_chunk).run()
+        except SyncSchemaError as e:
+            st.warning(f"Resumable sync unavailable: energy_balance is missing the sync columns ({e.reason}). "
+                       f"Replacing the table in one pass instead. To enable resumable syncs, run in the "
+                       f"Supabase SQL editor:")
+            st.code(e.migration, language='sql')
+            saved = save_all_to_database(df_clean, 'energy_balance')
+            invalidate_cached_frame()
+            if not saved:
+                return False
+            st.success(f"Total inserted: {len(df_clean)} records")
+            return True
+        if result.resumed_chunks:
+            st.info(f"Resumed sync: {result.resumed_chunks} chunks were already committed")
+        invalidate_cached_frame()
+        if result.failed_chunks:
+            st.error(f"Chunks {[index + 1 for index in result.failed_chunks]} failed; sync again to resume")
+            return False
         
-        for i in range(0, len(records), chunk_size):
-            chunk = records[i:i + chunk_size]
-            try:
-                response = conn.table('energy_balance').insert(chunk).execute()
-                total_inserted += len(response.data) if response.data else 0
-                st.success(f"Inserted chunk {i//chunk_size + 1}: {len(chunk)} records")
-            except Exception as e:
-                st.error(f"Chunk {i//chunk_size + 1} failed: {str(e)}")
-                
-        st.success(f"Total inserted: {total_inserted} records")
-        return total_inserted > 0
+        st.success(f"Total upserted: {result.rows_written} records in {result.seconds:.1f}s")
+        return True
         
     except Exception as e:
         st.error(f"Data processing failed: {str(e)}")
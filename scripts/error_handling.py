@@ -8,15 +8,13 @@ from typing import Optional, Dict, Any, List, Callable
 from contextlib import contextmanager
 from functools import wraps
 
-# Configure logging
-logging.basicConfig(
-    level=logging.ERROR,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app_errors.log'),
-        logging.StreamHandler()
-    ]
-)
+from scripts.app_logging import configure_logging
+from scripts.memory_diagnostics import show_memory_diagnostics
+from scripts.metrics import metrics_registry
+from scripts.state_management import state_manager
+
+# Configure logging: JSON lines to a rotating file, written off the request thread
+configure_logging()
 
 logger = logging.getLogger(__name__)
 
@@ -71,6 +69,7 @@ class ErrorHandler:
         error_key = f"{context}:{type(error).__name__}"
         self.error_counts[error_key] = self.error_counts.get(error_key, 0) + 1
         self.last_errors[error_key] = error_info
+        metrics_registry.inc('lumina_errors_total', context=context, error_type=type(error).__name__)
     
     def show_user_error(self, error: Exception, context: str = None, show_details: bool = False):
         """Show user-friendly error message in Streamlit"""
@@ -400,6 +399,7 @@ def validate_form_submission(validation_results: List, form_name: str = "form"):
                 warning_count += 1
     
     if has_errors:
+        metrics_registry.inc('lumina_validation_failures_total', validator=f"{form_name} submission")
         st.error(f"Cannot submit {form_name} - please fix {error_count} error(s) above")
         return False
     
@@ -435,19 +435,19 @@ def create_error_recovery_point(data: Dict[str, Any], context: str):
         context: Context for the backup
     """
     try:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_key = f"backup_{context}_{timestamp}"
-        st.session_state[backup_key] = data
-        
-        # Keep only last 5 backups per context
-        backup_keys = [k for k in st.session_state.keys() if k.startswith(f"backup_{context}_")]
-        if len(backup_keys) > 5:
-            oldest_key = sorted(backup_keys)[0]
-            del st.session_state[oldest_key]
-            
+        # Bounded per context and counted against the session memory budget
+        state_manager.add_recovery_point(context, data)
     except Exception as e:
         logger.error(f"Failed to create recovery point: {e}")
 
+def restore_from_recovery_point(context: str) -> Optional[Any]:
+    """Return the newest recovery point data for context, or None"""
+    try:
+        return state_manager.get_recovery_point(context)
+    except Exception as e:
+        logger.error(f"Failed to restore recovery point: {e}")
+        return None
+
 # Error reporting and diagnostics
 def show_error_diagnostics():
     """Show error diagnostics page for debugging"""
@@ -468,6 +468,8 @@ def show_error_diagnostics():
     else:
         st.success("No errors recorded in this session")
 
+    show_memory_diagnostics()
+
 # Export error handling functions for easy importing
 __all__ = [
     'AppError', 'DatabaseError', 'ValidationError', 'FileOperationError', 'DataProcessingError',
@@ -0,0 +1,467 @@
+# fake_supabase.py - In-process PostgREST stand-in over SQLite
+"""
+A drop-in replacement for the Supabase connection used by data_storage,
+backed by SQLite, so the database code paths can be tested, profiled and
+benchmarked without a live project:
+
+    from scripts.fake_supabase import FakeSupabaseConnection
+    from scripts.data_storage import set_supabase_connection
+
+    set_supabase_connection(FakeSupabaseConnection(latency=0.02, max_rows=1000))
+
+or, for the whole app, LUMINA_FAKE_SUPABASE=<sqlite file> (see
+FAKE_SUPABASE_SETTINGS), which also switches lumina_app to database mode.
+
+Only the client surface data_storage uses is implemented:
+table().select().range()/limit(), insert(), upsert(on_conflict=) and delete() with
+not_/is_/eq/neq/gt/gte/lt/lte filters, rpc() (truncate_table built in, more via register_rpc) and
+auth.get_user(). Tables are created, and grow columns, on first insert
+(get_fake_connection() also creates the meal log tables up front);
+every row gets an auto-incremented id like the Supabase tables. An upsert
+creates the unique index its on_conflict columns need, standing in for the
+constraint the real table must have.
+
+Server behaviour that matters for the client code can be simulated:
+- latency (+ uniform jitter) per request, slept outside the database lock so
+  concurrent requests overlap the way they would against a real server
+- max_rows: selects return at most this many rows (PostgREST db-max-rows)
+- max_request_rows: larger inserts fail with a 413 payload error
+- failure_rate: random transient 503 errors (seeded), and fail_next() to
+  queue specific exceptions for the next requests
+"""
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+from scripts.constants import FAKE_SUPABASE_SETTINGS
+from scripts.meal_log import MEAL_TABLE_COLUMNS
+
+class APIError(Exception):
+    """Error response, shaped like postgrest.exceptions.APIError"""
+
+    def __init__(self, message: str, code: str = None, details: str = None, hint: str = None):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+        self.details = details
+        self.hint = hint
+
+    def json(self) -> Dict:
+        return {'message': self.message, 'code': self.code, 'details': self.details, 'hint': self.hint}
+
+class APIResponse:
+    """What postgrest's execute() returns: the rows and an optional count"""
+    __slots__ = ('data', 'count')
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+def _quote(identifier: str) -> str:
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+def _to_sql_value(value):
+    if hasattr(value, 'item'):
+        # numpy scalars
+        return value.item()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+def _record_values(record, columns, allow_nan=False) -> tuple:
+    """
+    SQL parameters of one inserted record. NaN and infinity have no JSON
+    representation, so a client request carrying them fails instead of
+    storing null; fixtures (allow_nan) store NaN as NULL
+    """
+    values = tuple(_to_sql_value(record.get(column)) for column in columns)
+    if any(isinstance(value, float) and not math.isfinite(value) for value in values):
+        if not allow_nan:
+            column, value = next((c, v) for c, v in zip(columns, values)
+                                 if isinstance(v, float) and not math.isfinite(v))
+            raise APIError("Empty or invalid json", code='400',
+                           details=f"{value} in column {column} is not valid JSON")
+        values = tuple(None if isinstance(value, float) and math.isnan(value) else value for value in values)
+    return values
+
+def _sqlite_error_code(message: str) -> str:
+    """The Postgres error code PostgREST would report for a SQLite error"""
+    if 'no such table' in message:
+        return '42P01'  # undefined_table
+    if 'no such column' in message or 'has no column named' in message:
+        return '42703'  # undefined_column
+    return '400'
+
+_COMPARISONS = {'eq': '=', 'neq': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+class FakeQuery:
+    """One request being built by the chained query-builder calls"""
+
+    def __init__(self, connection, table: str):
+        self._connection = connection
+        self._table = table
+        self._operation = None
+        self._columns = '*'
+        self._records = None
+        self._on_conflict = None
+        self._ignore_duplicates = False
+        self._filters = []
+        self._range = None
+        self._negate_next = False
+
+    # ---- operations ----
+    def select(self, columns: str = '*', count=None):
+        self._operation = 'select'
+        self._columns = columns
+        return self
+
+    def insert(self, records):
+        self._operation = 'insert'
+        self._records = [records] if isinstance(records, dict) else list(records)
+        return self
+
+    def upsert(self, records, on_conflict: str = '', ignore_duplicates: bool = False):
+        self._operation = 'upsert'
+        self._records = [records] if isinstance(records, dict) else list(records)
+        self._on_conflict = on_conflict or 'id'
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def delete(self):
+        self._operation = 'delete'
+        return self
+
+    # ---- modifiers ----
+    def range(self, start: int, end: int):
+        self._range = (int(start), int(end))
+        return self
+
+    def limit(self, size: int):
+        start = self._range[0] if self._range else 0
+        self._range = (start, start + int(size) - 1)
+        return self
+
+    @property
+    def not_(self):
+        self._negate_next = True
+        return self
+
+    def is_(self, column: str, value):
+        value = None if value in (None, 'null') else value
+        clause = f"{_quote(column)} IS NULL" if value is None else f"{_quote(column)} IS ?"
+        return self._add_filter(clause, () if value is None else (value,))
+
+    def eq(self, column: str, value):
+        return self._compare('eq', column, value)
+
+    def neq(self, column: str, value):
+        return self._compare('neq', column, value)
+
+    def gt(self, column: str, value):
+        return self._compare('gt', column, value)
+
+    def gte(self, column: str, value):
+        return self._compare('gte', column, value)
+
+    def lt(self, column: str, value):
+        return self._compare('lt', column, value)
+
+    def lte(self, column: str, value):
+        return self._compare('lte', column, value)
+
+    def _compare(self, operator: str, column: str, value):
+        return self._add_filter(f"{_quote(column)} {_COMPARISONS[operator]} ?", (_to_sql_value(value),))
+
+    def _add_filter(self, clause: str, params):
+        if self._negate_next:
+            clause = f"NOT ({clause})"
+            self._negate_next = False
+        self._filters.append((clause, tuple(params)))
+        return self
+
+    def execute(self) -> APIResponse:
+        if self._operation is None:
+            raise ValueError("Query has no operation (select, insert, upsert or delete)")
+        return self._connection._execute(self._operation, self._table, lambda: self._connection._run_query(self))
+
+class FakeRpcCall:
+    """conn.rpc(name, params); runs a registered function on execute()"""
+
+    def __init__(self, connection, name: str, params: Dict):
+        self._connection = connection
+        self._name = name
+        self._params = params or {}
+
+    def execute(self) -> APIResponse:
+        return self._connection._execute('rpc', self._name, lambda: self._connection._run_rpc(self._name, self._params))
+
+class FakeAuth:
+    """The auth.get_user() part of the Supabase auth client"""
+
+    def __init__(self, user_id: str = None, email: str = None):
+        self.user_id = user_id
+        self.email = email
+
+    def get_user(self, jwt: str = None):
+        if self.user_id is None:
+            return None
+        return SimpleNamespace(user=SimpleNamespace(id=self.user_id, email=self.email, role='authenticated'))
+
+class FakeSupabaseConnection:
+    """Stand-in for st.connection('supabase') over a SQLite database"""
+
+    def __init__(self, database: str = ':memory:', latency: float = 0.0, jitter: float = 0.0,
+                 max_rows: int = None, max_request_rows: int = None, failure_rate: float = 0.0,
+                 failure_operations=None, seed: int = 0, user_id: str = FAKE_SUPABASE_SETTINGS['user_id']):
+        self.latency = latency
+        self.jitter = jitter
+        self.max_rows = max_rows
+        self.max_request_rows = max_request_rows
+        self.failure_rate = failure_rate
+        self.failure_operations = set(failure_operations) if failure_operations else None
+        self.auth = FakeAuth(user_id)
+        self._random = random.Random(seed)
+        self._queued_failures: List[Exception] = []
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(database, check_same_thread=False)
+        self._columns: Dict[str, List[str]] = {}
+        self._rpc_functions: Dict[str, Callable] = {'truncate_table': self._truncate_table}
+        self.requests = 0
+        self.failures = 0
+        self.rows_returned = 0
+        self.rows_written = 0
+
+    def table(self, table_name: str) -> FakeQuery:
+        return FakeQuery(self, table_name)
+
+    def rpc(self, name: str, params: Dict = None) -> FakeRpcCall:
+        return FakeRpcCall(self, name, params)
+
+    def register_rpc(self, name: str, function: Callable):
+        """Make conn.rpc(name, params) call function(connection, **params) under the database lock"""
+        self._rpc_functions[name] = function
+
+    # ---- failure injection ----
+    def fail_next(self, count: int = 1, error: Exception = None):
+        """Fail the next count requests with error (default a transient 503)"""
+        with self._lock:
+            for _ in range(count):
+                self._queued_failures.append(error or APIError("Service Unavailable", code='503'))
+
+    # ---- fixtures (no latency or failures, not part of the Supabase API) ----
+    def load_table(self, table_name: str, records):
+        """Replace a table's rows directly, e.g. to reset state between benchmark rounds"""
+        with self._lock:
+            self._ensure_table(table_name, [])
+            self._db.execute(f"DELETE FROM {_quote(table_name)}")
+            # Seeded like a CSV import, not sent as JSON: NaN becomes NULL
+            self._insert(table_name, list(records), allow_nan=True)
+            self._db.commit()
+
+    def create_table(self, table_name: str, columns):
+        """Create a table (or add missing columns) as a schema migration would"""
+        with self._lock:
+            self._ensure_table(table_name, list(columns))
+            self._db.commit()
+
+    def row_count(self, table_name: str) -> int:
+        with self._lock:
+            if not self._has_table(table_name):
+                return 0
+            return self._db.execute(f"SELECT COUNT(*) FROM {_quote(table_name)}").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'requests': self.requests, 'failures': self.failures,
+            'rows_returned': self.rows_returned, 'rows_written': self.rows_written
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # ---- request handling ----
+    def _execute(self, operation: str, target: str, handler: Callable) -> APIResponse:
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        with self._lock:
+            self.requests += 1
+            failure = self._pick_failure(operation)
+            if failure is not None:
+                self.failures += 1
+                raise failure
+            try:
+                data = handler()
+                self._db.commit()
+            except APIError:
+                self._db.rollback()
+                self.failures += 1
+                raise
+            except sqlite3.Error as e:
+                self._db.rollback()
+                self.failures += 1
+                raise APIError(str(e), code=_sqlite_error_code(str(e))) from e
+        return APIResponse(data)
+
+    def _pick_failure(self, operation: str):
+        if self._queued_failures:
+            return self._queued_failures.pop(0)
+        if self.failure_rate and (self.failure_operations is None or operation in self.failure_operations):
+            if self._random.random() < self.failure_rate:
+                return APIError("Service Unavailable", code='503')
+        return None
+
+    def _run_query(self, query: FakeQuery):
+        if query._operation in ('insert', 'upsert'):
+            if self.max_request_rows is not None and len(query._records) > self.max_request_rows:
+                raise APIError("Payload Too Large", code='413',
+                               details=f"{len(query._records)} rows, at most {self.max_request_rows} per request")
+            if query._operation == 'upsert':
+                data = self._upsert(query._table, query._records, query._on_conflict, query._ignore_duplicates)
+            else:
+                data = self._insert(query._table, query._records)
+            self.rows_written += len(data)
+            return data
+        if query._operation == 'delete':
+            return self._delete(query._table, query._filters)
+        data = self._select(query._table, query._columns, query._filters, query._range)
+        self.rows_returned += len(data)
+        return data
+
+    def _run_rpc(self, name: str, params: Dict):
+        function = self._rpc_functions.get(name)
+        if function is None:
+            raise APIError(f"Could not find the function public.{name}", code='PGRST202')
+        return function(self, **params)
+
+    @staticmethod
+    def _truncate_table(connection, table_name: str):
+        if connection._has_table(table_name):
+            connection._db.execute(f"DELETE FROM {_quote(table_name)}")
+        return None
+
+    def _has_table(self, table_name: str) -> bool:
+        if table_name in self._columns:
+            return True
+        return self._db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+        ).fetchone() is not None
+
+    def _ensure_table(self, table_name: str, columns):
+        known = self._columns.get(table_name)
+        if known is None:
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS {_quote(table_name)} (id INTEGER PRIMARY KEY AUTOINCREMENT)")
+            known = self._columns[table_name] = [
+                row[1] for row in self._db.execute(f"PRAGMA table_info({_quote(table_name)})")
+            ]
+        for column in columns:
+            if column not in known:
+                self._db.execute(f"ALTER TABLE {_quote(table_name)} ADD COLUMN {_quote(column)}")
+                known.append(column)
+
+    @staticmethod
+    def _where(filters):
+        if not filters:
+            return '', ()
+        clauses = ' AND '.join(clause for clause, _ in filters)
+        return f" WHERE {clauses}", tuple(value for _, params in filters for value in params)
+
+    def _insert(self, table_name: str, records, allow_nan=False):
+        if not records:
+            return []
+        columns = list(dict.fromkeys(column for record in records for column in record))
+        self._ensure_table(table_name, columns)
+        placeholders = ', '.join('?' for _ in columns)
+        self._db.executemany(
+            f"INSERT INTO {_quote(table_name)} ({', '.join(_quote(c) for c in columns)}) VALUES ({placeholders})",
+            [_record_values(record, columns, allow_nan) for record in records]
+        )
+        return records
+
+    def _upsert(self, table_name: str, records, on_conflict: str, ignore_duplicates: bool):
+        if not records:
+            return []
+        columns = list(dict.fromkeys(column for record in records for column in record))
+        targets = [column.strip() for column in on_conflict.split(',')]
+        self._ensure_table(table_name, columns + targets)
+        if targets != ['id']:
+            index = _quote(f"{table_name}_{'_'.join(targets)}_key")
+            self._db.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {_quote(table_name)} ({', '.join(_quote(c) for c in targets)})"
+            )
+        updates = [column for column in columns if column not in targets]
+        if ignore_duplicates or not updates:
+            action = 'DO NOTHING'
+        else:
+            action = 'DO UPDATE SET ' + ', '.join(f"{_quote(c)} = excluded.{_quote(c)}" for c in updates)
+        placeholders = ', '.join('?' for _ in columns)
+        self._db.executemany(
+            f"INSERT INTO {_quote(table_name)} ({', '.join(_quote(c) for c in columns)}) VALUES ({placeholders}) "
+            f"ON CONFLICT ({', '.join(_quote(c) for c in targets)}) {action}",
+            [_record_values(record, columns) for record in records]
+        )
+        return records
+
+    def _delete(self, table_name: str, filters):
+        self._ensure_table(table_name, [])
+        where, params = self._where(filters)
+        self._db.execute(f"DELETE FROM {_quote(table_name)}{where}", params)
+        return []
+
+    def _select(self, table_name: str, columns: str, filters, row_range):
+        self._ensure_table(table_name, [])
+        requested = [] if columns.strip() == '*' else [c.strip() for c in columns.split(',')]
+        # SQLite reads an unknown "quoted" column as a string literal; PostgREST rejects it
+        unknown = [column for column in requested if column not in self._columns[table_name]]
+        if unknown:
+            raise APIError(f"column {table_name}.{unknown[0]} does not exist", code='42703')
+        selected = ', '.join(_quote(c) for c in requested) or '*'
+        where, params = self._where(filters)
+        sql = f"SELECT {selected} FROM {_quote(table_name)}{where} ORDER BY id"
+        start, limit = 0, None
+        if row_range is not None:
+            start, limit = row_range[0], max(row_range[1] - row_range[0] + 1, 0)
+        if self.max_rows is not None:
+            limit = self.max_rows if limit is None else min(limit, self.max_rows)
+        if limit is not None or start:
+            sql += f" LIMIT {-1 if limit is None else limit} OFFSET {start}"
+        cursor = self._db.execute(sql, params)
+        names = [description[0] for description in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+# ===================== PROCESS-WIDE STAND-IN =====================
+
+_connections: Dict[str, FakeSupabaseConnection] = {}
+_connections_lock = threading.Lock()
+
+def fake_supabase_enabled() -> bool:
+    return bool(os.environ.get(FAKE_SUPABASE_SETTINGS['env_var']))
+
+def get_fake_connection(database: str = None) -> FakeSupabaseConnection:
+    """
+    The shared stand-in for database (default: the LUMINA_FAKE_SUPABASE path),
+    created once per process and path, like st.connection's cached client
+    """
+    database = database or os.environ.get(FAKE_SUPABASE_SETTINGS['env_var']) or ':memory:'
+    with _connections_lock:
+        connection = _connections.get(database)
+        if connection is None:
+            latency_ms = float(os.environ.get(FAKE_SUPABASE_SETTINGS['latency_env_var'], 0) or 0)
+            connection = _connections[database] = FakeSupabaseConnection(
+                database, latency=latency_ms / 1000.0, max_rows=FAKE_SUPABASE_SETTINGS['max_rows']
+            )
+            # Like a project with MEAL_TABLE_SQL applied, which the app checks before logging meals
+            for table_name, columns in MEAL_TABLE_COLUMNS.items():
+                connection.create_table(table_name, columns)
+    return connection
+
+__all__ = [
+    'APIError', 'APIResponse', 'FakeQuery', 'FakeRpcCall', 'FakeAuth', 'FakeSupabaseConnection',
+    'fake_supabase_enabled', 'get_fake_connection'
+]
@@ -4,8 +4,18 @@ from datetime import datetime, time
 
 # Import existing modules (keeping original imports)
 from scripts.data_dashboard import datetime_to_string, time_to_string
-from scripts.data_storage import fetch_data_from_storage, add_registration, save_data_to_storage
-from scripts.constants import ACTIVITY_TYPES, get_activity_emoji
+from scripts.data_storage import (
+    fetch_data_from_storage, add_registration, save_data_to_storage, save_meal_to_database, load_meal_log,
+    TableSchemaError
+)
+from scripts.constants import ACTIVITY_TYPES, MEAL_BROWSER_SETTINGS, get_activity_emoji
+from scripts.reference_data import get_recipe_reference, get_meal_index
+from scripts.meal_log import (
+    filter_meal_index, get_meal_page, get_meal_items, parse_meal_code, get_quick_picks
+)
+from scripts.ui_components import (
+    create_meal_selection_interface, create_meal_search, create_pagination_controls, rerun_fragment
+)
 
 def simple_time_validation(selected_time):
     """Simple validation - only check if time is selected"""
@@ -14,7 +24,12 @@ def simple_time_validation(selected_time):
         return False
     return True
 
+@st.fragment
 def create_new_form_activity(bmr):
+    """
+    Activity registration form. Runs as a fragment: interacting with the form
+    only reruns the form; a successful save triggers a full app rerun.
+    """
     # Define activity types and emojis locally to avoid import issues
     ACTIVITY_TYPES = ["Walk", "Run", "Bike", "Swim", "Strength", "Yoga"]
     
@@ -169,9 +184,11 @@ def create_new_form_activity(bmr):
                 with st.expander("Error Details"):
                     st.code(str(e))
 
+@st.fragment
 def create_new_form_food(code, options_string, bmr, df_meal_items=None):
     """
-    Food registration form with clearing mechanism
+    Food registration form with clearing mechanism.
+    Runs as a fragment; a successful save triggers a full app rerun.
     """
     # Check if we just submitted successfully - if so, use cleared values
     if "food_just_submitted" in st.session_state and st.session_state.food_just_submitted:
@@ -257,24 +274,21 @@ def create_new_form_food(code, options_string, bmr, df_meal_items=None):
                 # SAVE MEAL TO DATABASE FIRST
                 if df_meal_items is not None and len(df_meal_items) > 0:
                     try:
-                        # Prepare meal data for database
-                        df_meal_to_save = df_meal_items.copy()
-                        df_meal_to_save['date'] = datetime_to_string(selected_date)
-                        df_meal_to_save['time'] = time_to_string(selected_time)
-                        df_meal_to_save['favorite'] = mark_favorite
-                        
-                        # Load existing meal database
-                        try:
-                            df_meal_db = fetch_data_from_storage('data/meal_databas.csv')
-                        except:
-                            df_meal_db = pd.DataFrame(columns=[
-                                'date', 'time', 'name', 'livsmedel', 'amount', 'code', 'favorite'
-                            ])
-                        
-                        # Save to database
-                        df_updated_meal_db = pd.concat([df_meal_db, df_meal_to_save], ignore_index=True)
-                        save_data_to_storage(df_updated_meal_db, 'data/meal_databas.csv')
+                        # Log the meal and bump its quick pick counters
+                        save_meal_to_database(
+                            datetime_to_string(selected_date),
+                            time_to_string(selected_time),
+                            df_meal_items['name'].iloc[0],
+                            df_meal_items.rename(columns={'livsmedel': 'Food', 'amount': 'Amount (g)'}),
+                            df_meal_items['code'].iloc[0],
+                            favorite=mark_favorite,
+                            recipes=st.session_state.get('find_recipie', [])
+                        )
                         
+                    except TableSchemaError as e:
+                        st.warning(f"Could not save meal to the meal log: table {e.table_name} is not set up "
+                                   f"({e.reason}). Run this in the Supabase SQL editor:")
+                        st.code(e.migration, language='sql')
                     except Exception as e:
                         st.warning(f"Could not save meal to database: {str(e)}")
                 
@@ -314,6 +328,7 @@ def create_new_form_food(code, options_string, bmr, df_meal_items=None):
                 with st.expander("Error Details"):
                     st.code(str(e))
 
+@st.fragment
 def create_form_add_food_item_to_database():
     """
     Create form for adding new food items to database with clearing
@@ -396,6 +411,7 @@ def create_form_add_food_item_to_database():
                         st.code(str(e))
 
 
+@st.fragment
 def create_form_add_recipie_to_database(meal_df, code):
     """
     Create form for adding recipes to database with clearing
@@ -486,9 +502,9 @@ def create_form_add_recipie_to_database(meal_df, code):
 
 def create_meal_selection_modal():
     """Create a modal for selecting previous meals - ORIGINAL FUNCTIONALITY"""
-    # Load meal database - ORIGINAL
+    # Load meal log and its templates
     try:
-        df_meal_db = fetch_data_from_storage('data/meal_databas.csv')
+        df_meal_db, df_templates = load_meal_log()
     except:
         st.error("No previous meals found in database")
         st.session_state.show_meal_modal = False
@@ -499,68 +515,9 @@ def create_meal_selection_modal():
         st.session_state.show_meal_modal = False
         return
     
-    # ORIGINAL meal selection interface
-    grouped_meals = df_meal_db.groupby(['name', 'date', 'time', 'code']).first().reset_index()
-    grouped_meals = grouped_meals.sort_values(['date', 'time'], ascending=False)
-    
-    # Search functionality - ORIGINAL
-    search_term = st.text_input("Search meals", help="Search by meal name")
-    
-    if search_term:
-        filtered_meals = grouped_meals[
-            grouped_meals['name'].str.contains(search_term, case=False, na=False)
-        ]
-    else:
-        filtered_meals = grouped_meals
-    
-    if filtered_meals.empty:
-        st.warning("No meals found matching your search")
-        return
-    
-    selected_meal = None
-    st.caption(f"Found {len(filtered_meals)} meals")
-    
-    for idx, row in filtered_meals.iterrows():
-        with st.expander(f"{row['name']} - {row['date']} at {row['time']}", expanded=False):
-            # Show meal details - ORIGINAL
-            meal_items = df_meal_db[
-                (df_meal_db['name'] == row['name']) & 
-                (df_meal_db['date'] == row['date']) & 
-                (df_meal_db['time'] == row['time'])
-            ]
-            
-            col_info1, col_info2 = st.columns(2)
-            with col_info1:
-                st.write(f"**Date:** {row['date']}")
-                st.write(f"**Time:** {row['time']}")
-                if row.get('favorite', False):
-                    st.write("⭐ **Favorite meal**")
-            
-            with col_info2:
-                st.write(f"**Nutrition code:** {row['code']}")
-                code_parts = row['code'].split('/')
-                if len(code_parts) == 4:
-                    st.write(f"**Energy:** {code_parts[0]} kcal")
-                    st.write(f"**Protein/Carbs/Fat:** {code_parts[1]}/{code_parts[2]}/{code_parts[3]} g")
-            
-            # Show ingredients - ORIGINAL
-            st.write("**Ingredients:**")
-            for _, item in meal_items.iterrows():
-                st.write(f"• {item['livsmedel']}: {item['amount']} g")
-            
-            # Select button - ORIGINAL
-            if st.button(f"Select this meal", key=f"select_meal_{idx}_{row['date']}_{row['time']}"):
-                selected_meal = {
-                    'name': row['name'],
-                    'date': row['date'],
-                    'time': row['time'],
-                    'code': row['code'],
-                    'favorite': row.get('favorite', False),
-                    'items': meal_items[['livsmedel', 'amount']].rename(
-                        columns={'livsmedel': 'Food', 'amount': 'Amount (g)'}
-                    )
-                }
-                break
+    # Paginated meal selection interface
+    selected_meal = create_meal_selection_interface(df_meal_db, df_templates, key="meal_modal",
+                                                    meal_index=get_meal_index())
     
     if selected_meal:
         # Store selected meal info - ORIGINAL
@@ -577,101 +534,155 @@ def create_meal_selection_modal():
         
         st.session_state.show_meal_modal = False
         st.success(f"Selected meal: {selected_meal['name']}")
-        st.rerun()
+        rerun_fragment()
 
 def create_copy_previous_meal_section():
     """
     Non-nested version of copy previous meal section for use inside expanders.
     Connected to meal_databas.csv
+    
+    The dropdown only lists one page of meals at a time, and the composition
+    is looked up only for the selected meal.
     """
     
     try:
-        # Load meal database (not recipie database!)
-        df_meal_db = fetch_data_from_storage('data/meal_databas.csv')
+        # Load meal log and templates (not recipie database!)
+        df_meal_db, df_templates = load_meal_log()
         
         if df_meal_db.empty:
             st.info("No previous meals found in meal database")
             return
             
-        # Group by meal name and get unique meals with their details
-        df_unique_meals = df_meal_db.groupby(['name', 'date', 'time']).first().reset_index()
-        df_unique_meals = df_unique_meals.sort_values(['date', 'time'], ascending=[False, False])
-        
         st.caption("Select a previous meal to copy to your current meal")
         
-        # Create dropdown options
-        meal_options = []
-        for _, row in df_unique_meals.iterrows():
-            option_text = f"{row['name']} - {row['date']} at {row['time']}"
-            meal_options.append({
-                'display': option_text,
-                'name': row['name'],
-                'date': row['date'], 
-                'time': row['time']
-            })
+        # Unique meals, newest first, narrowed down by search
+        search_term = create_meal_search("copy_meal")
+        df_unique_meals = filter_meal_index(get_meal_index(), search_term)
         
-        # Dropdown selection (no nested expanders!)
-        if meal_options:
-            selected_option = st.selectbox(
-                "Choose a previous meal",
-                options=[None] + meal_options,
-                format_func=lambda x: "Select a meal..." if x is None else x['display'],
-                key="previous_meal_selector"
+        if df_unique_meals.empty:
+            st.info("No previous meals found")
+            return
+        
+        # Only the current page of meals goes into the dropdown
+        page_size = MEAL_BROWSER_SETTINGS['copy_page_size']
+        page = create_pagination_controls(len(df_unique_meals), page_size, "copy_meal")
+        df_page_meals, page = get_meal_page(df_unique_meals, page, page_size)
+        
+        meal_options = [
+            {
+                'display': f"{name} - {meal_date} at {meal_time}",
+                'name': name,
+                'date': meal_date,
+                'time': meal_time,
+                'template_id': template_id
+            }
+            for name, meal_date, meal_time, template_id in zip(
+                df_page_meals['name'], df_page_meals['date'], df_page_meals['time'], df_page_meals['template_id']
             )
-            
-            if selected_option is not None:
-                # Show meal details in a simple container (not expander)
-                with st.container():
-                    st.markdown(f"**Selected:** {selected_option['display']}")
+        ]
+        
+        # Dropdown selection (no nested expanders!)
+        selected_option = st.selectbox(
+            "Choose a previous meal",
+            options=[None] + meal_options,
+            format_func=lambda x: "Select a meal..." if x is None else x['display'],
+            key=f"previous_meal_selector_{page}"
+        )
+        
+        if selected_option is not None:
+            # Show meal details in a simple container (not expander)
+            with st.container():
+                st.markdown(f"**Selected:** {selected_option['display']}")
+                
+                # Get all items for this specific meal
+                meal_items = get_meal_items(df_meal_db, selected_option, df_templates)
+                
+                if not meal_items.empty:
+                    # Show meal composition
+                    st.caption("Meal composition:")
+                    for food, amount in zip(meal_items['Food'], meal_items['Amount (g)']):
+                        st.write(f"• {food} - {amount}g")
                     
-                    # Get all items for this specific meal
-                    meal_items = df_meal_db[
-                        (df_meal_db['name'] == selected_option['name']) & 
-                        (df_meal_db['date'] == selected_option['date']) & 
-                        (df_meal_db['time'] == selected_option['time'])
+                    # Parse nutrition from code if available
+                    meal_code = df_page_meals.loc[
+                        (df_page_meals['name'] == selected_option['name']) &
+                        (df_page_meals['date'] == selected_option['date']) &
+                        (df_page_meals['time'] == selected_option['time']),
+                        'code'
                     ]
+                    code_parts = parse_meal_code(meal_code.iloc[0]) if len(meal_code) > 0 else None
+                    if code_parts:
+                        st.caption(f"Nutrition: {code_parts[0]} kcal, {code_parts[1]}g protein, {code_parts[2]}g carbs, {code_parts[3]}g fat")
                     
-                    if not meal_items.empty:
-                        # Show meal composition
-                        st.caption("Meal composition:")
-                        for _, item in meal_items.iterrows():
-                            st.write(f"• {item['livsmedel']} - {item['amount']}g")
+                    # Copy button
+                    if st.button("Copy This Meal", key="copy_selected_meal"):
+                        # Prepare meal items for copying
+                        meal_items['Amount (g)'] = meal_items['Amount (g)'].astype(float)
                         
-                        # Parse nutrition from code if available
-                        if 'code' in meal_items.columns and not pd.isna(meal_items['code'].iloc[0]):
-                            code_parts = str(meal_items['code'].iloc[0]).split('/')
-                            if len(code_parts) >= 4:
-                                st.caption(f"Nutrition: {code_parts[0]} kcal, {code_parts[1]}g protein, {code_parts[2]}g carbs, {code_parts[3]}g fat")
+                        # Store in session state
+                        st.session_state.copied_meal_items = meal_items.to_dict('records')
+                        st.session_state.selected_previous_meal = {
+                            'name': selected_option['name'],
+                            'date': selected_option['date'],
+                            'time': selected_option['time']
+                        }
                         
-                        # Copy button
-                        if st.button("Copy This Meal", key="copy_selected_meal"):
-                            # Prepare meal items for copying
-                            copied_items = []
-                            for _, item in meal_items.iterrows():
-                                copied_items.append({
-                                    'Food': item['livsmedel'],
-                                    'Amount (g)': float(item['amount'])
-                                })
-                            
-                            # Store in session state
-                            st.session_state.copied_meal_items = copied_items
-                            st.session_state.selected_previous_meal = {
-                                'name': selected_option['name'],
-                                'date': selected_option['date'],
-                                'time': selected_option['time']
-                            }
-                            
-                            st.success(f"Copied meal: {selected_option['name']}")
-                            st.rerun()
-                    else:
-                        st.warning("No items found for this meal")
-        else:
-            st.info("No previous meals found")
+                        st.success(f"Copied meal: {selected_option['name']}")
+                        rerun_fragment()
+                else:
+                    st.warning("No items found for this meal")
             
     except Exception as e:
         st.error(f"Error loading meal database: {str(e)}")
         st.caption("Make sure meal_databas.csv exists and is accessible")
 
+def create_quick_picks_section():
+    """
+    Show the most used meals and recipes, ranked by decayed frequency/recency.
+    Reads only the small meal_stats.csv counters table.
+    """
+    df_picks = get_quick_picks(fetch_data_from_storage('data/meal_stats.csv'))
+    
+    if df_picks.empty:
+        st.caption("Log a few meals to get quick picks here")
+        return
+    
+    def pick_meal(pick):
+        # Look up the most recent instance of this meal only when it is picked
+        df_meal_db, df_templates = load_meal_log()
+        meal = {'name': pick['name'], 'date': pick['last_date'], 'time': pick['last_time']}
+        meal_items = get_meal_items(df_meal_db, meal, df_templates)
+        if meal_items.empty:
+            st.session_state.quick_pick_missing = pick['name']
+            return
+        meal_items['Amount (g)'] = meal_items['Amount (g)'].astype(float)
+        st.session_state.copied_meal_items = meal_items.to_dict('records')
+        st.session_state.selected_previous_meal = meal
+    
+    def pick_recipe(pick):
+        if pick['name'] not in get_recipe_reference():
+            st.session_state.quick_pick_missing = pick['name']
+            return
+        selected_recipes = list(st.session_state.get('find_recipie', []))
+        if pick['name'] not in selected_recipes:
+            selected_recipes.append(pick['name'])
+        st.session_state.find_recipie = selected_recipes
+    
+    st.caption("Your most used meals and recipes")
+    for i, pick in enumerate(df_picks.to_dict('records')):
+        icon = "🍲" if pick['kind'] == 'recipe' else "🍽️"
+        st.button(
+            f"{icon} {pick['name']} ({int(pick['count'])}×)",
+            key=f"quick_pick_{pick['kind']}_{i}",
+            on_click=pick_recipe if pick['kind'] == 'recipe' else pick_meal,
+            args=(pick,),
+            use_container_width=True
+        )
+    
+    if st.session_state.get('quick_pick_missing'):
+        st.warning(f"'{st.session_state.quick_pick_missing}' is no longer in your database")
+        st.session_state.quick_pick_missing = None
+
 def get_copied_meal_items():
     """Get copied meal items from session state"""
     copied_items = st.session_state.get('copied_meal_items', [])
@@ -686,6 +697,7 @@ __all__ = [
     'create_form_add_food_item_to_database',
     'create_form_add_recipie_to_database',
     'create_copy_previous_meal_section',
+    'create_quick_picks_section',
     'create_meal_selection_modal',
     'get_copied_meal_items'
 ]
\ No newline at end of file
@@ -0,0 +1,385 @@
+# meal_log.py - Previous Meal Log Helpers for meRegAnno App
+"""
+In database mode the template based meal log needs a template_id column on
+meal_databas, a meal_templates table and, for quick picks, a meal_stats
+table. MEAL_TABLE_SQL holds the statements to run in the Supabase SQL
+editor; data_storage.check_meal_tables() refuses to write a table until
+they have been applied.
+"""
+import hashlib
+import json
+import pandas as pd
+from datetime import datetime
+from typing import Optional, Tuple, List
+
+from scripts.constants import QUICK_PICK_SETTINGS
+
+# Columns that together identify one logged meal in meal_databas.csv
+MEAL_KEY_COLUMNS = ['name', 'date', 'time']
+
+# Meal log rows reference a template instead of repeating the food items
+MEAL_LOG_COLUMNS = ['date', 'time', 'name', 'template_id', 'code', 'favorite']
+MEAL_TEMPLATE_COLUMNS = ['template_id', 'livsmedel', 'amount']
+
+
+# Schema for MEAL_TABLE_COLUMNS in Postgres
+MEAL_TABLE_SQL = {
+    'meal_databas': (
+        "ALTER TABLE meal_databas ADD COLUMN IF NOT EXISTS template_id text;\n"
+        "-- Only for a log created in the old one-row-per-food format:\n"
+        "ALTER TABLE meal_databas ALTER COLUMN livsmedel DROP NOT NULL, ALTER COLUMN amount DROP NOT NULL;"
+    ),
+    'meal_templates': (
+        "CREATE TABLE IF NOT EXISTS meal_templates (\n"
+        "    id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,\n"
+        "    template_id text NOT NULL,\n"
+        "    livsmedel text NOT NULL,\n"
+        "    amount double precision NOT NULL\n"
+        ");\n"
+        "CREATE INDEX IF NOT EXISTS meal_templates_template_id_idx ON meal_templates (template_id);"
+    ),
+    'meal_stats': (
+        "CREATE TABLE IF NOT EXISTS meal_stats (\n"
+        "    id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,\n"
+        "    kind text NOT NULL,\n"
+        "    name text NOT NULL,\n"
+        "    score double precision NOT NULL,\n"
+        "    count integer NOT NULL,\n"
+        "    last_used text,\n"
+        "    last_date text,\n"
+        "    last_time text\n"
+        ");"
+    )
+}
+
+# Columns of the quick pick counters table (meal_stats.csv)
+MEAL_STATS_COLUMNS = ['kind', 'name', 'score', 'count', 'last_used', 'last_date', 'last_time']
+
+# Database tables (and the columns written to them) behind the meal log
+MEAL_TABLE_COLUMNS = {
+    'meal_databas': MEAL_LOG_COLUMNS,
+    'meal_templates': MEAL_TEMPLATE_COLUMNS,
+    'meal_stats': MEAL_STATS_COLUMNS
+}
+
+def build_meal_index(df_meal_db: pd.DataFrame) -> pd.DataFrame:
+    """
+    Build a compact index with one row per logged meal, newest first
+
+    Args:
+        df_meal_db: Meal log, either template based or legacy (one row per food item)
+
+    Returns:
+        DataFrame with name, date, time, code, favorite and template_id
+    """
+    if df_meal_db is None or df_meal_db.empty:
+        return pd.DataFrame(columns=MEAL_KEY_COLUMNS + ['code', 'favorite', 'template_id'])
+
+    if is_legacy_meal_log(df_meal_db):
+        df_index = df_meal_db.groupby(MEAL_KEY_COLUMNS, sort=False).agg(
+            code=('code', 'first'),
+            favorite=('favorite', 'first')
+        ).reset_index()
+        df_index['template_id'] = None
+    else:
+        df_index = df_meal_db.drop_duplicates(MEAL_KEY_COLUMNS)[
+            MEAL_KEY_COLUMNS + ['code', 'favorite', 'template_id']
+        ]
+
+    return df_index.sort_values(['date', 'time'], ascending=False, ignore_index=True)
+
+def filter_meal_index(df_index: pd.DataFrame, search_term: str = None) -> pd.DataFrame:
+    """Filter the meal index by a case-insensitive search on the meal name"""
+    if not search_term:
+        return df_index
+    mask = df_index['name'].str.contains(search_term, case=False, na=False, regex=False)
+    return df_index[mask].reset_index(drop=True)
+
+def get_page_count(total_items: int, page_size: int) -> int:
+    """Number of pages needed to show all items (at least one)"""
+    return max(1, (total_items + page_size - 1) // page_size)
+
+def get_meal_page(df_index: pd.DataFrame, page: int, page_size: int) -> Tuple[pd.DataFrame, int]:
+    """
+    Slice a single page out of the meal index
+
+    Args:
+        df_index: Meal index from build_meal_index
+        page: Zero-based page number (clamped to the valid range)
+        page_size: Number of meals per page
+
+    Returns:
+        tuple: (page DataFrame, clamped page number)
+    """
+    page_count = get_page_count(len(df_index), page_size)
+    page = min(max(page, 0), page_count - 1)
+    start = page * page_size
+    return df_index.iloc[start:start + page_size], page
+
+def get_meal_id(meal: dict) -> str:
+    """Stable identifier for a logged meal, used in widget keys"""
+    return f"{meal['date']}_{meal['time']}_{meal['name']}"
+
+def get_meal_items(df_meal_db: pd.DataFrame, meal: dict, df_templates: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Fetch the food items of a single logged meal
+
+    Args:
+        df_meal_db: Meal log, either template based or legacy
+        meal: Mapping with at least name, date and time (and optionally template_id)
+        df_templates: Meal templates, required for a template based log
+
+    Returns:
+        DataFrame with columns 'Food' and 'Amount (g)'
+    """
+    if is_legacy_meal_log(df_meal_db):
+        mask = (
+            (df_meal_db['name'] == meal['name']) &
+            (df_meal_db['date'] == meal['date']) &
+            (df_meal_db['time'] == meal['time'])
+        )
+        df_items = df_meal_db.loc[mask]
+    else:
+        template_id = meal.get('template_id')
+        if template_id is None or pd.isna(template_id):
+            template_id = get_meal_template_id(df_meal_db, meal)
+        df_items = get_template_items(df_templates, template_id)
+
+    return df_items[['livsmedel', 'amount']].rename(
+        columns={'livsmedel': 'Food', 'amount': 'Amount (g)'}
+    ).reset_index(drop=True)
+
+def parse_meal_code(code) -> Optional[list]:
+    """Split a kcal/protein/carb/fat code into its four parts, or None if malformed"""
+    if code is None or pd.isna(code):
+        return None
+    code_parts = str(code).split('/')
+    if len(code_parts) < 4:
+        return None
+    return code_parts[:4]
+
+# ===================== MEAL TEMPLATES =====================
+
+def is_legacy_meal_log(df_meal_db: pd.DataFrame) -> bool:
+    """True if the meal log still stores one row per food item"""
+    return 'template_id' not in df_meal_db.columns and 'livsmedel' in df_meal_db.columns
+
+def meal_content_hash(df_items: pd.DataFrame) -> str:
+    """
+    Content hash of a meal's (food, grams) pairs, independent of item order
+
+    Args:
+        df_items: Items with 'Food'/'Amount (g)' or 'livsmedel'/'amount' columns
+
+    Returns:
+        Short hex digest used as template_id
+    """
+    foods = df_items['Food'] if 'Food' in df_items.columns else df_items['livsmedel']
+    amounts = df_items['Amount (g)'] if 'Amount (g)' in df_items.columns else df_items['amount']
+    pairs = sorted((str(food), round(float(amount), 1)) for food, amount in zip(foods, amounts))
+    payload = json.dumps(pairs, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+def get_meal_template_id(df_meal_log: pd.DataFrame, meal: dict) -> Optional[str]:
+    """Look up the template referenced by a logged meal"""
+    mask = (
+        (df_meal_log['name'] == meal['name']) &
+        (df_meal_log['date'] == meal['date']) &
+        (df_meal_log['time'] == meal['time'])
+    )
+    matches = df_meal_log.loc[mask, 'template_id']
+    return matches.iloc[0] if len(matches) > 0 else None
+
+def get_template_items(df_templates: pd.DataFrame, template_id: str) -> pd.DataFrame:
+    """Food items stored for one template"""
+    if df_templates is None or df_templates.empty or template_id is None:
+        return pd.DataFrame(columns=MEAL_TEMPLATE_COLUMNS)
+    return df_templates[df_templates['template_id'] == template_id]
+
+def add_meal_template(df_templates: pd.DataFrame, df_items: pd.DataFrame) -> Tuple[pd.DataFrame, str, bool]:
+    """
+    Register a meal's items as a template unless identical content already exists
+
+    Returns:
+        tuple: (templates table, template_id, whether a new template was added)
+    """
+    if df_templates is None or df_templates.empty:
+        df_templates = pd.DataFrame(columns=MEAL_TEMPLATE_COLUMNS)
+
+    template_id = meal_content_hash(df_items)
+    if (df_templates['template_id'] == template_id).any():
+        return df_templates, template_id, False
+
+    foods = df_items['Food'] if 'Food' in df_items.columns else df_items['livsmedel']
+    amounts = df_items['Amount (g)'] if 'Amount (g)' in df_items.columns else df_items['amount']
+    df_new_template = pd.DataFrame({
+        'template_id': template_id,
+        'livsmedel': list(foods),
+        'amount': [float(amount) for amount in amounts]
+    })
+    if df_templates.empty:
+        return df_new_template, template_id, True
+    return pd.concat([df_templates, df_new_template], ignore_index=True), template_id, True
+
+def migrate_meal_log(df_meal_db: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Convert a legacy meal log (one row per food item) to references plus templates
+
+    Returns:
+        tuple: (meal log with one row per meal, deduplicated templates)
+    """
+    log_rows = []
+    df_templates = pd.DataFrame(columns=MEAL_TEMPLATE_COLUMNS)
+    if df_meal_db is None or df_meal_db.empty:
+        return pd.DataFrame(columns=MEAL_LOG_COLUMNS), df_templates
+
+    for (name, date_str, time_str), df_items in df_meal_db.groupby(MEAL_KEY_COLUMNS, sort=False):
+        df_templates, template_id, _ = add_meal_template(df_templates, df_items)
+        log_rows.append({
+            'date': date_str,
+            'time': time_str,
+            'name': name,
+            'template_id': template_id,
+            'code': df_items['code'].iloc[0],
+            'favorite': df_items['favorite'].iloc[0]
+        })
+
+    return pd.DataFrame(log_rows, columns=MEAL_LOG_COLUMNS), df_templates
+
+# ===================== QUICK PICK COUNTERS =====================
+
+def decay_factor(last_used: str, now: datetime, half_life_days: float = None) -> float:
+    """Exponential decay applied to a score last updated at last_used"""
+    half_life_days = half_life_days or QUICK_PICK_SETTINGS['half_life_days']
+    try:
+        elapsed_days = (now - datetime.fromisoformat(str(last_used))).total_seconds() / 86400.0
+    except ValueError:
+        return 0.0
+    return 0.5 ** (max(elapsed_days, 0.0) / half_life_days)
+
+def _eaten_at(date_str: str, time_str: str) -> datetime:
+    return datetime.fromisoformat(f"{date_str} {str(time_str)[:5]}")
+
+def update_meal_stats(
+    df_stats: pd.DataFrame,
+    meal_name: str,
+    date_str: str,
+    time_str: str,
+    recipes: List[str] = None,
+    eaten_at: datetime = None
+) -> pd.DataFrame:
+    """
+    Incrementally bump the quick pick counters for one logged meal
+    
+    Only the rows for this meal and its recipes are touched; the meal log
+    itself is never read. last_used is the time the meal was eaten, not
+    when it was logged, so a backdated meal scores the same whether it is
+    logged live or seeded from the log: a use older than last_used adds its
+    own decayed weight and leaves last_used as it is.
+    
+    Args:
+        df_stats: Current counters table
+        meal_name: Name of the logged meal
+        date_str: Date the meal was eaten (YYYY-MM-DD)
+        time_str: Time the meal was eaten (HH:MM)
+        recipes: Recipe names that were part of the meal
+        eaten_at: Time the meal was eaten (defaults to date_str time_str)
+    
+    Returns:
+        Updated counters table
+    """
+    eaten_at = eaten_at or _eaten_at(date_str, time_str)
+    if df_stats is None or df_stats.empty:
+        df_stats = pd.DataFrame(columns=MEAL_STATS_COLUMNS)
+    df_stats = df_stats.reset_index(drop=True)
+    
+    entries = [('meal', meal_name)] + [('recipe', recipe) for recipe in (recipes or [])]
+    for kind, name in entries:
+        match = df_stats.index[(df_stats['kind'] == kind) & (df_stats['name'] == name)]
+        if len(match) > 0:
+            row = match[0]
+            last_used = df_stats.at[row, 'last_used']
+            try:
+                is_newer = eaten_at >= datetime.fromisoformat(str(last_used))
+            except ValueError:
+                is_newer = True
+            df_stats.at[row, 'count'] = int(df_stats.at[row, 'count']) + 1
+            if is_newer:
+                decayed = float(df_stats.at[row, 'score']) * decay_factor(last_used, eaten_at)
+                df_stats.at[row, 'score'] = decayed + 1.0
+                df_stats.at[row, 'last_used'] = eaten_at.isoformat(timespec='seconds')
+                df_stats.at[row, 'last_date'] = date_str
+                df_stats.at[row, 'last_time'] = time_str
+            else:
+                # Backdated: its weight as of last_used
+                df_stats.at[row, 'score'] = float(df_stats.at[row, 'score']) + decay_factor(
+                    eaten_at.isoformat(timespec='seconds'), datetime.fromisoformat(str(last_used))
+                )
+        else:
+            df_stats.loc[len(df_stats)] = {
+                'kind': kind,
+                'name': name,
+                'score': 1.0,
+                'count': 1,
+                'last_used': eaten_at.isoformat(timespec='seconds'),
+                'last_date': date_str,
+                'last_time': time_str
+            }
+    
+    return df_stats
+
+def seed_meal_stats(df_meal_db: pd.DataFrame, df_recipe_db: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Build the counters table from an existing meal log (one-time migration)
+    
+    Recipes are recognised when a meal name segment matches a recipe name.
+    """
+    df_stats = pd.DataFrame(columns=MEAL_STATS_COLUMNS)
+    df_index = build_meal_index(df_meal_db)
+    if df_index.empty:
+        return df_stats
+    
+    recipe_names = set(df_recipe_db['name']) if df_recipe_db is not None and not df_recipe_db.empty else set()
+    df_index = df_index.sort_values(['date', 'time'], ignore_index=True)
+    for name, date_str, time_str in zip(df_index['name'], df_index['date'], df_index['time']):
+        recipes = [part.split(' (')[0] for part in str(name).split('/')]
+        recipes = [recipe for recipe in recipes if recipe in recipe_names]
+        df_stats = update_meal_stats(df_stats, name, date_str, time_str, recipes)
+    
+    return df_stats
+
+def get_quick_picks(df_stats: pd.DataFrame, kind: str = None, top_k: int = None, now: datetime = None) -> pd.DataFrame:
+    """
+    Rank meals and recipes by their decayed frequency/recency score
+    
+    Args:
+        df_stats: Counters table
+        kind: 'meal' or 'recipe' to restrict the ranking (optional)
+        top_k: Number of picks to return
+        now: Reference time for the decay (defaults to now)
+    
+    Returns:
+        Top-k rows of the counters table with a 'rank_score' column
+    """
+    top_k = top_k or QUICK_PICK_SETTINGS['top_k']
+    now = now or datetime.now()
+    if df_stats is None or df_stats.empty:
+        return pd.DataFrame(columns=MEAL_STATS_COLUMNS + ['rank_score'])
+    
+    df_picks = df_stats if kind is None else df_stats[df_stats['kind'] == kind]
+    df_picks = df_picks.assign(rank_score=[
+        float(score) * decay_factor(last_used, now)
+        for score, last_used in zip(df_picks['score'], df_picks['last_used'])
+    ])
+    return df_picks.nlargest(top_k, 'rank_score')
+
+# Export meal log helpers
+__all__ = [
+    'MEAL_KEY_COLUMNS', 'MEAL_LOG_COLUMNS', 'MEAL_TEMPLATE_COLUMNS', 'MEAL_STATS_COLUMNS',
+    'MEAL_TABLE_COLUMNS', 'MEAL_TABLE_SQL',
+    'build_meal_index', 'filter_meal_index', 'get_page_count', 'get_meal_page', 'get_meal_id',
+    'get_meal_items', 'parse_meal_code',
+    'is_legacy_meal_log', 'meal_content_hash', 'get_meal_template_id', 'get_template_items',
+    'add_meal_template', 'migrate_meal_log',
+    'decay_factor', 'update_meal_stats', 'seed_meal_stats', 'get_quick_picks'
+]
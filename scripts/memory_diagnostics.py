@@ -0,0 +1,169 @@
+# memory_diagnostics.py - Memory footprint diagnostics for meRegAnno App
+"""
+Diagnostic mode for sizing containers: with LUMINA_MEMORY_DIAGNOSTICS=1
+(or MEMORY_SETTINGS['enabled']) tracemalloc snapshots are taken before and
+after every page render, and the top allocation sites of the render are kept
+per session. tracemalloc is process-wide: a render that overlapped another
+session's render also contains that session's allocations. Such reports are
+flagged, so only unflagged ones can be read as the page's own cost. Independently of tracing, the retained size of each session's
+st.session_state and of the shared frame cache can be estimated.
+
+show_memory_diagnostics() renders all of it as the memory section of
+show_error_diagnostics().
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+import pandas as pd
+
+from scripts.constants import MEMORY_SETTINGS
+
+MEMORY_DIAGNOSTICS_ENABLED = MEMORY_SETTINGS['enabled'] or os.environ.get(MEMORY_SETTINGS['env_var'], '0') == '1'
+
+# Allocations made by the tracer itself are not interesting
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>')
+]
+
+def start_tracing():
+    """Start tracemalloc once per process when diagnostics are enabled"""
+    if MEMORY_DIAGNOSTICS_ENABLED and not tracemalloc.is_tracing():
+        tracemalloc.start(MEMORY_SETTINGS['traceback_frames'])
+
+def _take_snapshot():
+    return tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+
+def compare_snapshots(before, after, top_n=None) -> List[Dict[str, Any]]:
+    """Top allocation sites (file:line) by bytes allocated between the snapshots"""
+    top_n = top_n or MEMORY_SETTINGS['top_allocations']
+    stats = after.compare_to(before, 'lineno')
+    return [
+        {
+            'site': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            'size_diff_bytes': stat.size_diff,
+            'count_diff': stat.count_diff,
+            'size_bytes': stat.size
+        }
+        for stat in stats[:top_n]
+    ]
+
+# Renders in progress across all sessions, and renders started so far
+_renders_lock = threading.Lock()
+_active_renders = 0
+_render_starts = 0
+
+@contextmanager
+def track_page_memory(page_name):
+    """
+    Snapshot before/after the enclosed page render and keep the report in the session
+
+    The diff is process-wide; 'overlapping_renders' counts the renders of
+    other sessions that ran during the window (0 means the numbers are this
+    render's own).
+    """
+    global _active_renders, _render_starts
+    if not MEMORY_DIAGNOSTICS_ENABLED or not tracemalloc.is_tracing():
+        yield
+        return
+
+    import streamlit as st
+    with _renders_lock:
+        others_running = _active_renders
+        starts_before = _render_starts
+        _active_renders += 1
+        _render_starts += 1
+    before = _take_snapshot()
+    try:
+        yield
+    finally:
+        after = _take_snapshot()
+        with _renders_lock:
+            _active_renders -= 1
+            overlapping = others_running + (_render_starts - starts_before - 1)
+        current, peak = tracemalloc.get_traced_memory()
+        reports = st.session_state.setdefault('_memory_page_reports', {})
+        reports[page_name] = {
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'render_diff_bytes': sum(stat.size_diff for stat in after.compare_to(before, 'filename')),
+            'overlapping_renders': overlapping,
+            'traced_current_bytes': current,
+            'traced_peak_bytes': peak,
+            'top_allocations': compare_snapshots(before, after)
+        }
+
+def estimate_size(value, _seen=None) -> int:
+    """Approximate retained bytes of value, following containers and DataFrames"""
+    _seen = _seen if _seen is not None else set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _seen) for item in value)
+    return size
+
+def get_session_memory(session_state=None) -> pd.DataFrame:
+    """Estimated bytes per st.session_state key, largest first"""
+    if session_state is None:
+        import streamlit as st
+        session_state = st.session_state
+    seen = set()
+    rows = [{'key': str(key), 'bytes': estimate_size(session_state[key], seen)} for key in list(session_state.keys())]
+    return pd.DataFrame(rows, columns=['key', 'bytes']).sort_values('bytes', ascending=False)
+
+def show_memory_diagnostics():
+    """Memory section of the diagnostics page"""
+    import streamlit as st
+    from scripts.data_storage import get_frame_cache_stats
+
+    st.subheader("Memory")
+
+    df_session = get_session_memory()
+    st.metric("This session's retained state", f"{df_session['bytes'].sum() / 1024:.1f} KiB")
+    st.dataframe(df_session.head(15), hide_index=True)
+
+    # Counted by state_management; its log lines are below the app's log level
+    budget = st.session_state.get('_memory_budget_stats')
+    if budget:
+        st.caption(f"Session memory budget: {budget['evicted_entries']} entries evicted "
+                   f"({budget['evicted_bytes'] / 1024:.1f} KiB), {budget['rejected_entries']} too large to keep "
+                   f"({budget['rejected_bytes'] / 1024:.1f} KiB)")
+    else:
+        st.caption("Session memory budget: nothing evicted or rejected")
+
+    df_cache = pd.DataFrame(get_frame_cache_stats(), columns=['backend', 'table', 'rows', 'bytes'])
+    st.caption(f"Shared frame cache (all sessions): {df_cache['bytes'].sum() / 1024:.1f} KiB")
+    if not df_cache.empty:
+        st.dataframe(df_cache, hide_index=True)
+
+    if not MEMORY_DIAGNOSTICS_ENABLED:
+        st.caption(f"Set {MEMORY_SETTINGS['env_var']}=1 to trace allocations per page render")
+        return
+
+    current, peak = tracemalloc.get_traced_memory()
+    st.caption(f"Traced memory (process-wide): {current / 1024 ** 2:.1f} MiB now, {peak / 1024 ** 2:.1f} MiB peak")
+    for page_name, report in st.session_state.get('_memory_page_reports', {}).items():
+        shared = report.get('overlapping_renders', 0)
+        scope = f"process-wide, overlapped {shared} other render(s)" if shared else "no other renders"
+        with st.expander(f"{page_name}: {report['render_diff_bytes'] / 1024:+.1f} KiB during last render "
+                         f"({scope}, {report['timestamp']})"):
+            st.dataframe(pd.DataFrame(report['top_allocations']), hide_index=True)
+
+__all__ = [
+    'MEMORY_DIAGNOSTICS_ENABLED', 'start_tracing', 'compare_snapshots', 'track_page_memory',
+    'estimate_size', 'get_session_memory', 'show_memory_diagnostics'
+]
@@ -0,0 +1,238 @@
+# metrics.py - Process-wide error and latency metrics for meRegAnno App
+"""
+Counters and latency histograms shared by every Streamlit session of the
+server process:
+
+    lumina_page_render_seconds{page}                         histogram
+    lumina_page_render_errors_total{page}                    counter
+    lumina_storage_call_seconds{backend,operation,table}     histogram
+    lumina_storage_errors_total{backend,operation,table}     counter
+    lumina_validation_failures_total{validator}              counter
+    lumina_errors_total{context,error_type}                  counter
+    lumina_supabase_requests_total{connection,http_version}  counter
+    lumina_supabase_connection_setup_seconds{phase}          histogram
+
+Render-time SLOs are computed from the histogram buckets, for example
+histogram_quantile(0.95, lumina_page_render_seconds_bucket{page="Dashboard"}).
+
+Set LUMINA_METRICS_FILE to write the registry after every rerun (.json
+selects JSON, anything else Prometheus text), or LUMINA_METRICS_PORT to serve
+it from http://127.0.0.1:<port>/metrics (and /metrics.json).
+"""
+import bisect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+from scripts.constants import METRICS_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(label_key: LabelKey, extra: str = '') -> str:
+    parts = [f'{name}="{_escape_label(value)}"' for name, value in label_key]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus semantics)"""
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the fraction-th observation"""
+        if not self.count:
+            return 0.0
+        rank, seen = fraction * self.count, 0
+        for upper, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return upper
+        return float('inf')
+
+    def to_dict(self) -> Dict:
+        return {
+            'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], self.counts)),
+            'sum': self.sum,
+            'count': self.count,
+            'p50': self.quantile(0.50),
+            'p95': self.quantile(0.95)
+        }
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by metric name and labels"""
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(buckets or METRICS_SETTINGS['latency_buckets_seconds'])
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, error_counter: str = None, **labels):
+        """Observe the block's duration in seconds; count exceptions in error_counter"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            if error_counter:
+                self.inc(error_counter, **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'counters': {
+                    name: [dict(key, value=value) for key, value in sorted(series.items())]
+                    for name, series in sorted(self.counters.items())
+                },
+                'histograms': {
+                    name: [dict(key, **histogram.to_dict()) for key, histogram in sorted(series.items())]
+                    for name, series in sorted(self.histograms.items())
+                }
+            }
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for upper, count in zip(list(histogram.buckets) + ['+Inf'], histogram.counts):
+                        cumulative += count
+                        bucket_labels = _format_labels(key, f'le="{upper}"')
+                        lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+# Global metrics registry instance
+metrics_registry = MetricsRegistry()
+
+def export_metrics(path: str) -> str:
+    """Write the registry to path (JSON for .json, Prometheus text otherwise)"""
+    if path.endswith('.json'):
+        content = json.dumps({'exported_at': time.time(), **metrics_registry.to_dict()}, indent=2, default=str)
+    else:
+        content = metrics_registry.to_prometheus()
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Unique temp file: every session's rerun exports, possibly at the same time
+    fd, temp_path = tempfile.mkstemp(dir=directory or '.', prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        # mkstemp creates the file owner-only; scrapers usually run as another user
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return path
+
+def get_metrics_export_path():
+    return os.environ.get(METRICS_SETTINGS['export_env_var']) or METRICS_SETTINGS['export_path']
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] == '/metrics.json':
+            body, content_type = json.dumps(metrics_registry.to_dict(), default=str), 'application/json'
+        elif self.path.split('?')[0] == '/metrics':
+            body, content_type = metrics_registry.to_prometheus(), 'text/plain; version=0.0.4'
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # Scrapes are not worth a log line each
+        pass
+
+_server_lock = threading.Lock()
+_server = None
+
+def start_metrics_server(port: int = None, host: str = None):
+    """
+    Serve /metrics and /metrics.json from a daemon thread (once per process)
+
+    Without a port, LUMINA_METRICS_PORT is used; nothing starts when neither
+    is set. Returns the server, or None.
+    """
+    global _server
+    port = port or int(os.environ.get(METRICS_SETTINGS['port_env_var'], 0) or 0)
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host or METRICS_SETTINGS['http_host'], port), _MetricsRequestHandler)
+            except OSError as e:
+                # Another process (or a reloaded copy of this module) holds the port
+                logger.warning(f"Metrics endpoint not started on port {port}: {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, name='lumina-metrics', daemon=True).start()
+    return _server
+
+__all__ = [
+    'Histogram', 'MetricsRegistry', 'metrics_registry', 'export_metrics',
+    'get_metrics_export_path', 'start_metrics_server'
+]
@@ -2,20 +2,20 @@ import pandas as pd
 
 from scripts.data_storage import fetch_data_from_storage
 from scripts.data_storage import save_data_to_storage
+from scripts.reference_data import get_food_reference
+from scripts.performance import track_performance
 
+@track_performance(category="analytics")
 def locate_eatables(df_meal):
+    # Shared name index, instead of re-reading the food database per item
+    food_reference = get_food_reference()
     eatables = df_meal['Food'].values
     found_eatables = []
     for j in range(0, len(eatables)):
-        df_db = fetch_data_from_storage('data/livsmedelsdatabas.csv')
         this_eatable = eatables[j]
-        look_for_eatable = df_db.loc[df_db['livsmedel'] == this_eatable]    
-        if len(look_for_eatable) == 0:            
+        if this_eatable not in food_reference:            
             # 1 Look if eatable has other names/alternatives in the database
-            contains_eatable = df_db['livsmedel'].str.contains(this_eatable).values
-            df_db.insert(0, 'contains', contains_eatable)
-            result_list = df_db.loc[df_db['contains'] == True]
-            suggestions = result_list['livsmedel'].values
+            suggestions = food_reference.search(this_eatable)
             if len(suggestions) != 0:
                 print('Altenativ för ' + this_eatable + ':')
                 for i in range(0, len(suggestions)):        
@@ -26,9 +26,9 @@ def locate_eatables(df_meal):
                 print(eatables[j] + ' behöver adderas till databasen.')
                 break
         else:
-            found_eatables.append(look_for_eatable)
+            found_eatables.append(this_eatable)
     if len(eatables) == len(found_eatables):
-        df_result = pd.concat(found_eatables)
+        df_result = food_reference.get_rows(found_eatables)
         return df_result
 
 def code_detector(df_meal, df_nutrition, portions):
@@ -0,0 +1,230 @@
+# performance.py - Rerun timing and hot-path instrumentation for meRegAnno App
+"""
+Timing for storage, analytics and rendering functions.
+
+Decorate functions with @track_performance(...). While timing is disabled
+(the default) the wrapper only checks a flag and calls straight through.
+Enable it with PERFORMANCE_SETTINGS['enabled'] or LUMINA_PERF_TIMING=1.
+Once enabled, each call records wall time, rows in/out and call counts.
+The app calls begin_rerun() / end_rerun() around every script run, and
+show_performance_panel() renders the breakdown in the sidebar.
+
+Pages are @st.fragment functions, and most interactions rerun only the
+fragment, which skips the module-level begin/end. @instrument_page(...)
+goes under @st.fragment on every page. It closes the breakdown for
+fragment reruns, and it times every render, full or fragment, into the
+page render histogram and applies the profiling and memory hooks.
+"""
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+from scripts.constants import PERFORMANCE_SETTINGS
+
+def _count_rows(value) -> int:
+    """Rows in a DataFrame/Series, or summed over a tuple/list/dict of them"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(len(item) for item in value if isinstance(item, (pd.DataFrame, pd.Series)))
+    return 0
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    position = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[position]
+
+class PerformanceTracker:
+    """Collects per-rerun call timings and process-wide rolling history"""
+
+    def __init__(self):
+        self.enabled = PERFORMANCE_SETTINGS['enabled'] or os.environ.get(PERFORMANCE_SETTINGS['env_var'], '0') == '1'
+        self.history_size = PERFORMANCE_SETTINGS['history_size']
+        # Each session's script runs in its own thread
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.history: Dict[str, deque] = {}
+        self.total_calls: Dict[str, int] = {}
+        self.rerun_history = deque(maxlen=self.history_size)
+
+    def _current_run(self) -> Dict[str, Dict]:
+        if not hasattr(self._local, 'run'):
+            self._local.run = {}
+            self._local.run_started = time.perf_counter()
+        return self._local.run
+
+    def record(self, name: str, category: str, elapsed: float, rows_in: int, rows_out: int):
+        """Record one call in the current rerun and in the rolling history"""
+        entry = self._current_run().setdefault(name, {
+            'function': name, 'category': category, 'calls': 0,
+            'total_ms': 0.0, 'max_ms': 0.0, 'rows_in': 0, 'rows_out': 0
+        })
+        elapsed_ms = elapsed * 1000.0
+        entry['calls'] += 1
+        entry['total_ms'] += elapsed_ms
+        entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+        entry['rows_in'] += rows_in
+        entry['rows_out'] += rows_out
+
+        with self._lock:
+            self.history.setdefault(name, deque(maxlen=self.history_size)).append(elapsed_ms)
+            self.total_calls[name] = self.total_calls.get(name, 0) + 1
+
+    def begin_rerun(self):
+        """Start a new rerun breakdown for the calling session thread"""
+        self._local.run = {}
+        self._local.run_started = time.perf_counter()
+
+    def end_rerun(self) -> Dict:
+        """Close the current rerun; returns its breakdown"""
+        run = self._current_run()
+        rerun_ms = (time.perf_counter() - self._local.run_started) * 1000.0
+        with self._lock:
+            self.rerun_history.append(rerun_ms)
+        last_run = {
+            'rerun_ms': rerun_ms,
+            'calls': sorted(run.values(), key=lambda entry: entry['total_ms'], reverse=True)
+        }
+        self._local.run = {}
+        return last_run
+
+    def get_rolling_stats(self) -> pd.DataFrame:
+        """p50/p95 per function over the last history_size calls"""
+        with self._lock:
+            snapshot = {name: sorted(values) for name, values in self.history.items()}
+            total_calls = dict(self.total_calls)
+        rows = [
+            {
+                'function': name,
+                'calls': total_calls.get(name, 0),
+                'p50_ms': _percentile(values, 0.50),
+                'p95_ms': _percentile(values, 0.95)
+            }
+            for name, values in snapshot.items()
+        ]
+        return pd.DataFrame(rows, columns=['function', 'calls', 'p50_ms', 'p95_ms']).sort_values('p95_ms', ascending=False)
+
+    def get_rerun_percentiles(self) -> Dict[str, float]:
+        with self._lock:
+            values = sorted(self.rerun_history)
+        return {'p50_ms': _percentile(values, 0.50), 'p95_ms': _percentile(values, 0.95), 'reruns': len(values)}
+
+    def reset(self):
+        with self._lock:
+            self.history.clear()
+            self.total_calls.clear()
+            self.rerun_history.clear()
+
+# Global performance tracker instance
+performance_tracker = PerformanceTracker()
+
+def track_performance(context: str = None, category: str = "analytics"):
+    """
+    Decorator recording wall time, rows in/out and call count of a function
+
+    Args:
+        context: Name shown in the timing panel (defaults to the function name)
+        category: 'storage', 'analytics' or 'render'
+    """
+    def decorator(func: Callable):
+        name = context or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not performance_tracker.enabled:
+                return func(*args, **kwargs)
+
+            rows_in = sum(_count_rows(arg) for arg in args) + sum(_count_rows(arg) for arg in kwargs.values())
+            result = None
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                performance_tracker.record(name, category, time.perf_counter() - started, rows_in, _count_rows(result))
+        return wrapper
+    return decorator
+
+def begin_rerun():
+    if performance_tracker.enabled:
+        performance_tracker.begin_rerun()
+
+def end_rerun():
+    """Close the rerun and keep its breakdown in the session for the panel"""
+    if not performance_tracker.enabled:
+        return
+    import streamlit as st
+    st.session_state['_performance_last_run'] = performance_tracker.end_rerun()
+
+def is_fragment_rerun() -> bool:
+    """True while Streamlit reruns only fragments, not the whole script"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except Exception:
+        return False
+    return bool(ctx is not None and ctx.fragment_ids_this_run)
+
+def instrument_page(page_name: str, data_rows: Callable = None):
+    """
+    Decorator for a page function, placed under @st.fragment and under
+    handle_errors, so page exceptions are counted before they are swallowed
+
+    data_rows is a callable giving the rows the page works on, for profile names.
+    """
+    def decorator(func: Callable):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            from scripts.memory_diagnostics import track_page_memory
+            from scripts.metrics import metrics_registry
+            from scripts.profiling import profile_rerun
+
+            fragment_run = is_fragment_rerun()
+            if fragment_run:
+                begin_rerun()
+            try:
+                # LUMINA_PROFILE=<page|1> or ?profile=<page|1> profiles one render of the page
+                # LUMINA_MEMORY_DIAGNOSTICS=1 snapshots tracemalloc around the page render
+                with profile_rerun(page_name, data_rows), track_page_memory(page_name), \
+                        metrics_registry.timer('lumina_page_render_seconds', 'lumina_page_render_errors_total',
+                                               page=page_name):
+                    return func(*args, **kwargs)
+            finally:
+                if fragment_run:
+                    end_rerun()
+        return wrapper
+    return decorator
+
+def show_performance_panel():
+    """Collapsible sidebar panel: last rerun breakdown and rolling p50/p95"""
+    if not performance_tracker.enabled:
+        return
+    import streamlit as st
+
+    with st.sidebar.expander("Performance", expanded=False):
+        last_run = st.session_state.get('_performance_last_run')
+        reruns = performance_tracker.get_rerun_percentiles()
+        st.caption(
+            f"Rerun p50 {reruns['p50_ms']:.0f} ms / p95 {reruns['p95_ms']:.0f} ms "
+            f"over {reruns['reruns']} reruns"
+        )
+        if last_run:
+            st.markdown(f"**Last rerun: {last_run['rerun_ms']:.0f} ms**")
+            st.dataframe(pd.DataFrame(last_run['calls']).round(1), hide_index=True)
+        st.markdown("**Rolling per function**")
+        st.dataframe(performance_tracker.get_rolling_stats().round(1), hide_index=True)
+        if st.button("Reset timings", key="reset_performance_timings"):
+            performance_tracker.reset()
+
+__all__ = [
+    'PerformanceTracker', 'performance_tracker', 'track_performance',
+    'begin_rerun', 'end_rerun', 'is_fragment_rerun', 'instrument_page', 'show_performance_panel'
+]
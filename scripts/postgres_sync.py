@@ -0,0 +1,190 @@
+# postgres_sync.py - Bulk table replacement through Postgres COPY
+"""
+Optional direct-database path for full syncs. Instead of hundreds of
+PostgREST insert requests, the cleaned frame is streamed with
+COPY ... FROM STDIN into a temporary staging table, checked, and swapped
+into the target table in the same transaction: readers see either the old
+or the new rows, and a failure at any step leaves the table untouched.
+
+The swap deletes and re-inserts inside the transaction rather than renaming
+tables, so the target keeps its row level security policies, grants and
+PostgREST schema cache entry.
+
+Enabled when a Postgres URL is configured (LUMINA_DATABASE_URL, or
+DATABASE_URL under [connections.supabase] in secrets.toml) and sqlalchemy /
+psycopg2 are installed. Against a local Postgres:
+
+    python -m scripts.postgres_sync --database-url postgresql://localhost/lumina
+"""
+import csv
+import io
+import logging
+import os
+import threading
+import time
+
+from scripts.constants import DATA_PATHS, DIRECT_DATABASE_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+def get_database_url():
+    """Postgres URL from the environment or secrets.toml, or None"""
+    url = os.environ.get(DIRECT_DATABASE_SETTINGS['url_env_var'])
+    if url:
+        return url
+    try:
+        import streamlit as st
+        return st.secrets['connections']['supabase'].get(DIRECT_DATABASE_SETTINGS['secrets_key'])
+    except Exception:
+        # No secrets file, or no [connections.supabase] section
+        return None
+
+def direct_sync_available(url=None) -> bool:
+    """True when a database URL is configured and the Postgres driver stack is installed"""
+    if not (url or get_database_url()):
+        return False
+    try:
+        import sqlalchemy  # noqa: F401
+        import psycopg2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+def get_engine(url=None):
+    """Process-wide SQLAlchemy engine per URL (sqlalchemy is imported on first use)"""
+    from sqlalchemy import create_engine
+
+    url = url or get_database_url()
+    if not url:
+        raise RuntimeError(f"No database URL configured (set {DIRECT_DATABASE_SETTINGS['url_env_var']})")
+    with _engines_lock:
+        engine = _engines.get(url)
+        if engine is None:
+            engine = _engines[url] = create_engine(url, pool_pre_ping=True)
+    return engine
+
+class CsvStream:
+    """
+    File-like CSV rendering of a frame for cursor.copy_expert, produced
+    chunk_rows rows at a time so the whole CSV never sits in memory
+    """
+
+    def __init__(self, df, columns, chunk_rows=None):
+        self._df = df[columns]
+        self._chunk_rows = chunk_rows or DIRECT_DATABASE_SETTINGS['copy_chunk_rows']
+        self._position = 0
+        self._pending = ''
+        self.bytes_read = 0
+
+    def _next_chunk(self) -> str:
+        chunk = self._df.iloc[self._position:self._position + self._chunk_rows]
+        self._position += self._chunk_rows
+        buffer = io.StringIO()
+        # Unquoted empty fields are NULL; text columns are read with FORCE_NOT_NULL
+        chunk.to_csv(buffer, index=False, header=False, na_rep='', quoting=csv.QUOTE_MINIMAL)
+        return buffer.getvalue()
+
+    def read(self, size=-1) -> str:
+        while (size is None or size < 0 or len(self._pending) < size) and self._position < len(self._df):
+            self._pending += self._next_chunk()
+        if size is None or size < 0:
+            data, self._pending = self._pending, ''
+        else:
+            data, self._pending = self._pending[:size], self._pending[size:]
+        self.bytes_read += len(data)
+        return data
+
+    readline = read
+
+def _table_columns(cursor, schema, table_name):
+    cursor.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_schema = %s AND table_name = %s",
+        (schema, table_name)
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+def copy_replace_table(df, table_name, url=None, schema=None):
+    """
+    Replace every row of schema.table_name with df in one transaction
+
+    df's columns must all exist in the table; columns it lacks (id, created_at,
+    ...) get their defaults. Returns the number of rows written.
+    """
+    from pandas.api.types import is_numeric_dtype
+    from psycopg2 import sql
+
+    schema = schema or DIRECT_DATABASE_SETTINGS['schema']
+    columns = [column for column in df.columns if column != 'id']
+    text_columns = [column for column in columns if not is_numeric_dtype(df[column])]
+    target = sql.Identifier(schema, table_name)
+    staging = sql.Identifier(f"{table_name}_staging")
+    column_list = sql.SQL(', ').join(sql.Identifier(column) for column in columns)
+
+    started = time.perf_counter()
+    connection = get_engine(url).raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL statement_timeout = %s", (DIRECT_DATABASE_SETTINGS['statement_timeout_ms'],))
+            unknown = [column for column in columns if column not in _table_columns(cursor, schema, table_name)]
+            if unknown:
+                raise ValueError(f"Columns not in {schema}.{table_name}: {unknown}")
+
+            # Same column types as the target, without its constraints or defaults
+            cursor.execute(sql.SQL("CREATE TEMP TABLE {} ON COMMIT DROP AS SELECT {} FROM {} WITH NO DATA").format(
+                staging, column_list, target
+            ))
+            copy_options = sql.SQL("FORMAT csv")
+            if text_columns:
+                copy_options = sql.SQL("FORMAT csv, FORCE_NOT_NULL ({})").format(
+                    sql.SQL(', ').join(sql.Identifier(column) for column in text_columns)
+                )
+            stream = CsvStream(df, columns)
+            cursor.copy_expert(
+                sql.SQL("COPY {} ({}) FROM STDIN WITH ({})").format(staging, column_list, copy_options).as_string(cursor),
+                stream
+            )
+            cursor.execute(sql.SQL("SELECT count(*) FROM {}").format(staging))
+            staged = cursor.fetchone()[0]
+            if staged != len(df):
+                raise RuntimeError(f"Staged {staged} rows, expected {len(df)}")
+
+            cursor.execute(sql.SQL("DELETE FROM {}").format(target))
+            cursor.execute(sql.SQL("INSERT INTO {} ({}) SELECT {} FROM {}").format(
+                target, column_list, column_list, staging
+            ))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    logger.info(f"COPY replaced {schema}.{table_name}: {staged} rows, {stream.bytes_read} bytes "
+                f"in {time.perf_counter() - started:.2f}s")
+    return staged
+
+def main(argv=None):
+    import argparse
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Replace energy_balance from the CSV file through COPY")
+    parser.add_argument('--database-url', help=f"Postgres URL (default: ${DIRECT_DATABASE_SETTINGS['url_env_var']})")
+    parser.add_argument('--csv', default=DATA_PATHS['energy_data'], help="energy_balance CSV to load")
+    parser.add_argument('--table', default='energy_balance')
+    args = parser.parse_args(argv)
+
+    from scripts.data_storage import prepare_energy_data
+    df_clean = prepare_energy_data(pd.read_csv(args.csv))
+    started = time.perf_counter()
+    rows = copy_replace_table(df_clean, args.table, url=args.database_url)
+    print(f"Replaced {args.table} with {rows} rows in {time.perf_counter() - started:.2f}s")
+
+if __name__ == '__main__':
+    main()
+
+__all__ = [
+    'get_database_url', 'direct_sync_available', 'get_engine', 'CsvStream', 'copy_replace_table'
+]
@@ -0,0 +1,177 @@
+# profiling.py - Opt-in per-rerun profiling for meRegAnno App
+"""
+Profiles a single render of one page with cProfile (applied per page by
+performance.instrument_page, so fragment reruns are covered) and writes:
+
+    profiles/<timestamp>_<page>_<rows>rows.prof              (pstats / snakeviz)
+    profiles/<timestamp>_<page>_<rows>rows.speedscope.json   (https://speedscope.app)
+
+Switch it on without editing code:
+- LUMINA_PROFILE=1 profiles the next render of every page once per session,
+  LUMINA_PROFILE=Summary (comma separated) only the named pages
+- ?profile=1 or ?profile=Summary in the URL profiles the next render of the
+  current/named page; the query param is removed afterwards
+"""
+import cProfile
+import json
+import os
+import pstats
+import re
+from contextlib import contextmanager
+from datetime import datetime
+
+from scripts.constants import PROFILE_SETTINGS
+
+def _requested_pages(value):
+    """None when off, 'all' for 1/true/all, otherwise a set of page names"""
+    if not value or value.strip().lower() in ('0', 'false', 'off'):
+        return None
+    if value.strip().lower() in ('1', 'true', 'all', 'on'):
+        return 'all'
+    return {page.strip() for page in value.split(',') if page.strip()}
+
+def _matches(requested, page_name):
+    return requested == 'all' or (requested is not None and page_name in requested)
+
+def should_profile(page_name):
+    """Whether this rerun of page_name should be profiled (consumes the request)"""
+    import streamlit as st
+
+    query_value = st.query_params.get(PROFILE_SETTINGS['query_param'])
+    if _matches(_requested_pages(query_value), page_name):
+        # One-shot: drop the param so the next rerun runs normally
+        del st.query_params[PROFILE_SETTINGS['query_param']]
+        return True
+
+    requested = _requested_pages(os.environ.get(PROFILE_SETTINGS['env_var']))
+    if _matches(requested, page_name):
+        profiled_pages = st.session_state.setdefault('_profiled_pages', set())
+        if page_name not in profiled_pages:
+            profiled_pages.add(page_name)
+            return True
+    return False
+
+def profile_filename(page_name, data_rows, timestamp=None):
+    """Base filename (no extension) with the page name and data size"""
+    timestamp = timestamp or datetime.now().strftime('%Y%m%d-%H%M%S')
+    page_slug = re.sub(r'[^A-Za-z0-9]+', '-', page_name).strip('-').lower()
+    return f"{timestamp}_{page_slug}_{int(data_rows)}rows"
+
+def _frame_name(func):
+    filename, line, name = func
+    if filename == '~':
+        # Built-ins are reported as ('~', 0, '<built-in method ...>')
+        return name, '', 0
+    return name, filename, line
+
+def pstats_to_speedscope(stats: pstats.Stats, profile_name: str) -> dict:
+    """
+    Convert cProfile stats to a speedscope 'sampled' profile
+
+    cProfile only keeps caller -> callee totals, so stacks are rebuilt by
+    walking down from the root functions and splitting each function's time
+    across its callers in proportion to the time spent under each caller
+    (the approach flameprof/gprof2dot use).
+    """
+    raw = stats.stats  # func -> (cc, nc, tt, ct, callers)
+    frames, frame_index = [], {}
+
+    def frame_id(func):
+        if func not in frame_index:
+            name, filename, line = _frame_name(func)
+            frame_index[func] = len(frames)
+            frames.append({'name': name, 'file': filename, 'line': line})
+        return frame_index[func]
+
+    children = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            children.setdefault(caller, []).append((func, edge[3]))
+
+    samples, weights = [], []
+    min_weight = PROFILE_SETTINGS['min_sample_seconds']
+    max_depth = PROFILE_SETTINGS['max_stack_depth']
+
+    def walk(func, time_here, stack):
+        cc, nc, tt, ct, _ = raw[func]
+        share = time_here / ct if ct > 0 else 0.0
+        stack = stack + [frame_id(func)]
+        self_time = tt * share
+        if self_time >= min_weight:
+            samples.append(stack)
+            weights.append(self_time)
+        if len(stack) >= max_depth:
+            return
+        for child, edge_time in children.get(func, []):
+            if child in raw and frame_index.get(child) not in stack:
+                child_time = edge_time * share
+                if child_time >= min_weight:
+                    walk(child, child_time, stack)
+
+    # Entry points: functions only called by themselves (recursive) or not at all
+    roots = [func for func, (_, _, _, _, callers) in raw.items() if not set(callers) - {func}]
+    if not roots and raw:
+        roots = [max(raw, key=lambda func: raw[func][3])]
+    for root in roots:
+        walk(root, raw[root][3], [])
+
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': profile_name,
+            'unit': 'seconds',
+            'startValue': 0,
+            'endValue': sum(weights),
+            'samples': samples,
+            'weights': weights
+        }],
+        'name': profile_name,
+        'activeProfileIndex': 0,
+        'exporter': 'lumina profiling.pstats_to_speedscope'
+    }
+
+def write_profile(profiler: cProfile.Profile, page_name, data_rows, output_dir=None):
+    """Write .prof and .speedscope.json files; returns their paths"""
+    output_dir = output_dir or PROFILE_SETTINGS['output_dir']
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.join(output_dir, profile_filename(page_name, data_rows))
+
+    prof_path = f"{base}.prof"
+    profiler.dump_stats(prof_path)
+
+    speedscope_path = f"{base}.speedscope.json"
+    profile_name = f"{page_name} ({int(data_rows)} rows)"
+    with open(speedscope_path, 'w') as f:
+        json.dump(pstats_to_speedscope(pstats.Stats(profiler), profile_name), f)
+    return prof_path, speedscope_path
+
+@contextmanager
+def profile_rerun(page_name, data_rows=None):
+    """
+    Profile the enclosed block when requested for page_name
+
+    data_rows is a callable giving the number of data rows the page works on;
+    it is only evaluated when a profile is written.
+    """
+    if not should_profile(page_name):
+        yield
+        return
+
+    import streamlit as st
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        rows = data_rows() if callable(data_rows) else (data_rows or 0)
+        prof_path, speedscope_path = write_profile(profiler, page_name, rows)
+        # Not st.sidebar: the page runs inside a fragment, which may only write to its own container
+        st.caption(f"Profile written: `{prof_path}`, `{speedscope_path}`")
+
+__all__ = [
+    'should_profile', 'profile_filename', 'pstats_to_speedscope',
+    'write_profile', 'profile_rerun'
+]
@@ -0,0 +1,122 @@
+# reference_data.py - Process-wide shared reference data for meRegAnno App
+"""
+Read-only structures derived from the food and recipe databases and the
+meal log, built once per server process with st.cache_resource and shared
+by every session.
+
+The structures are immutable (tuples, read-only numpy arrays, mapping
+proxies), so sessions never hold their own copy. Anything that needs to
+modify reference data asks for a copy and saves it through data_storage;
+the save bumps the table version, and the next lookup builds a fresh
+structure while readers of the old one are unaffected (copy-on-write).
+"""
+import streamlit as st
+import pandas as pd
+from types import MappingProxyType
+
+from scripts.constants import DATA_PATHS
+from scripts.data_storage import fetch_data_from_storage, get_table_version, load_meal_log
+from scripts.meal_log import build_meal_index
+
+NUTRIENT_COLUMNS = ['calorie', 'protein', 'carb', 'fat']
+
+class FoodReference:
+    """Food database as a name index plus a read-only nutrient matrix"""
+    def __init__(self, df_food: pd.DataFrame):
+        df_food = df_food.reset_index(drop=True)
+        self.names = tuple(df_food['livsmedel'].astype(str))
+
+        # First occurrence wins, like df.loc[df['livsmedel'] == name].iloc[0]
+        index = {}
+        for position, name in enumerate(self.names):
+            index.setdefault(name, position)
+        self.index = MappingProxyType(index)
+
+        nutrients = df_food.reindex(columns=NUTRIENT_COLUMNS).apply(pd.to_numeric, errors='coerce')
+        self.nutrients = nutrients.to_numpy(dtype=float)
+        self.nutrients.setflags(write=False)
+        self._frame = df_food
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def get_rows(self, names) -> pd.DataFrame:
+        """Return a copy of the database rows for names (first match each)"""
+        positions = [self.index[name] for name in names if name in self.index]
+        return self._frame.iloc[positions].copy()
+
+    def search(self, term) -> list:
+        """Names containing term"""
+        if not isinstance(term, str):
+            return []
+        return [name for name in self.names if term in name]
+
+    def to_frame(self) -> pd.DataFrame:
+        """Writable copy of the food database"""
+        return self._frame.copy()
+
+class RecipeReference:
+    """Recipe database expanded to (food, grams) items per recipe name"""
+    def __init__(self, df_recipes: pd.DataFrame):
+        expansion = {}
+        codes = {}
+        for name, df_recipe in df_recipes.groupby('name', sort=True):
+            amounts = pd.to_numeric(df_recipe['amount'], errors='coerce').to_numpy(dtype=float)
+            amounts.setflags(write=False)
+            expansion[name] = (tuple(df_recipe['livsmedel'].astype(str)), amounts)
+            codes[name] = df_recipe['code'].iloc[0] if 'code' in df_recipe.columns else ''
+        self.names = tuple(expansion.keys())
+        self.expansion = MappingProxyType(expansion)
+        self.codes = MappingProxyType(codes)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.expansion
+
+    def expand(self, name, portion_size=1.0) -> list:
+        """Meal items for a recipe scaled to portion_size, as Food/Amount (g) records"""
+        foods, amounts = self.expansion[name]
+        return [
+            {"Food": food, "Amount (g)": round(amount * portion_size, 1)}
+            for food, amount in zip(foods, amounts)
+        ]
+
+# Versions are part of the cache key: an edit bumps the version, so the next
+# lookup builds a new structure and the previous one ages out of the cache
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _build_food_reference(table_version):
+    return FoodReference(fetch_data_from_storage(DATA_PATHS['food_database']))
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _build_recipe_reference(table_version):
+    return RecipeReference(fetch_data_from_storage(DATA_PATHS['recipe_database']))
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _build_meal_index(table_version):
+    df_meal_log, _ = load_meal_log()
+    return build_meal_index(df_meal_log)
+
+def get_food_reference() -> FoodReference:
+    """Shared, read-only view of the food database"""
+    return _build_food_reference(get_table_version(DATA_PATHS['food_database']))
+
+def get_recipe_reference() -> RecipeReference:
+    """Shared, read-only view of the recipe database"""
+    return _build_recipe_reference(get_table_version(DATA_PATHS['recipe_database']))
+
+def get_meal_index() -> pd.DataFrame:
+    """
+    One row per logged meal, newest first (see build_meal_index), regrouped
+    only when the meal log changes. A copy, so callers may modify it
+    """
+    return _build_meal_index(get_table_version(DATA_PATHS['meal_database'])).copy()
+
+__all__ = [
+    'NUTRIENT_COLUMNS', 'FoodReference', 'RecipeReference',
+    'get_food_reference', 'get_recipe_reference', 'get_meal_index'
+]
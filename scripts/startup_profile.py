@@ -0,0 +1,154 @@
+# startup_profile.py - Cold start timing for the meRegAnno App
+"""
+Measures what a cold start costs: importing the app's modules and rendering
+the first page of a fresh process.
+
+In the app, set LUMINA_STARTUP_PROFILE=1 to record startup marks (seconds
+after lumina_app.py was first imported, which excludes interpreter and
+Streamlit server startup) and show them in the sidebar. From the command line, print an `-X importtime` report
+for the modules lumina_app.py imports (read from its import statements),
+measured in a fresh interpreter:
+
+    python -m scripts.startup_profile --top 25
+"""
+import os
+import re
+import subprocess
+import sys
+import time
+
+# Taken when lumina_app.py first imports this module (its first import), not
+# when the interpreter or the Streamlit server started
+APP_IMPORT_START = time.perf_counter()
+
+STARTUP_PROFILE_ENABLED = os.environ.get('LUMINA_STARTUP_PROFILE', '0') == '1'
+
+
+# Heavy libraries that should only be loaded on first use
+DEFERRED_MODULES = ['altair', 'st_supabase_connection', 'supabase', 'plotly', 'sqlalchemy', 'psycopg2']
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APP_PATH = os.path.join(PROJECT_ROOT, 'lumina_app.py')
+
+_startup_marks = {}
+
+def mark_startup(name):
+    """Record seconds since APP_IMPORT_START under name; only the first call counts"""
+    if name not in _startup_marks:
+        _startup_marks[name] = time.perf_counter() - APP_IMPORT_START
+    return _startup_marks[name]
+
+def get_startup_marks():
+    """Return the recorded startup marks (name -> seconds since the app was first imported)"""
+    return dict(_startup_marks)
+
+def get_loaded_deferred_modules():
+    """Return the deferred heavy libraries that are already imported in this process"""
+    return [name for name in DEFERRED_MODULES if name in sys.modules]
+
+def app_modules(app_path=APP_PATH):
+    """
+    Modules app_path imports at startup, in import order: its module level
+    import statements, also inside try/if blocks but not inside functions,
+    so the list cannot go stale as the app gains imports
+    """
+    import ast
+
+    with open(app_path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=app_path)
+
+    modules = []
+    pending = list(tree.body)
+    while pending:
+        node = pending.pop(0)
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            modules.append(node.module)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            # Imported on first call, not at startup
+            continue
+        else:
+            # try/except/else/finally, if/else and with bodies run at startup
+            children = [child for child in ast.iter_child_nodes(node) if isinstance(child, ast.stmt)]
+            for handler in getattr(node, 'handlers', []):
+                children.extend(handler.body)
+            pending[:0] = children
+    return list(dict.fromkeys(modules))
+
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)')
+
+def parse_importtime(report):
+    """
+    Parse `python -X importtime` output into a list of dicts with
+    module, self_ms, cumulative_ms and depth (nesting level)
+    """
+    rows = []
+    for line in report.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            rows.append({
+                'module': match.group(4),
+                'self_ms': int(match.group(1)) / 1000.0,
+                'cumulative_ms': int(match.group(2)) / 1000.0,
+                'depth': (len(match.group(3)) - 1) // 2
+            })
+    return rows
+
+def measure_import_times(modules=None):
+    """
+    Import modules in a fresh interpreter with -X importtime
+
+    Returns (rows, loaded_deferred): the parsed report and the heavy
+    libraries that ended up imported.
+    """
+    modules = modules or app_modules()
+    code = (
+        f"import sys; import {', '.join(modules)}; "
+        f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, cwd=PROJECT_ROOT
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Import of app modules failed:\n{result.stderr[-2000:]}")
+
+    loaded_deferred = [name for name in result.stdout.strip().split(',') if name]
+    return parse_importtime(result.stderr), loaded_deferred
+
+def format_import_report(rows, loaded_deferred, top=20):
+    """Format the slowest imports (by cumulative time) as text"""
+    top_level = [row for row in rows if row['depth'] == 0]
+    total_ms = sum(row['cumulative_ms'] for row in top_level)
+
+    lines = [f"Total import time: {total_ms:.1f} ms ({len(rows)} modules)", ""]
+    lines.append(f"{'cumulative ms':>14}  {'self ms':>9}  module")
+    for row in sorted(rows, key=lambda r: r['cumulative_ms'], reverse=True)[:top]:
+        lines.append(f"{row['cumulative_ms']:>14.1f}  {row['self_ms']:>9.1f}  {'  ' * row['depth']}{row['module']}")
+
+    lines.append("")
+    if loaded_deferred:
+        lines.append(f"Deferred libraries loaded at startup: {', '.join(loaded_deferred)}")
+    else:
+        lines.append("No deferred libraries loaded at startup")
+    return "\n".join(lines)
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Report import time of the app's startup modules")
+    parser.add_argument('--top', type=int, default=20, help="number of slowest imports to list")
+    args = parser.parse_args(argv)
+
+    rows, loaded_deferred = measure_import_times()
+    print(format_import_report(rows, loaded_deferred, top=args.top))
+
+if __name__ == '__main__':
+    main()
+
+__all__ = [
+    'APP_IMPORT_START', 'STARTUP_PROFILE_ENABLED', 'DEFERRED_MODULES', 'APP_PATH', 'app_modules',
+    'mark_startup', 'get_startup_marks', 'get_loaded_deferred_modules',
+    'parse_importtime', 'measure_import_times', 'format_import_report'
+]
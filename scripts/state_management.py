@@ -3,7 +3,35 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, date, time
 from typing import Dict, Any, Optional, List, Union
+import copy
 import json
+import logging
+
+from scripts.constants import SESSION_STATE_LIMITS
+from scripts.memory_diagnostics import estimate_size
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_TYPES = ['error', 'warning', 'success', 'info']
+
+def _append_bounded(buffer: list, entry, max_items: int) -> list:
+    """Append entry and drop the oldest entries beyond max_items (ring buffer)"""
+    buffer.append(entry)
+    if len(buffer) > max_items:
+        del buffer[:len(buffer) - max_items]
+    return buffer
+
+def _count_budget_event(field: str, count: int = 1, size: int = 0):
+    """
+    Add to this session's memory budget counters (shown by show_memory_diagnostics)
+
+    The log level is ERROR in production, so the log lines alone are not seen.
+    """
+    stats = st.session_state.setdefault('_memory_budget_stats', {
+        'evicted_entries': 0, 'evicted_bytes': 0, 'rejected_entries': 0, 'rejected_bytes': 0
+    })
+    stats[f"{field}_entries"] += count
+    stats[f"{field}_bytes"] += size
 
 class StateManager:
     """Centralized state management for the meRegAnno app"""
@@ -112,12 +140,13 @@ class StateManager:
         """Initialize all session state variables with defaults if they don't exist"""
         for category, defaults in self.state_defaults.items():
             if category not in st.session_state:
-                st.session_state[category] = defaults.copy()
+                # Deep copy: the default lists must not be shared between sessions
+                st.session_state[category] = copy.deepcopy(defaults)
             else:
                 # Add any missing keys from defaults
                 for key, value in defaults.items():
                     if key not in st.session_state[category]:
-                        st.session_state[category][key] = value
+                        st.session_state[category][key] = copy.deepcopy(value)
     
     def get_state(self, category: str, key: str = None, default=None):
         """
@@ -185,18 +214,18 @@ class StateManager:
         
         if keys is None:
             # Clear entire category
-            st.session_state[category] = self.state_defaults.get(category, {}).copy()
+            st.session_state[category] = copy.deepcopy(self.state_defaults.get(category, {}))
         elif isinstance(keys, str):
             # Clear single key
             if keys in st.session_state[category]:
                 default_value = self.state_defaults.get(category, {}).get(keys)
-                st.session_state[category][keys] = default_value
+                st.session_state[category][keys] = copy.deepcopy(default_value)
         elif isinstance(keys, list):
             # Clear multiple keys
             defaults = self.state_defaults.get(category, {})
             for key in keys:
                 if key in st.session_state[category]:
-                    st.session_state[category][key] = defaults.get(key)
+                    st.session_state[category][key] = copy.deepcopy(defaults.get(key))
     
     def mark_form_dirty(self, category: str):
         """Mark a form as having unsaved changes"""
@@ -212,7 +241,8 @@ class StateManager:
     
     def add_notification(self, message: str, notification_type: str = 'info'):
         """
-        Add a notification message
+        Add a notification message, keeping the newest
+        SESSION_STATE_LIMITS['max_notifications_per_type'] per type
         
         Args:
             message: Notification message
@@ -220,12 +250,13 @@ class StateManager:
         """
         key = f"{notification_type}_messages"
         current_messages = self.get_state('notifications', key, [])
-        current_messages.append({
+        _append_bounded(current_messages, {
             'message': message,
             'timestamp': datetime.now(),
             'read': False
-        })
+        }, SESSION_STATE_LIMITS['max_notifications_per_type'])
         self.set_state('notifications', key, current_messages)
+        self.enforce_memory_budget()
     
     def get_notifications(self, notification_type: str = None, unread_only: bool = False) -> List[Dict]:
         """
@@ -244,7 +275,7 @@ class StateManager:
         else:
             # Get all notifications
             messages = []
-            for msg_type in ['error', 'warning', 'success', 'info']:
+            for msg_type in NOTIFICATION_TYPES:
                 key = f"{msg_type}_messages"
                 type_messages = self.get_state('notifications', key, [])
                 for msg in type_messages:
@@ -291,15 +322,23 @@ class StateManager:
         """Get the previous page name"""
         return self.get_state('navigation', 'previous_page')
     
-    def save_form_backup(self, category: str, form_data: Dict[str, Any]):
-        """Save form data as backup in case of errors"""
+    def save_form_backup(self, category: str, form_data: Dict[str, Any]) -> bool:
+        """Save form data as backup in case of errors; False if it is too large to keep"""
         backup_key = f"{category}_backup"
+        size = estimate_size(form_data)
+        if size > SESSION_STATE_LIMITS['max_entry_bytes']:
+            logger.warning(f"Form backup for {category} not kept: {size} bytes exceeds the entry limit")
+            _count_budget_event('rejected', size=size)
+            return False
         backup_data = {
             'data': form_data,
             'timestamp': datetime.now().isoformat(),
-            'page': self.get_state('navigation', 'current_page')
+            'page': self.get_state('navigation', 'current_page'),
+            'bytes': size
         }
         st.session_state[backup_key] = backup_data
+        self.enforce_memory_budget()
+        return True
     
     def restore_form_backup(self, category: str) -> Optional[Dict[str, Any]]:
         """Restore form data from backup"""
@@ -315,6 +354,80 @@ class StateManager:
         if backup_key in st.session_state:
             del st.session_state[backup_key]
     
+    def add_recovery_point(self, context: str, data: Any) -> bool:
+        """
+        Keep data as a recovery point for context
+        
+        The newest SESSION_STATE_LIMITS['max_recovery_points_per_context'] are
+        kept per context; data above max_entry_bytes is not kept (returns False).
+        """
+        size = estimate_size(data)
+        if size > SESSION_STATE_LIMITS['max_entry_bytes']:
+            logger.warning(f"Recovery point for {context} not kept: {size} bytes exceeds the entry limit")
+            _count_budget_event('rejected', size=size)
+            return False
+        recovery_points = st.session_state.setdefault('_recovery_points', {})
+        _append_bounded(recovery_points.setdefault(context, []), {
+            'data': data,
+            'timestamp': datetime.now().isoformat(),
+            'bytes': size
+        }, SESSION_STATE_LIMITS['max_recovery_points_per_context'])
+        self.enforce_memory_budget()
+        return True
+    
+    def get_recovery_point(self, context: str) -> Optional[Any]:
+        """Data of the newest recovery point for context"""
+        points = st.session_state.get('_recovery_points', {}).get(context)
+        return points[-1]['data'] if points else None
+    
+    def _bounded_entries(self) -> List[Dict[str, Any]]:
+        """Every evictable entry with its size, in eviction order"""
+        entries = []
+        # Recovery points go first, then form backups, then read and unread notifications
+        for context, points in st.session_state.get('_recovery_points', {}).items():
+            for point in points:
+                entries.append({'rank': 0, 'timestamp': point['timestamp'], 'bytes': point['bytes'],
+                                'buffer': points, 'entry': point})
+        for key in list(st.session_state.keys()):
+            if isinstance(key, str) and key.endswith('_backup') and isinstance(st.session_state[key], dict):
+                backup = st.session_state[key]
+                entries.append({'rank': 1, 'timestamp': backup.get('timestamp', ''),
+                                'bytes': backup.get('bytes') or estimate_size(backup), 'key': key})
+        notifications = st.session_state.get('notifications', {})
+        for msg_type in NOTIFICATION_TYPES:
+            messages = notifications.get(f"{msg_type}_messages", [])
+            for message in messages:
+                entries.append({'rank': 2 if message.get('read') else 3,
+                                'timestamp': message['timestamp'].isoformat(),
+                                'bytes': estimate_size(message), 'buffer': messages, 'entry': message})
+        entries.sort(key=lambda item: (item['rank'], item['timestamp']))
+        return entries
+    
+    def get_bounded_state_bytes(self) -> int:
+        """Estimated bytes held by notifications, form backups and recovery points"""
+        return sum(item['bytes'] for item in self._bounded_entries())
+    
+    def enforce_memory_budget(self, budget_bytes: int = None) -> int:
+        """Evict the oldest buffered entries until the session is within budget; returns evictions"""
+        budget_bytes = budget_bytes or SESSION_STATE_LIMITS['session_budget_bytes']
+        entries = self._bounded_entries()
+        total = sum(item['bytes'] for item in entries)
+        evicted, evicted_bytes = 0, 0
+        for item in entries:
+            if total <= budget_bytes:
+                break
+            if 'key' in item:
+                del st.session_state[item['key']]
+            else:
+                item['buffer'].remove(item['entry'])
+            total -= item['bytes']
+            evicted += 1
+            evicted_bytes += item['bytes']
+        if evicted:
+            logger.info(f"Session memory budget: evicted {evicted} entries, {total} bytes remain")
+            _count_budget_event('evicted', evicted, evicted_bytes)
+        return evicted
+    
     def export_state(self) -> Dict[str, Any]:
         """Export current state for debugging or backup"""
         exportable_state = {}
@@ -359,7 +472,7 @@ class StateManager:
         
         for category in categories:
             if category in self.state_defaults:
-                st.session_state[category] = self.state_defaults[category].copy()
+                st.session_state[category] = copy.deepcopy(self.state_defaults[category])
 
 # Global state manager instance
 state_manager = StateManager()
@@ -462,7 +575,7 @@ class FormStateManager:
 
 # Export main functions and classes
 __all__ = [
-    'StateManager', 'state_manager', 'FormStateManager',
+    'StateManager', 'state_manager', 'FormStateManager', 'NOTIFICATION_TYPES',
     'init_state', 'get_user_settings', 'update_user_settings',
     'get_form_state', 'update_form_state', 'clear_form_state',
     'save_form_backup', 'restore_form_backup',
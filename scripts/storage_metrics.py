@@ -0,0 +1,236 @@
+# storage_metrics.py - Storage I/O accounting for meRegAnno App
+"""
+Structured counters for every storage call in data_storage: rows read and
+written, bytes (CSV file sizes; database payload sizes only when
+measure_payload_bytes is on), Supabase round-trips, retries, cache hits and
+elapsed time. They are keyed by (backend, operation, table, caller) and
+aggregated both per process and per Streamlit session.
+
+    with storage_call('fetch', 'energy_balance', 'database') as call:
+        ...
+        call.add(round_trips=1, rows_read=len(rows))
+
+The aggregates can be exported as JSON or Prometheus text exposition with
+export_storage_metrics(); set LUMINA_STORAGE_METRICS_FILE to have the app
+write the process totals after every rerun (.prom selects Prometheus).
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+from scripts.constants import STORAGE_METRICS_SETTINGS
+from scripts.metrics import metrics_registry
+
+COUNTER_FIELDS = [
+    'calls', 'rows_read', 'rows_written', 'bytes', 'round_trips',
+    'retries', 'errors', 'cache_hits', 'elapsed_seconds'
+]
+
+# Frames from these modules are skipped when naming the caller
+_INTERNAL_MODULES = ('scripts.data_storage', 'scripts.storage_metrics', 'scripts.performance', 'contextlib', 'functools')
+
+def _new_counters() -> Dict[str, float]:
+    return {field: 0 for field in COUNTER_FIELDS}
+
+def get_caller(skip_modules=_INTERNAL_MODULES) -> str:
+    """module.function of the first frame outside the storage layer"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if not module.startswith(skip_modules):
+            # Streamlit runs lumina_app.py as __main__
+            module = 'lumina_app' if module == '__main__' else module.rsplit('.', 1)[-1]
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return 'unknown'
+
+class StorageCall:
+    """Counters for one storage call, filled in by the storage function"""
+    __slots__ = ('counters',)
+
+    def __init__(self):
+        self.counters = _new_counters()
+        self.counters['calls'] = 1
+
+    def add(self, **counts):
+        for field, value in counts.items():
+            self.counters[field] += value
+
+class StorageMetrics:
+    """Process-wide storage counters, plus per-session aggregation"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.process: Dict[Tuple[str, str, str, str], Dict[str, float]] = {}
+
+    def record(self, key: Tuple[str, str, str, str], counters: Dict[str, float]):
+        with self._lock:
+            totals = self.process.setdefault(key, _new_counters())
+            for field, value in counters.items():
+                totals[field] += value
+
+        session_totals = _get_session_metrics()
+        if session_totals is not None:
+            totals = session_totals.setdefault(key, _new_counters())
+            for field, value in counters.items():
+                totals[field] += value
+
+    def snapshot(self, scope: str = 'process') -> Dict[Tuple[str, str, str, str], Dict[str, float]]:
+        if scope == 'session':
+            return {key: dict(values) for key, values in (_get_session_metrics() or {}).items()}
+        with self._lock:
+            return {key: dict(values) for key, values in self.process.items()}
+
+    def reset(self):
+        with self._lock:
+            self.process.clear()
+
+# Global storage metrics instance
+storage_metrics = StorageMetrics()
+
+def _get_session_metrics():
+    """The calling session's counters, or None outside a Streamlit script run"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        if get_script_run_ctx(suppress_warning=True) is None:
+            return None
+        import streamlit as st
+        return st.session_state.setdefault('_storage_metrics', {})
+    except Exception:
+        return None
+
+@contextmanager
+def storage_call(operation: str, table: str, backend: str, caller: str = None):
+    """Time a storage call and record its counters when it finishes"""
+    call = StorageCall()
+    key = (backend, operation, table, caller or get_caller())
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call.add(errors=1)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        call.add(elapsed_seconds=elapsed)
+        storage_metrics.record(key, call.counters)
+        # Latency histogram / error counter without the caller label
+        metrics_registry.observe('lumina_storage_call_seconds', elapsed, backend=backend, operation=operation, table=table)
+        if call.counters['errors']:
+            metrics_registry.inc('lumina_storage_errors_total', call.counters['errors'],
+                                 backend=backend, operation=operation, table=table)
+
+def measure_payload_bytes() -> bool:
+    return (STORAGE_METRICS_SETTINGS['measure_payload_bytes']
+            or os.environ.get(STORAGE_METRICS_SETTINGS['payload_bytes_env_var'], '') not in ('', '0'))
+
+def payload_bytes(records) -> int:
+    """Size of records as the JSON the Supabase client sends (0 unless measure_payload_bytes())"""
+    if not measure_payload_bytes():
+        return 0
+    return len(json.dumps(records, default=str).encode('utf-8'))
+
+def file_bytes(path) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+# ===================== EXPORT =====================
+
+def metrics_to_records(metrics) -> list:
+    return [
+        dict(zip(('backend', 'operation', 'table', 'caller'), key), **values)
+        for key, values in sorted(metrics.items())
+    ]
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def metrics_to_prometheus(metrics, prefix: str = 'lumina_storage') -> str:
+    """Prometheus text exposition format, one counter family per field"""
+    lines = []
+    for field in COUNTER_FIELDS:
+        name = f"{prefix}_{field}" if field == 'elapsed_seconds' else f"{prefix}_{field}_total"
+        lines.append(f"# HELP {name} Storage {field.replace('_', ' ')} by backend, operation, table and caller")
+        lines.append(f"# TYPE {name} counter")
+        for (backend, operation, table, caller), values in sorted(metrics.items()):
+            labels = (
+                f'backend="{_escape_label(backend)}",operation="{_escape_label(operation)}",'
+                f'table="{_escape_label(table)}",caller="{_escape_label(caller)}"'
+            )
+            lines.append(f"{name}{{{labels}}} {values[field]}")
+    return "\n".join(lines) + "\n"
+
+def export_storage_metrics(path: str, fmt: str = None, scope: str = 'process') -> str:
+    """
+    Write storage counters to path as 'json' or 'prometheus' text
+
+    fmt defaults to prometheus for .prom/.txt files and JSON otherwise.
+    Returns the path written.
+    """
+    fmt = fmt or ('prometheus' if path.endswith(('.prom', '.txt')) else 'json')
+    metrics = storage_metrics.snapshot(scope)
+    if fmt == 'prometheus':
+        content = metrics_to_prometheus(metrics)
+    else:
+        content = json.dumps({
+            'scope': scope,
+            'exported_at': time.time(),
+            'metrics': metrics_to_records(metrics)
+        }, indent=2)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Write-then-rename so scrapers never see a half written file; the temp
+    # file is unique so concurrent exports (one per session rerun) don't collide
+    fd, temp_path = tempfile.mkstemp(dir=directory or '.', prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        # mkstemp creates the file owner-only; scrapers usually run as another user
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return path
+
+def get_export_path():
+    return os.environ.get(STORAGE_METRICS_SETTINGS['env_var']) or STORAGE_METRICS_SETTINGS['export_path']
+
+def show_storage_metrics_panel():
+    """Collapsible sidebar panel with this session's and the process' storage counters"""
+    import streamlit as st
+    import pandas as pd
+
+    with st.sidebar.expander("Storage I/O", expanded=False):
+        for scope in ('session', 'process'):
+            records = metrics_to_records(storage_metrics.snapshot(scope))
+            st.markdown(f"**{scope.capitalize()}**")
+            if records:
+                st.dataframe(pd.DataFrame(records).round(4), hide_index=True)
+            else:
+                st.caption("No storage calls yet")
+
+        from scripts.supabase_pool import pool_stats
+        stats = pool_stats()
+        if stats['requests']:
+            st.markdown("**Supabase connections**")
+            st.caption(
+                f"{stats['requests']} requests, {stats['new_connections']} new connections "
+                f"({stats['reuse_ratio']:.0%} reused), setup {stats['setup_seconds_total'] * 1000:.1f} ms total, "
+                f"{', '.join(stats['http_versions'])}"
+            )
+
+__all__ = [
+    'COUNTER_FIELDS', 'StorageMetrics', 'storage_metrics', 'storage_call', 'get_caller',
+    'measure_payload_bytes', 'payload_bytes', 'file_bytes', 'metrics_to_records', 'metrics_to_prometheus',
+    'export_storage_metrics', 'get_export_path', 'show_storage_metrics_panel'
+]
@@ -0,0 +1,193 @@
+# supabase_pool.py - Process-wide pooled Supabase client
+"""
+One Supabase client per server process, shared by every session, on top of
+an explicitly configured httpx connection pool (SUPABASE_POOL_SETTINGS):
+keep-alive connections, HTTP/2 when the h2 package is installed, and a
+bounded pool size. The PostgREST, auth and storage clients all share
+that pool. So a fetch or save reuses an open TLS connection instead of
+depending on how st.connection happens to cache its client.
+
+Credentials are looked up the way st-supabase-connection does it:
+SUPABASE_URL and SUPABASE_KEY (or SUPABASE_PUBLISHABLE_KEY) under
+[connections.supabase] in secrets.toml, or the same environment variables.
+
+Connection setup is measured per request with httpcore's trace hook. A
+request that opens a connection records TCP connect and TLS handshake time:
+
+    lumina_supabase_requests_total{connection="new|reused",http_version}   counter
+    lumina_supabase_connection_setup_seconds{phase="connect_tcp|start_tls"}  histogram
+
+pool_stats() returns the same numbers as a dict.
+"""
+import os
+import threading
+import time
+from typing import Dict
+
+from scripts.constants import SUPABASE_POOL_SETTINGS
+from scripts.metrics import metrics_registry
+
+SETUP_PHASES = ('connect_tcp', 'start_tls')
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def get_credentials():
+    """(url, key) from secrets.toml or the environment; raises like st-supabase-connection when missing"""
+    secrets = {}
+    try:
+        import streamlit as st
+        secrets = dict(st.secrets['connections']['supabase'])
+    except Exception:
+        # No secrets file, or no [connections.supabase] section
+        pass
+
+    def lookup(*names):
+        for name in names:
+            value = secrets.get(name) or os.environ.get(name)
+            if value:
+                return value
+        return None
+
+    url = lookup('SUPABASE_URL')
+    key = lookup('SUPABASE_PUBLISHABLE_KEY', 'SUPABASE_KEY')
+    if not url or not key:
+        raise ConnectionRefusedError(
+            "Supabase URL and key not provided. Set SUPABASE_URL and SUPABASE_KEY under "
+            "[connections.supabase] in secrets.toml or as environment variables."
+        )
+    return url, key
+
+class PoolStats:
+    """Request and connection-setup counters of the shared pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.new_connections = 0
+            self.setup_seconds = {phase: 0.0 for phase in SETUP_PHASES}
+            self.http_versions: Dict[str, int] = {}
+
+    def record(self, setup: Dict[str, float], http_version: str):
+        with self._lock:
+            self.requests += 1
+            if setup:
+                self.new_connections += 1
+            for phase, seconds in setup.items():
+                self.setup_seconds[phase] += seconds
+            self.http_versions[http_version] = self.http_versions.get(http_version, 0) + 1
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            total_setup = sum(self.setup_seconds.values())
+            return {
+                'requests': self.requests,
+                'new_connections': self.new_connections,
+                'reused_connections': self.requests - self.new_connections,
+                'reuse_ratio': (self.requests - self.new_connections) / self.requests if self.requests else 0.0,
+                'setup_seconds': dict(self.setup_seconds),
+                'setup_seconds_total': total_setup,
+                'setup_seconds_per_new_connection': total_setup / self.new_connections if self.new_connections else 0.0,
+                'http_versions': dict(self.http_versions)
+            }
+
+# Global pool statistics instance
+pool_stats_registry = PoolStats()
+
+def _on_request(request):
+    """httpx request hook: attach a trace callback that times connection setup"""
+    started = {}
+    setup = {}
+
+    def trace(event_name, info):
+        # e.g. 'connection.connect_tcp.started' / 'connection.start_tls.complete'
+        scope, _, event = event_name.rpartition('.')
+        phase = scope.rpartition('.')[2]
+        if phase not in SETUP_PHASES:
+            return
+        if event == 'started':
+            started[phase] = time.perf_counter()
+        elif event in ('complete', 'failed') and phase in started:
+            setup[phase] = time.perf_counter() - started.pop(phase)
+
+    request.extensions['trace'] = trace
+    request.extensions['lumina_setup'] = setup
+
+def _on_response(response):
+    setup = response.request.extensions.get('lumina_setup', {})
+    http_version = response.http_version
+    pool_stats_registry.record(setup, http_version)
+    metrics_registry.inc('lumina_supabase_requests_total', connection='new' if setup else 'reused',
+                         http_version=http_version)
+    for phase, seconds in setup.items():
+        metrics_registry.observe('lumina_supabase_connection_setup_seconds', seconds, phase=phase)
+
+def create_http_client(**overrides):
+    """httpx.Client with the pool settings and the setup-timing hooks"""
+    import httpx
+
+    settings = {**SUPABASE_POOL_SETTINGS, **overrides}
+    return httpx.Client(
+        http2=settings['http2'] and http2_available(),
+        limits=httpx.Limits(
+            max_connections=settings['max_connections'],
+            max_keepalive_connections=settings['max_keepalive_connections'],
+            keepalive_expiry=settings['keepalive_expiry_seconds']
+        ),
+        timeout=settings['timeout_seconds'],
+        follow_redirects=True,
+        event_hooks={'request': [_on_request], 'response': [_on_response]}
+    )
+
+class PooledSupabaseConnection:
+    """The part of st.connection('supabase') data_storage uses, on the shared pool"""
+
+    def __init__(self, url: str, key: str, http_client=None):
+        from supabase import ClientOptions, create_client
+
+        self.http_client = http_client or create_http_client()
+        self.client = create_client(url, key, options=ClientOptions(httpx_client=self.http_client))
+        self.table = self.client.table
+        self.rpc = self.client.rpc
+        self.auth = self.client.auth
+
+    def close(self):
+        self.http_client.close()
+
+_connection = None
+_connection_lock = threading.Lock()
+
+def get_pooled_connection() -> PooledSupabaseConnection:
+    """The process-wide client, created on first use"""
+    global _connection
+    if _connection is None:
+        with _connection_lock:
+            if _connection is None:
+                url, key = get_credentials()
+                _connection = PooledSupabaseConnection(url, key)
+    return _connection
+
+def reset_pooled_connection():
+    """Close the shared client (and its connections); the next call creates a new one"""
+    global _connection
+    with _connection_lock:
+        if _connection is not None:
+            _connection.close()
+        _connection = None
+
+def pool_stats() -> Dict:
+    return pool_stats_registry.to_dict()
+
+__all__ = [
+    'SETUP_PHASES', 'http2_available', 'get_credentials', 'PoolStats', 'pool_stats_registry',
+    'create_http_client', 'PooledSupabaseConnection', 'get_pooled_connection', 'reset_pooled_connection',
+    'pool_stats'
+]
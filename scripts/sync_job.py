@@ -0,0 +1,262 @@
+# sync_job.py - Resumable, idempotent chunked sync of a frame into a Supabase table
+"""
+Replaces the rows of a table with a frame through PostgREST upserts, in
+chunks, without clearing the table first:
+
+1. Every row gets a deterministic key (SYNC_JOB_SETTINGS['key_column']),
+   a hash of its content plus its occurrence number among identical rows,
+   so a chunk that is sent twice updates the rows it wrote the first time
+   instead of duplicating them.
+2. Chunks are upserted by a bounded thread pool and stamped with the run id
+   (SYNC_JOB_SETTINGS['run_column']). After each chunk commits, its index is
+   written to a checkpoint file (data/.sync/<table>.json).
+3. Once every chunk is in, rows the run did not stamp are deleted. These are
+   rows no longer in the source.
+
+If the process dies or chunks fail, running the job again with the same
+source frame picks up the checkpoint and sends only the missing chunks. A
+changed source starts a new run. Until the final step the table holds the
+new rows plus the stale ones, never fewer rows than before.
+
+The table needs the two columns, with a unique constraint on the key:
+
+    ALTER TABLE energy_balance ADD COLUMN row_key text UNIQUE, ADD COLUMN sync_run text;
+
+SyncJob.check_schema() (called by run()) raises SyncSchemaError with that
+statement when the columns are missing, before any chunk is sent.
+
+    from scripts.sync_job import SyncJob
+    result = SyncJob(df_clean, 'energy_balance').run()
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Optional
+
+import pandas as pd
+
+from scripts.constants import SYNC_JOB_SETTINGS
+from scripts.storage_metrics import storage_call, payload_bytes
+
+# Columns that identify a registration; the occurrence number separates exact duplicates
+KEY_FIELDS = ('user_id', 'date', 'time', 'label', 'activity', 'energy', 'note')
+
+def add_row_keys(df, key_column=None, fields=KEY_FIELDS):
+    """Copy of df with a deterministic, unique key per row in key_column"""
+    key_column = key_column or SYNC_JOB_SETTINGS['key_column']
+    fields = [column for column in fields if column in df.columns] or list(df.columns)
+    identity = df[fields].astype(str).agg('|'.join, axis=1)
+    occurrence = identity.groupby(identity).cumcount().astype(str)
+    df_keyed = df.copy()
+    df_keyed[key_column] = [
+        hashlib.blake2b(f"{text}#{n}".encode('utf-8'), digest_size=16).hexdigest()
+        for text, n in zip(identity, occurrence)
+    ]
+    return df_keyed
+
+def frame_digest(df) -> str:
+    """Content hash of df, to tell whether a checkpoint belongs to the same source"""
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.blake2b(hashes.tobytes(), digest_size=16)
+    digest.update('|'.join(map(str, df.columns)).encode('utf-8'))
+    return digest.hexdigest()
+
+def migration_sql(table_name) -> str:
+    return (f"ALTER TABLE {table_name} ADD COLUMN {SYNC_JOB_SETTINGS['key_column']} text UNIQUE, "
+            f"ADD COLUMN {SYNC_JOB_SETTINGS['run_column']} text;")
+
+class SyncSchemaError(RuntimeError):
+    """The table lacks the key/run columns the sync job needs"""
+
+    def __init__(self, table_name, reason):
+        self.table_name = table_name
+        self.reason = reason
+        self.migration = migration_sql(table_name)
+        super().__init__(f"{table_name} is not ready for resumable syncs ({reason}). Run: {self.migration}")
+
+class SyncResult:
+    """Outcome of SyncJob.run()"""
+
+    def __init__(self, table, run_id, total_chunks, resumed_chunks=0):
+        self.table = table
+        self.run_id = run_id
+        self.total_chunks = total_chunks
+        self.resumed_chunks = resumed_chunks  # already committed by an earlier attempt
+        self.sent_chunks = 0
+        self.failed_chunks = []
+        self.rows_written = 0
+        self.stale_rows_removed = False
+        self.seconds = 0.0
+
+    @property
+    def complete(self) -> bool:
+        return not self.failed_chunks and self.stale_rows_removed
+
+class SyncCheckpoint:
+    """The committed chunk indices of a run, persisted after every chunk"""
+
+    def __init__(self, path, run_id, source_digest, chunk_rows, total_chunks, completed=()):
+        self.path = path
+        self.run_id = run_id
+        self.source_digest = source_digest
+        self.chunk_rows = chunk_rows
+        self.total_chunks = total_chunks
+        self.completed = set(completed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path) as f:
+                state = json.load(f)
+            return cls(path, state['run_id'], state['source_digest'], state['chunk_rows'],
+                       state['total_chunks'], state['completed'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def matches(self, source_digest, chunk_rows) -> bool:
+        return self.source_digest == source_digest and self.chunk_rows == chunk_rows
+
+    def mark_done(self, chunk_index):
+        with self._lock:
+            self.completed.add(chunk_index)
+            self._save()
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        state = {
+            'run_id': self.run_id, 'source_digest': self.source_digest, 'chunk_rows': self.chunk_rows,
+            'total_chunks': self.total_chunks, 'completed': sorted(self.completed), 'updated': time.time()
+        }
+        # Write-then-rename so a crash never leaves a truncated checkpoint
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.path)
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+def checkpoint_path(table_name, checkpoint_dir=None) -> str:
+    return os.path.join(checkpoint_dir or SYNC_JOB_SETTINGS['checkpoint_dir'], f"{table_name}.json")
+
+def clear_checkpoint(table_name, checkpoint_dir=None):
+    """Forget an unfinished run, e.g. after the table was replaced some other way"""
+    SyncCheckpoint(checkpoint_path(table_name, checkpoint_dir), None, None, None, 0).remove()
+
+class SyncJob:
+    """One resumable replacement of table_name's rows with df"""
+
+    def __init__(self, df, table_name, conn=None, chunk_rows=None, max_workers=None, checkpoint_dir=None,
+                 on_chunk: Optional[Callable[[int, int, int], None]] = None):
+        self.table_name = table_name
+        self.chunk_rows = chunk_rows or SYNC_JOB_SETTINGS['chunk_rows']
+        self.max_workers = max_workers or SYNC_JOB_SETTINGS['max_workers']
+        self.key_column = SYNC_JOB_SETTINGS['key_column']
+        self.run_column = SYNC_JOB_SETTINGS['run_column']
+        self.on_chunk = on_chunk  # called as on_chunk(chunk_index, rows, total_chunks) in the caller's thread
+        self._conn = conn
+        self._df = add_row_keys(df.drop(columns=['id'], errors='ignore'), self.key_column)
+        self.total_chunks = -(-len(self._df) // self.chunk_rows)
+        self.checkpoint_path = checkpoint_path(table_name, checkpoint_dir)
+
+    def _connection(self):
+        if self._conn is None:
+            from scripts.data_storage import get_supabase_connection
+            self._conn = get_supabase_connection()
+        return self._conn
+
+    def _checkpoint(self):
+        digest = frame_digest(self._df)
+        checkpoint = SyncCheckpoint.load(self.checkpoint_path)
+        if checkpoint is not None and checkpoint.matches(digest, self.chunk_rows):
+            return checkpoint
+        checkpoint = SyncCheckpoint(self.checkpoint_path, uuid.uuid4().hex, digest, self.chunk_rows, self.total_chunks)
+        checkpoint.save()
+        return checkpoint
+
+    def _records(self, chunk_index, run_id):
+        from scripts.data_storage import to_json_records
+
+        chunk = self._df.iloc[chunk_index * self.chunk_rows:(chunk_index + 1) * self.chunk_rows]
+        records = to_json_records(chunk)
+        for record in records:
+            record[self.run_column] = run_id
+        return records
+
+    def _send_chunk(self, chunk_index, run_id):
+        records = self._records(chunk_index, run_id)
+        with storage_call('sync_upsert', self.table_name, 'database') as call:
+            call.add(round_trips=1, bytes=payload_bytes(records))
+            self._connection().table(self.table_name).upsert(records, on_conflict=self.key_column).execute()
+            call.add(rows_written=len(records))
+        return len(records)
+
+    def check_schema(self):
+        """Raise SyncSchemaError unless the table has the key and run columns"""
+        with storage_call('sync_preflight', self.table_name, 'database') as call:
+            call.add(round_trips=1)
+            try:
+                self._connection().table(self.table_name).select(f"{self.key_column},{self.run_column}").limit(1).execute()
+            except Exception as e:
+                raise SyncSchemaError(self.table_name, getattr(e, 'message', None) or str(e)) from e
+
+    def _remove_stale_rows(self, run_id):
+        conn = self._connection()
+        with storage_call('sync_cleanup', self.table_name, 'database') as call:
+            call.add(round_trips=2)
+            conn.table(self.table_name).delete().neq(self.run_column, run_id).execute()
+            # neq does not match NULL: rows written before the first job
+            conn.table(self.table_name).delete().is_(self.run_column, 'null').execute()
+
+    def run(self) -> SyncResult:
+        started = time.perf_counter()
+        # Resolved once here; the workers share the client
+        self._connection()
+        self.check_schema()
+        checkpoint = self._checkpoint()
+        pending = [index for index in range(self.total_chunks) if index not in checkpoint.completed]
+        result = SyncResult(self.table_name, checkpoint.run_id, self.total_chunks,
+                            resumed_chunks=self.total_chunks - len(pending))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='sync') as pool:
+            futures = {pool.submit(self._send_chunk, index, checkpoint.run_id): index for index in pending}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    print(f"Sync chunk {index + 1}/{self.total_chunks} of {self.table_name} failed: {e}")
+                    result.failed_chunks.append(index)
+                    continue
+                checkpoint.mark_done(index)
+                result.sent_chunks += 1
+                result.rows_written += rows
+                if self.on_chunk is not None:
+                    self.on_chunk(index, rows, self.total_chunks)
+
+        result.failed_chunks.sort()
+        if not result.failed_chunks:
+            self._remove_stale_rows(checkpoint.run_id)
+            result.stale_rows_removed = True
+            checkpoint.remove()
+        result.seconds = time.perf_counter() - started
+        return result
+
+__all__ = [
+    'KEY_FIELDS', 'add_row_keys', 'frame_digest', 'migration_sql', 'SyncSchemaError', 'SyncResult', 'SyncCheckpoint',
+    'checkpoint_path', 'clear_checkpoint', 'SyncJob'
+]
@@ -3,6 +3,13 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, date, time
 from typing import Optional, List, Dict, Any, Callable
+from streamlit.errors import StreamlitAPIException
+
+from scripts.constants import MEAL_BROWSER_SETTINGS
+from scripts.meal_log import (
+    build_meal_index, filter_meal_index, get_page_count, get_meal_page,
+    get_meal_id, get_meal_items, parse_meal_code
+)
 
 def create_date_time_selector(
     date_key: str,
@@ -242,74 +249,132 @@ def create_activity_input_fields(activity_type: str, current_values: Dict[str, A
         'note': note
     }
 
-def create_meal_selection_interface(meal_database: pd.DataFrame):
-    """Create meal selection interface for copying previous meals"""
+def rerun_fragment():
+    """Rerun only the enclosing fragment, or the whole app when not inside one"""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+def create_pagination_controls(total_items: int, page_size: int, key: str) -> int:
+    """
+    Create previous/next controls for a paged list
+    
+    Returns:
+        int: Current zero-based page number
+    """
+    page_key = f"{key}_page"
+    page_count = get_page_count(total_items, page_size)
+    page = min(st.session_state.get(page_key, 0), page_count - 1)
+    st.session_state[page_key] = page
+    
+    def go_to(new_page: int):
+        st.session_state[page_key] = min(max(new_page, 0), page_count - 1)
+    
+    if page_count > 1:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            st.button("◀ Previous", key=f"{key}_prev", disabled=page == 0,
+                      on_click=go_to, args=(page - 1,))
+        with col2:
+            st.caption(f"Page {page + 1} of {page_count} ({total_items} meals)")
+        with col3:
+            st.button("Next ▶", key=f"{key}_next", disabled=page >= page_count - 1,
+                      on_click=go_to, args=(page + 1,))
+    
+    return page
+
+def create_meal_search(key: str) -> str:
+    """Create a meal search input that resets paging when the search changes"""
+    search_term = st.text_input("Search meals", help="Search by meal name", key=f"{key}_search")
+    if st.session_state.get(f"{key}_last_search") != search_term:
+        st.session_state[f"{key}_last_search"] = search_term
+        st.session_state[f"{key}_page"] = 0
+    return search_term
+
+def create_meal_selection_interface(
+    meal_database: pd.DataFrame,
+    meal_templates: pd.DataFrame = None,
+    page_size: int = MEAL_BROWSER_SETTINGS['page_size'],
+    key: str = "meal_browser",
+    meal_index: pd.DataFrame = None
+):
+    """
+    Create paginated meal selection interface for copying previous meals
+    
+    Only the meals on the current page are rendered, and a meal's ingredients
+    are looked up only once it has been opened. Pass meal_index (e.g. the
+    cached get_meal_index()) to skip rebuilding it from meal_database.
+    """
     if meal_database.empty:
         st.info("No previous meals found")
         return None
     
-    # Group meals by name, date, and time
-    grouped_meals = meal_database.groupby(['name', 'date', 'time', 'code']).first().reset_index()
-    grouped_meals = grouped_meals.sort_values(['date', 'time'], ascending=False)
-    
-    # Search functionality
-    search_term = st.text_input("Search meals", help="Search by meal name")
-    
-    if search_term:
-        filtered_meals = grouped_meals[
-            grouped_meals['name'].str.contains(search_term, case=False, na=False)
-        ]
-    else:
-        filtered_meals = grouped_meals
+    search_term = create_meal_search(key)
+    if meal_index is None:
+        meal_index = build_meal_index(meal_database)
+    filtered_meals = filter_meal_index(meal_index, search_term)
     
     if filtered_meals.empty:
         st.warning("No meals found matching your search")
         return None
     
+    page = create_pagination_controls(len(filtered_meals), page_size, key)
+    page_meals, page = get_meal_page(filtered_meals, page, page_size)
+    
+    opened_key = f"{key}_opened"
+    opened_meal = st.session_state.get(opened_key)
     selected_meal = None
-    st.caption(f"Found {len(filtered_meals)} meals")
-    
-    for idx, row in filtered_meals.iterrows():
-        with st.expander(f"{row['name']} - {row['date']} at {row['time']}", expanded=False):
-            # Show meal details
-            meal_items = meal_database[
-                (meal_database['name'] == row['name']) & 
-                (meal_database['date'] == row['date']) & 
-                (meal_database['time'] == row['time'])
-            ]
+    
+    for _, row in page_meals.iterrows():
+        meal_id = get_meal_id(row)
+        is_open = opened_meal == meal_id
+        
+        col_title, col_toggle = st.columns([4, 1])
+        with col_title:
+            favorite_icon = "⭐ " if row.get('favorite', False) == True else ""
+            st.write(f"{favorite_icon}**{row['name']}** - {row['date']} at {row['time']}")
+        with col_toggle:
+            if st.button("Hide" if is_open else "Open", key=f"{key}_toggle_{meal_id}"):
+                st.session_state[opened_key] = None if is_open else meal_id
+                rerun_fragment()
+        
+        if not is_open:
+            continue
+        
+        # Show meal details - only for the opened meal
+        with st.container(border=True):
+            meal_items = get_meal_items(meal_database, row, meal_templates)
             
             col_info1, col_info2 = st.columns(2)
             with col_info1:
                 st.write(f"**Date:** {row['date']}")
                 st.write(f"**Time:** {row['time']}")
-                if row.get('favorite', False):
+                if row.get('favorite', False) == True:
                     st.write("⭐ **Favorite meal**")
             
             with col_info2:
                 st.write(f"**Nutrition code:** {row['code']}")
-                code_parts = row['code'].split('/')
-                if len(code_parts) == 4:
+                code_parts = parse_meal_code(row['code'])
+                if code_parts:
                     st.write(f"**Energy:** {code_parts[0]} kcal")
                     st.write(f"**Protein/Carbs/Fat:** {code_parts[1]}/{code_parts[2]}/{code_parts[3]} g")
             
             # Show ingredients
             st.write("**Ingredients:**")
-            for _, item in meal_items.iterrows():
-                st.write(f"• {item['livsmedel']}: {item['amount']} g")
+            for food, amount in zip(meal_items['Food'], meal_items['Amount (g)']):
+                st.write(f"• {food}: {amount} g")
             
             # Select button
-            if st.button(f"Select this meal", key=f"select_meal_{idx}_{row['date']}_{row['time']}"):
+            if st.button("Select this meal", key=f"{key}_select_{meal_id}"):
                 selected_meal = {
                     'name': row['name'],
                     'date': row['date'],
                     'time': row['time'],
                     'code': row['code'],
                     'favorite': row.get('favorite', False),
-                    'items': meal_items[['livsmedel', 'amount']].rename(
-                        columns={'livsmedel': 'Food', 'amount': 'Amount (g)'}
-                    )
+                    'items': meal_items
                 }
-                break
     
     return selected_meal
 
@@ -406,7 +471,8 @@ def create_info_box(title: str, content: str, box_type: str = "info"):
 __all__ = [
     'create_date_time_selector', 'create_nutrition_display', 'create_energy_metrics',
     'create_data_table', 'create_form_section', 'create_submit_button_with_validation',
-    'create_activity_input_fields', 'create_meal_selection_interface', 
+    'create_activity_input_fields', 'rerun_fragment', 'create_pagination_controls', 'create_meal_search',
+    'create_meal_selection_interface', 
     'create_recipe_portions_input', 'create_loading_spinner', 'create_success_message',
     'create_error_display', 'create_form_progress_indicator', 'create_confirmation_dialog',
     'create_info_box'
@@ -1,8 +1,11 @@
 import pandas as pd
 import re
+import sys
 from datetime import datetime, time, date
 from typing import List, Dict, Any, Tuple, Optional
 
+from scripts.metrics import metrics_registry
+
 class ValidationError(Exception):
     """Custom exception for validation errors"""
     pass
@@ -18,6 +21,8 @@ class ValidationResult:
         """Add an error message"""
         self.errors.append(message)
         self.is_valid = False
+        # Labelled with the validate_* function that rejected the input
+        metrics_registry.inc('lumina_validation_failures_total', validator=sys._getframe(1).f_code.co_name)
     
     def add_warning(self, message: str):
         """Add a warning message"""